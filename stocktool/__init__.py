@@ -1,5 +1,13 @@
-from .visualization import StockData
-from .model import StockPrediction
-from .evaluation import StockEvaluation
+from . import instrumentation
+from .visualization import StockData, TradingCalendar, trading_calendar
+from .visualization import BarStore, get_bars, set_default_store
+from .visualization import configure_session, get_session, session_stats
+from .model import GlobalPrediction, ModelRegistry, RefitPolicy, StockPrediction, WalkForward
+from .model import set_default_registry, tune
+from .evaluation import ReplayEngine, StockEvaluation, StrategySweep
 
-__all__ = ["StockData", "StockEvaluation", "StockPrediction"]
+__all__ = ["BarStore", "GlobalPrediction", "ModelRegistry", "RefitPolicy", "ReplayEngine",
+           "StockData", "StockEvaluation", "StockPrediction", "StrategySweep",
+           "TradingCalendar", "WalkForward", "configure_session", "get_bars", "get_session",
+           "instrumentation", "session_stats", "set_default_registry", "set_default_store",
+           "trading_calendar", "tune"]
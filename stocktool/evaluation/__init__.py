@@ -1 +1,4 @@
-from .evaluation import StockEvaluation
\ No newline at end of file
+from .evaluation import StockEvaluation
+from .metrics import PortfolioMetrics
+from .replay import LiveClock, PanelSource, ReplayEngine, SimulatedClock, StoreSource
+from .sweep import StrategySweep
@@ -0,0 +1,152 @@
+"""
+This is the code for the offline backtest, the array form of StockEvaluation.evaluate
+"""
+import numpy as np
+import pandas as pd
+
+from stocktool import trading_calendar
+from stocktool.visualization.fetch import fetch_symbols
+from stocktool.visualization.panel import StockPanel
+
+def load_prices(model, sessions):
+    """
+    read the open and close prices of all the stocks of the model on the given days at
+    once, from the store of the model data.
+
+    parameters:
+        model (StockPrediction): the prediction model
+        sessions (pd.DatetimeIndex): the market open days
+
+    return:
+        frames (dict): stock symbol -> price DataFrame indexed by date
+        panel (StockPanel): Open and Close of the stocks on exactly the given days
+    """
+    frames, errors = fetch_symbols(model.stocks, sessions[0], sessions[-1],
+                                   workers = getattr(model.data, "workers", 1),
+                                   store = model.data.store)
+    if errors:
+        raise ValueError("; ".join(f"{name}: {err}" for name, err in errors.items()))
+    panel = StockPanel.from_frames(frames, model.stocks, ["Open", "Close"])
+    rows = panel.dates.get_indexer(sessions)
+    values = panel.values[:, np.maximum(rows, 0), :]
+    missing = (rows < 0)[:, None] | np.isnan(values).any(axis = 0)
+    if missing.any():
+        day, stock = np.argwhere(missing)[0]
+        raise ValueError(f"{model.stocks[stock]} has no price data on "
+                         +f"{sessions[day].strftime('%Y-%m-%d')}.")
+    return frames, StockPanel(sessions, list(model.stocks), ["Open", "Close"], values)
+
+def walk_forward(model, sessions, frames):
+    """
+    forecast the close of every day as invest does, then add the day to the model as
+    update does.
+
+    parameters:
+        model (StockPrediction): the prediction model, trained until the day before the
+                                 first session
+        sessions (pd.DatetimeIndex): the market open days
+        frames (dict): stock symbol -> price DataFrame, see load_prices
+
+    return:
+        : (np.ndarray) shape (sessions, stocks), the forecast close
+    """
+    stocks = list(model.stocks)
+    forecast = np.empty((len(sessions), len(stocks)))
+    for i, session in enumerate(sessions):
+        pred = model.predict()
+        forecast[i] = [pred[stock][stock].iloc[0] for stock in stocks]
+        model.update(session, message = False, bars = frames)
+    return forecast
+
+def strategy(forecast, open_, close, weighted = False, threshold = 0.0):
+    """
+    return the growth of the asset on every day, invest on all the days at once.
+
+    parameters:
+        forecast, open_, close (np.ndarray): shape (days, stocks)
+        weighted (bool): False buys the stock with the largest predicted profit, True
+                         splits the asset by the predicted profit over all the stocks
+                         with a positive one, see StockEvaluation.invest.
+        threshold (float): only the stocks with a predicted profit larger than this are
+                           bought. Default is 0, same as invest.
+
+    return:
+        growth (np.ndarray): asset after the day / asset before it, 1 if nothing is bought
+        bought (np.ndarray): bool, shape (days, stocks), the stocks bought on each day
+    """
+    profit = (forecast - open_) / open_
+    returns = close / open_
+    positive = profit > threshold
+    if weighted:
+        weights = np.where(positive, profit, 0.0)
+        total = weights.sum(axis = 1)
+        invested = total > 0
+        growth = np.ones(len(profit))
+        growth[invested] = (returns * weights).sum(axis = 1)[invested] / total[invested]
+        return growth, positive
+
+    rows = np.arange(len(profit))
+    best = np.argmax(profit, axis = 1)
+    invested = positive[rows, best]
+    bought = np.zeros_like(positive)
+    bought[rows, best] = invested
+    return np.where(invested, returns[rows, best], 1.0), bought
+
+def weights(forecast, open_, bought):
+    """
+    return the part of the asset put in every stock on every day, see strategy.
+
+    parameters:
+        forecast, open_ (np.ndarray): shape (days, stocks)
+        bought (np.ndarray): the stocks bought, returned by strategy
+
+    return:
+        : (np.ndarray) shape (days, stocks), the rows sum to 1, or 0 if nothing is bought
+    """
+    parts = np.where(bought, (forecast - open_) / open_, 0.0)
+    total = parts.sum(axis = 1, keepdims = True)
+    return np.divide(parts, total, out = np.zeros_like(parts), where = total > 0)
+
+def backtest(evaluation, days = 10, weighted = False):
+    """
+    the array form of StockEvaluation.evaluate: the prices are read once, the model
+    forecasts every day walking forward, and the strategy is computed on all the days
+    at once. The evaluation asset and date are moved on as evaluate does.
+
+    parameters:
+        evaluation (StockEvaluation): the evaluation
+        days (int): number of calendar days to invest on, as evaluate
+        weighted (bool): see StockEvaluation.invest
+
+    return:
+        : (DataFrame) indexed by date, from the evaluation date to `days` days later, with
+          columns asset (after the day) and stocks (the stocks bought that day, comma
+          separated). The days are also added to evaluation.metrics.
+    """
+    model = evaluation.model
+    if model.date_train != evaluation.date:
+        raise ValueError("The last day of the train set:"
+                         +model.date_train.strftime('%Y-%m-%d')
+                         +" should be the last invest day: "
+                         +evaluation.date.strftime('%Y-%m-%d'))
+    dates = pd.date_range(evaluation.date, periods = days + 1)
+    sessions = trading_calendar().session_range(dates[1], dates[-1]) if days else dates[:0]
+
+    factors = np.ones(days)
+    labels = np.full(days + 1, "", dtype = object)
+    if len(sessions):
+        frames, panel = load_prices(model, sessions)
+        forecast = walk_forward(model, sessions, frames)
+        growth, bought = strategy(forecast, panel.values[0], panel.values[1], weighted)
+        positions = dates[1:].get_indexer(sessions)
+        factors[positions] = growth
+        labels[positions + 1] = [",".join(np.asarray(panel.stocks)[row]) for row in bought]
+        evaluation.date = sessions[-1]
+
+    ### same order of products as evaluate, so the greedy curve is equal to the last bit
+    asset = np.multiply.accumulate(np.concatenate([[evaluation.asset], factors]))
+    if len(sessions):
+        evaluation.metrics.extend(sessions, asset[positions + 1],
+                                  weights(forecast, panel.values[0], bought))
+    evaluation.asset = asset[-1]
+    return pd.DataFrame({"asset": asset, "stocks": labels}, index = pd.Index(dates, name = "date"))
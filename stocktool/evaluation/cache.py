@@ -0,0 +1,123 @@
+"""
+This is the code for the price cache of the evaluation, so every day is not a new download
+"""
+import numpy as np
+import pandas as pd
+
+from stocktool.instrumentation import count
+from stocktool.visualization.fetch import fetch_symbols
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+class BarCache:
+    """
+    Class for the daily prices read by StockEvaluation. A price is read from the loaded
+    StockData if it covers the date, otherwise the next `window` days of all the stocks
+    are read at once (one request per stock, through the store), and the next days are
+    answered from memory.
+
+    parameters:
+        stocks (list of str): the stocks read together.
+        data (StockData): the loaded data, used for the dates it covers.
+        store (BarStore): the store the prices are read through.
+        window (int): number of calendar days read at once.
+        workers (int): max number of concurrent downloads.
+        rows (dict): stock symbol -> {date: array of COLUMNS}
+        spans (dict): stock symbol -> list of (start, end) already read. A date inside a
+                      span without a row has no price, e.g. the market is closed.
+        stats (dict): number of "hits", "misses", "prefetches", "rows" read and the
+                      "start" and "end" of the last prefetch.
+    """
+    def __init__(self, stocks, data = None, store = None, window = 30, workers = 1):
+        """
+        Initialize the class.
+
+        parameters:
+            stocks (list of str): the stocks
+            data (StockData): the loaded data. Default is none.
+            store (BarStore): Default is the shared store.
+            window (int): Default is 30 days.
+            workers (int): Default is 1.
+        """
+        if window < 1:
+            raise ValueError("window should be at least 1.")
+        self.stocks = list(stocks)
+        self.data, self.store = data, store
+        self.window, self.workers = window, workers
+        self.rows = {stock: {} for stock in self.stocks}
+        self.spans = {stock: [] for stock in self.stocks}
+        self.stats = {"hits": 0, "misses": 0, "prefetches": 0, "rows": 0,
+                      "start": None, "end": None}
+
+    def add(self, stock, frame, start, end):
+        """
+        keep the rows of a price DataFrame, and mark start to end as read. Nothing is
+        marked if end is before start. The columns the frame does not have are NaN, e.g.
+        the bars of a replay with only Open and Close.
+        """
+        if frame is not None:
+            values = frame.reindex(columns = COLUMNS).to_numpy(dtype = "float64")
+            rows = self.rows.setdefault(stock, {})
+            for date, row in zip(frame.index.values.astype("datetime64[D]"), values):
+                rows[date] = row
+            self.stats["rows"] += len(values)
+        if start <= end:
+            self.spans.setdefault(stock, []).append((np.datetime64(start.date()),
+                                                     np.datetime64(end.date())))
+
+    def covered(self, stock, day):
+        """
+        helper function, whether the day is already read for the stock.
+        """
+        return any(start <= day <= end for start, end in self.spans.get(stock, []))
+
+    def prefetch(self, date):
+        """
+        read the window starting at date for every stock which does not cover it yet.
+        """
+        day = np.datetime64(date.date())
+        stocks = [stock for stock in self.stocks if not self.covered(stock, day)]
+        if (self.data is not None and self.data.start_ts <= date <= self.data.end_ts
+                and all(stock in self.data.stocks for stock in stocks)):
+            for stock in stocks:
+                self.add(stock, self.data.df[stock], self.data.start_ts, self.data.end_ts)
+            return
+
+        today = pd.Timestamp.now().normalize()
+        end = max(date, min(date + pd.Timedelta(days = self.window - 1), today))
+        frames, errors = fetch_symbols(stocks, date, end, workers = self.workers,
+                                       store = self.store)
+        if errors:
+            raise ValueError("; ".join(f"{name}: {err}" for name, err in errors.items()))
+        ### today's bar might not be complete yet, so it is never marked as read
+        last = min(end, today - pd.Timedelta(days = 1))
+        for stock in stocks:
+            frame = frames[stock]
+            self.add(stock, frame if set(COLUMNS) <= set(frame.columns) else None, date, last)
+        self.stats.update(prefetches = self.stats["prefetches"] + 1, start = date, end = end)
+
+    def get(self, stock, date, field):
+        """
+        return one price of a stock.
+
+        parameters:
+            stock (str): stock symbol
+            date (pd.Timestamp): the date
+            field (str): "Open", "High", "Low", "Close" or "Volume"
+        """
+        if stock not in self.rows:
+            self.stocks.append(stock)
+            self.rows[stock], self.spans[stock] = {}, []
+        date = pd.Timestamp(date).normalize()
+        day = np.datetime64(date.date())
+        if self.covered(stock, day):
+            self.stats["hits"] += 1
+            count("bar_cache_hits", stock)
+        else:
+            self.stats["misses"] += 1
+            count("bar_cache_misses", stock)
+            self.prefetch(date)
+        row = self.rows[stock].get(day)
+        if row is None:
+            raise ValueError(f"{stock} has no price data on {date.strftime('%Y-%m-%d')}.")
+        return row[COLUMNS.index(field)]
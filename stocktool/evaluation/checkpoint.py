@@ -0,0 +1,276 @@
+"""
+This is the code for the checkpoints of a long evaluation, so it can resume after a crash
+"""
+import hashlib
+import json
+import os
+import pickle
+import pandas as pd
+
+from stocktool import StockPrediction
+
+VERSION = 1
+
+class Checkpoint:
+    """
+    Class for saving an evaluation and its model to a folder while evaluate runs, see
+    StockEvaluation.evaluate and StockEvaluation.resume.
+
+    The first checkpoint saves the whole model (StockPrediction.save) as the base. The
+    next ones only save a segment with what changed since the last checkpoint: the new
+    rows of the train data, of the predictions and of the metrics, the models which
+    changed, the new records of the refit policy, the asset and the dates. The folder is
+    read back by loading the base and adding the segments in order. After `compact`
+    segments, a new base is saved and the segments are removed.
+
+    parameters:
+        folder (str): the folder of the checkpoints, manifest.json lists the files.
+        every (int): number of days evaluated between two checkpoints.
+        compact (int): max number of segments before a new base is saved.
+        model (StockPrediction): the model saved by the last checkpoint.
+        manifest (dict): the base, the segments, the end date, weighted and the window of
+                         the evaluation, and the asset and date of the last checkpoint.
+        sizes (dict): ("history" or "pred_history", stock symbol) -> number of rows
+                      saved so far, and "metrics" -> number of days of the metrics.
+        digests (dict): tuple of stock symbols sharing a model -> hash of the model saved.
+        records (int): number of records of the refit policy saved so far.
+        days (int): number of days evaluated since the last checkpoint.
+    """
+    def __init__(self, folder, every = 5, compact = 20):
+        """
+        Initialize the class. Nothing is written until evaluate starts.
+
+        parameters:
+            folder (str): the folder of the checkpoints, it is created if needed.
+            every (int): Default is a checkpoint every 5 days.
+            compact (int): Default is a new base after 20 segments.
+        """
+        if every < 1 or compact < 1:
+            raise ValueError("every and compact should be at least 1.")
+        self.folder, self.every, self.compact = folder, every, compact
+        self.model, self.manifest = None, None
+        self.sizes, self.digests, self.records, self.days = {}, {}, 0, 0
+
+    def path(self, name):
+        """
+        helper function, return the path of a file in the folder.
+        """
+        return os.path.join(self.folder, name)
+
+    def write(self, name, state):
+        """
+        helper function, pickle state to a file of the folder, replacing it at once.
+        """
+        temp = self.path(name + ".tmp")
+        with open(temp, "wb") as file:
+            pickle.dump(state, file, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, self.path(name))
+
+    def write_manifest(self):
+        """
+        helper function, save the manifest, which makes the new files part of the checkpoint.
+        """
+        temp = self.path("manifest.json.tmp")
+        with open(temp, "w") as file:
+            json.dump(self.manifest, file, indent = 1)
+        os.replace(temp, self.path("manifest.json"))
+
+    def read_manifest(folder):
+        """
+        return the manifest of a checkpoint folder.
+        """
+        path = os.path.join(folder, "manifest.json")
+        if not os.path.exists(path):
+            raise ValueError(f"{folder} has no checkpoint.")
+        with open(path) as file:
+            manifest = json.load(file)
+        if manifest.get("version") != VERSION:
+            raise ValueError(f"{folder} is saved by another version of Checkpoint.")
+        return manifest
+
+    def models(model):
+        """
+        helper function, return the models of a StockPrediction grouped by object, so a
+        model shared by several stocks (GlobalPrediction) is saved once.
+
+        return:
+            : (dict) tuple of stock symbols -> the model
+        """
+        groups, objects = {}, {}
+        for stock in model.stocks:
+            forecaster = model.model[stock]
+            groups.setdefault(id(forecaster), []).append(stock)
+            objects[id(forecaster)] = forecaster
+        return {tuple(stocks): objects[key] for key, stocks in groups.items()}
+
+    def dump(forecaster):
+        """
+        helper function, return the pickled model.
+        """
+        return pickle.dumps(forecaster, protocol = pickle.HIGHEST_PROTOCOL)
+
+    def digest(data):
+        """
+        helper function, return the hash of a pickled model.
+        """
+        return hashlib.sha1(data).hexdigest()
+
+    def mark(self, model, metrics, digests = None):
+        """
+        helper function, remember the rows, models and records of the model as saved.
+
+        parameters:
+            model (StockPrediction): the model just saved
+            metrics (PortfolioMetrics): the metrics just saved
+            digests (dict): see self.digests. Default is to hash the models of the model.
+        """
+        self.model = model
+        self.sizes = {(name, stock): len(getattr(model, name)[stock])
+                      for name in ("history", "pred_history") for stock in model.stocks}
+        self.sizes["metrics"] = len(metrics)
+        if digests is None:
+            digests = {stocks: Checkpoint.digest(Checkpoint.dump(forecaster))
+                       for stocks, forecaster in Checkpoint.models(model).items()}
+        self.digests = digests
+        self.records = len(model.policy.records)
+        self.days = 0
+
+    def start(self, evaluation, days, weighted):
+        """
+        called by evaluate before the first day. A new evaluation saves a new base,
+        a resumed one (see restore) goes on with the same files.
+
+        parameters:
+            evaluation (StockEvaluation): the evaluation
+            days (int): number of days evaluate runs
+            weighted (bool): see StockEvaluation.invest
+        """
+        end = evaluation.date + pd.Timedelta(days = days)
+        if self.model is evaluation.model and self.manifest is not None:
+            self.days = 0
+            self.manifest["end"] = end.strftime("%Y-%m-%d")
+            self.write_manifest()
+            return
+        os.makedirs(self.folder, exist_ok = True)
+        ### the files of an older evaluation in the folder are removed by save_base
+        try:
+            old = Checkpoint.read_manifest(self.folder)
+        except ValueError:
+            old = {"base": None, "segments": []}
+        self.manifest = {"version": VERSION, "base": old["base"], "segments": old["segments"],
+                         "end": end.strftime("%Y-%m-%d"), "weighted": weighted,
+                         "window": evaluation.bars.window, "every": self.every}
+        self.save_base(evaluation)
+
+    def save_base(self, evaluation):
+        """
+        helper function, save the whole model and metrics as a new base and remove the
+        old files.
+        """
+        old = [self.manifest["base"], self.manifest.get("metrics")] + self.manifest["segments"]
+        number = int(old[0].split("-")[1].split(".")[0]) + 1 if old[0] else 0
+        name = f"base-{number:06d}.pkl"
+        evaluation.model.save(self.path(name))
+        self.write(f"metrics-{number:06d}.pkl", evaluation.metrics)
+        self.manifest.update(base = name, metrics = f"metrics-{number:06d}.pkl", segments = [],
+                             asset = evaluation.asset,
+                             date = evaluation.date.strftime("%Y-%m-%d"))
+        self.write_manifest()
+        for file in old:
+            if file and os.path.exists(self.path(file)):
+                os.remove(self.path(file))
+        self.mark(evaluation.model, evaluation.metrics)
+
+    def step(self, evaluation, date):
+        """
+        called by evaluate after every day, saves a checkpoint every `every` days and on
+        the last day.
+
+        parameters:
+            evaluation (StockEvaluation): the evaluation
+            date (pd.Timestamp): the day just evaluated
+        """
+        self.days += 1
+        if self.days >= self.every or date >= pd.Timestamp(self.manifest["end"]):
+            self.save(evaluation)
+
+    def save(self, evaluation):
+        """
+        save a checkpoint of the evaluation now, as a segment or as a new base.
+        """
+        if len(self.manifest["segments"]) >= self.compact:
+            self.save_base(evaluation)
+            return
+        model = evaluation.model
+        rows = {}
+        for name in ("history", "pred_history"):
+            rows[name] = {}
+            for stock in model.stocks:
+                buffer = getattr(model, name)[stock]
+                start = self.sizes.get((name, stock), 0)
+                if len(buffer) > start:
+                    rows[name][stock] = (buffer.dates[start: len(buffer)].copy(),
+                                         buffer.values[start: len(buffer)].copy())
+        models, digests = {}, {}
+        for stocks, forecaster in Checkpoint.models(model).items():
+            data = Checkpoint.dump(forecaster)
+            digests[stocks] = Checkpoint.digest(data)
+            if self.digests.get(stocks) != digests[stocks]:
+                models[stocks] = data
+        metrics = evaluation.metrics
+        rows["metrics"] = (metrics.buffer.dates[self.sizes["metrics"]: len(metrics)].copy(),
+                           metrics.buffer.values[self.sizes["metrics"]: len(metrics)].copy(),
+                           dict(metrics.sums), metrics.weights)
+        segment = {"stocks": list(model.stocks), "rows": rows, "models": models,
+                   "timings": model.timings, "count": model.policy.count,
+                   "records": model.policy.records[self.records:],
+                   "date_train": model.date_train, "date_pred": model.date_pred}
+
+        name = f"segment-{len(self.manifest['segments']) + 1:06d}.pkl"
+        self.write(name, segment)
+        self.manifest["segments"].append(name)
+        self.manifest.update(asset = evaluation.asset,
+                             date = evaluation.date.strftime("%Y-%m-%d"))
+        self.write_manifest()
+        self.mark(model, metrics, digests)
+
+    def restore(self, data = None, workers = 1, timeout = None, registry = None):
+        """
+        load the model and the metrics of the last checkpoint in the folder, see
+        StockEvaluation.resume. The asset, the date, the end date and weighted of the
+        evaluation are in self.manifest.
+
+        parameters:
+            data, workers, timeout, registry: see StockPrediction.load
+
+        return:
+            model (StockPrediction): the model on the last checkpoint day
+            metrics (PortfolioMetrics): the metrics until the last checkpoint day
+        """
+        self.manifest = Checkpoint.read_manifest(self.folder)
+        model = StockPrediction.load(self.path(self.manifest["base"]), data, workers,
+                                     timeout, registry)
+        with open(self.path(self.manifest["metrics"]), "rb") as file:
+            metrics = pickle.load(file)
+        for name in self.manifest["segments"]:
+            with open(self.path(name), "rb") as file:
+                segment = pickle.load(file)
+            dates, values, metrics.sums, metrics.weights = segment["rows"].pop("metrics")
+            metrics.buffer.append(dates, values)
+            for stock in [stock for stock in model.stocks if stock not in segment["stocks"]]:
+                for values in (model.history, model.pred_history, model.model, model.timings):
+                    values.pop(stock, None)
+            model.stocks = list(segment["stocks"])
+            for key, rows in segment["rows"].items():
+                for stock, (dates, values) in rows.items():
+                    getattr(model, key)[stock].append(dates, values)
+            for stocks, pickled in segment["models"].items():
+                forecaster = pickle.loads(pickled)
+                for stock in stocks:
+                    model.model[stock] = forecaster
+            model.timings = segment["timings"]
+            model.policy.count = segment["count"]
+            model.policy.records.extend(segment["records"])
+            model.date_train, model.date_pred = segment["date_train"], segment["date_pred"]
+        self.mark(model, metrics)
+        return model, metrics
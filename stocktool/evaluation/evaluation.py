@@ -1,14 +1,16 @@
 """
 This is the code for evaluation part, we use invest profit to evaluate our model.
 """
-import datetime as dt
+import numpy as np
 import pandas as pd
-from pandas_datareader.data import DataReader
-import requests_cache
-from pandas_datareader.yahoo.headers import DEFAULT_HEADERS
 import plotly.express as px
 
 from stocktool import StockData, StockPrediction
+from stocktool.instrumentation import timer
+from .backtest import backtest
+from .cache import BarCache
+from .checkpoint import Checkpoint
+from .metrics import PortfolioMetrics
 
 class StockEvaluation:
     """
@@ -19,23 +21,26 @@ class StockEvaluation:
         asset (float): current asset, default initial is 100.
         date (timestamp): date already invested.
         stocks (list of str): list of stocks in the prediction model.
+        bars (BarCache): the open and close prices read so far.
+        metrics (PortfolioMetrics): the asset and the stocks bought on every invest day,
+                                    and the risk and performance metrics.
     """
-    def __init__(self, model, asset = 100):
+    def __init__(self, model, asset = 100, window = 30):
         """
         Initialize the class.
 
         parameters:
             model (StockPrediction): prediction model
             asset (float): initial asset, default would be 100.
+            window (int): number of days of prices read at once. Default is 30.
         """
         self.model = model
         self.asset = asset
         self.date = model.date_train
         self.stocks = self.model.stocks
-
-        expire_after = dt.timedelta(days=3)
-        session = requests_cache.CachedSession(cache_name='cache', expire_after=expire_after)
-        session.headers = DEFAULT_HEADERS
+        self.bars = BarCache(self.stocks, model.data, model.data.store, window,
+                             getattr(model.data, "workers", 1))
+        self.metrics = PortfolioMetrics(self.stocks, asset)
 
     def check_stocks(self, stocks):
         """
@@ -93,12 +98,14 @@ class StockEvaluation:
             if profit > 0:
                 profit_positive.append([profit, stock])
 
+        weights = np.zeros(len(self.stocks))
         if profit_max <= 0:
             print(f"On {date.strftime('%Y-%m-%d')}, we should not invest, "
                     + f"asset keeps {self.asset}")
         else:
             if not weighted:
                 new = self.get_return(date, stock_best) * self.asset
+                weights[self.stocks.index(stock_best)] = 1
                 print(f"On {date.strftime('%Y-%m-%d')}, we invest the stock {stock_best}, "
                     f"and now the asset becomes {round(new, 5)}")
             else:
@@ -106,11 +113,14 @@ class StockEvaluation:
                 new = sum(self.get_return(date, stock) * self.asset * profit / total_profit
                             for profit, stock in profit_positive)
                 stocks = [stock for profit, stock in profit_positive]
+                for profit, stock in profit_positive:
+                    weights[self.stocks.index(stock)] = profit / total_profit
                 print(f"On {date.strftime('%Y-%m-%d')}, we invest on {len(profit_positive)}"
                         +f" stocks, which are {','.join(stocks)},"
                         +f" and asset becomes {round(new, 5)}")
             self.asset = new
 
+        self.metrics.record(date, self.asset, weights)
         self.date = date
 
     def get_return(self, date, stock):
@@ -124,8 +134,8 @@ class StockEvaluation:
         return:
             : (float) return if we buy 1 dollar.
         """
-        data = DataReader(stock, 'stooq', date, date)
-        val_open, val_close = data.iloc[0]["Open"], data.iloc[0]["Close"]
+        val_open = self.bars.get(stock, date, "Open")
+        val_close = self.bars.get(stock, date, "Close")
 
         return val_close / val_open
 
@@ -137,17 +147,27 @@ class StockEvaluation:
             date (timestamp): the date
             stock (str): stock symbol
         """
-        val = DataReader(stock, "stooq", date, date).iloc[0]["Open"]
+        val = self.bars.get(stock, date, "Open")
 
         return val
 
+    def bar_stats(self):
+        """
+        return the hits and misses of the price cache, and the last prefetch window.
+
+        return:
+            : (dict) hits, misses, prefetches, rows (number of prices read), start and
+              end (dates of the last prefetch)
+        """
+        return dict(self.bars.stats)
+
     def update(self, date):
         """
         update the predict model.
         """
         self.model.update(date, message = False)
 
-    def evaluate(self, days = 10, weighted = False, graph = False):
+    def evaluate(self, days = 10, weighted = False, graph = False, checkpoint = None):
         """
         keep invest for several days.
 
@@ -155,37 +175,103 @@ class StockEvaluation:
             days (int): number of days we would like to invest.
             weighted (bool): whether we shold use weighted investment
                              stragy in invest method.
+            checkpoint (Checkpoint or str): save the evaluation and the model to this
+                                            folder every few days, see resume. A str is
+                                            Checkpoint(checkpoint). Default is none.
         """
+        if isinstance(checkpoint, str):
+            checkpoint = Checkpoint(checkpoint)
         date = self.date
+        if checkpoint is not None:
+            checkpoint.start(self, days, weighted)
         if graph:
             index = [date]
             asset = [self.asset]
         for _ in range(days):
             date += pd.Timedelta(days = 1)
-            self.invest(date, weighted)
-            self.update(date)
+            with timer("invest"):
+                self.invest(date, weighted)
+            with timer("model_update"):
+                self.update(date)
+            if checkpoint is not None:
+                checkpoint.step(self, date)
             if graph:
                 index.append(date)
                 asset.append(self.asset)
 
         if graph:
-            graph_data = pd.DataFrame(data = {"date": index, "asset": asset})
+            self.plot_asset(pd.DataFrame(data = {"date": index, "asset": asset}), days)
 
-            fig = px.line(graph_data,x="date",y=list(graph_data.columns)[1:],
-                        title='Asset' ,render_mode='webg1')
+    def resume(folder, data = None, graph = False, every = None, workers = 1,
+               timeout = None, registry = None):
+        """
+        load the last checkpoint saved by evaluate in the folder, and evaluate the days
+        left, still saving checkpoints to the folder.
 
-            fig.update_xaxes(
-            rangeslider_visible=True,
-            rangeselector=dict(
-                buttons = self.get_button(days)
-                )
+        parameter:
+            folder (str): the checkpoint folder given to evaluate.
+            data (StockData): the stock data of the model, see StockPrediction.load.
+            graph (bool): whether we plot the asset of the days left.
+            every (int): number of days between checkpoints. Default is the same as the
+                         evaluation which saved the folder.
+            workers, timeout, registry: see StockPrediction.load
+
+        return:
+            : (StockEvaluation) the evaluation, on the end date of the evaluation.
+        """
+        manifest = Checkpoint.read_manifest(folder)
+        checkpoint = Checkpoint(folder, every or manifest["every"])
+        model, metrics = checkpoint.restore(data, workers, timeout, registry)
+        evaluation = StockEvaluation(model, manifest["asset"], manifest["window"])
+        evaluation.metrics = metrics
+        evaluation.date = pd.Timestamp(manifest["date"])
+        days = (pd.Timestamp(manifest["end"]) - evaluation.date).days
+        if days > 0:
+            evaluation.evaluate(days, manifest["weighted"], graph, checkpoint)
+        return evaluation
+
+    def backtest(self, days = 10, weighted = False, graph = False):
+        """
+        same as evaluate, but the prices of all the days are read at once and the
+        strategy is computed on arrays, see backtest.backtest. Nothing is printed.
+
+        parameter:
+            days (int): number of days we would like to invest.
+            weighted (bool): whether we shold use weighted investment
+                             stragy in invest method.
+            graph (bool): whether we plot the asset.
+
+        return:
+            : (DataFrame) indexed by date, columns asset and stocks (the stocks bought).
+        """
+        result = backtest(self, days, weighted)
+        if graph:
+            self.plot_asset(result[["asset"]].reset_index(), days)
+        return result
+
+    def plot_asset(self, graph_data, days):
+        """
+        helper function, plot the asset.
+
+        parameter:
+            graph_data (DataFrame): columns date and asset
+            days (int): number of days invested
+        """
+        fig = px.line(graph_data,x="date",y=list(graph_data.columns)[1:],
+                    title='Asset' ,render_mode='webg1')
+
+        fig.update_xaxes(
+        rangeslider_visible=True,
+        rangeselector=dict(
+            buttons = self.get_button(days)
             )
+        )
 
-            fig.update_layout(yaxis_title="Price (USD)",
-                  width=900,
-                  height=600)
+        fig.update_layout(yaxis_title="Price (USD)",
+              width=900,
+              height=600)
 
-            fig.show()
+        fig.show()
 
     def get_button(self, days):
         """
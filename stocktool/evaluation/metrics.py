@@ -0,0 +1,132 @@
+"""
+This is the code for the metrics of the evaluation: the equity, the positions and the risk
+"""
+import numpy as np
+
+from stocktool.model.buffer import SeriesBuffer
+
+class PortfolioMetrics:
+    """
+    Class for the metrics of an evaluation, updated on every invest day. The equity, the
+    return and the weight of every stock are kept in a SeriesBuffer, and the sums the
+    metrics need are updated with the new days only, so a day costs O(1).
+
+    parameters:
+        stocks (list of str): the stocks.
+        start (float): the asset before the first day.
+        periods (int): number of days in a year, for the annual volatility and ratios.
+        buffer (SeriesBuffer): columns equity, return and the weight of every stock, one
+                               row per invest day.
+        sums (dict): the running values: "mean" and "m2" of the returns (Welford),
+                     "downside" (sum of the squared negative returns), "peak" equity,
+                     "drawdown" (max drawdown), "invested" and "wins" (days), "turnover"
+                     (sum of the changes of the weights).
+        weights (np.ndarray): the weights of the last day.
+    """
+    def __init__(self, stocks, start = 100, periods = 252):
+        """
+        Initialize the class.
+
+        parameters:
+            stocks (list of str): the stocks
+            start (float): the asset before the first day. Default is 100.
+            periods (int): Default is 252 market open days in a year.
+        """
+        self.stocks = list(stocks)
+        self.start, self.periods = start, periods
+        self.buffer = SeriesBuffer(["equity", "return"] + self.stocks, "date", 256)
+        self.sums = {"mean": 0.0, "m2": 0.0, "downside": 0.0, "peak": float(start),
+                     "drawdown": 0.0, "invested": 0, "wins": 0, "turnover": 0.0}
+        self.weights = np.zeros(len(self.stocks))
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def record(self, date, asset, weights):
+        """
+        add one day.
+
+        parameters:
+            date (pd.Timestamp): the invest day
+            asset (float): the asset after the day
+            weights (array like): the part of the asset put in every stock that day, in
+                                  the order of stocks, all 0 if nothing is bought.
+        """
+        self.extend([date], [asset], np.asarray(weights, dtype = "float64")[None])
+
+    def extend(self, dates, assets, weights):
+        """
+        add several days at once, e.g. from backtest.
+
+        parameters:
+            dates (array like): the invest days
+            assets (array like): the asset after every day
+            weights (np.ndarray): shape (days, stocks), see record
+        """
+        assets = np.asarray(assets, dtype = "float64")
+        if not len(assets):
+            return
+        weights = np.asarray(weights, dtype = "float64").reshape(len(assets), len(self.stocks))
+        last = self.buffer.values[len(self.buffer) - 1, 0] if len(self.buffer) else self.start
+        returns = assets / np.concatenate([[last], assets[:-1]]) - 1
+
+        sums, count = self.sums, len(self.buffer)
+        ### merge the mean and the sum of squares of the new days (Chan et al.)
+        mean = returns.mean()
+        total = count + len(returns)
+        delta = mean - sums["mean"]
+        sums["m2"] += ((returns - mean) ** 2).sum() + delta ** 2 * count * len(returns) / total
+        sums["mean"] += delta * len(returns) / total
+        sums["downside"] += (np.minimum(returns, 0) ** 2).sum()
+
+        peaks = np.maximum.accumulate(np.concatenate([[sums["peak"]], assets]))[1:]
+        sums["drawdown"] = max(sums["drawdown"], (1 - assets / peaks).max())
+        sums["peak"] = peaks[-1]
+
+        invested = weights.sum(axis = 1) > 0
+        sums["invested"] += int(invested.sum())
+        sums["wins"] += int((invested & (returns > 0)).sum())
+        changes = np.abs(np.diff(np.vstack([self.weights, weights]), axis = 0)).sum()
+        sums["turnover"] += changes
+        self.weights = weights[-1].copy()
+
+        self.buffer.append(dates, np.column_stack([assets, returns, weights]))
+
+    def summary(self):
+        """
+        return the metrics of all the days so far.
+
+        return:
+            : (dict) days, final (asset), cumulative_return, volatility (annual),
+              sharpe and sortino (annual, no risk free rate), max_drawdown, hit_rate
+              (part of the invested days with a gain) and turnover (mean change of the
+              weights per day, 2 is selling everything and buying other stocks).
+        """
+        days, sums = len(self.buffer), self.sums
+        final = self.buffer.values[days - 1, 0] if days else self.start
+        std = np.sqrt(sums["m2"] / (days - 1)) if days > 1 else np.nan
+        downside = np.sqrt(sums["downside"] / days) if days else np.nan
+        scale = np.sqrt(self.periods)
+        return {"days": days, "final": final, "cumulative_return": final / self.start - 1,
+                "volatility": std * scale,
+                "sharpe": sums["mean"] / std * scale if std > 0 else np.nan,
+                "sortino": sums["mean"] / downside * scale if downside > 0 else np.nan,
+                "max_drawdown": sums["drawdown"],
+                "hit_rate": sums["wins"] / sums["invested"] if sums["invested"] else np.nan,
+                "turnover": sums["turnover"] / days if days else np.nan}
+
+    def frame(self):
+        """
+        return the equity, the return and the weights of every day, indexed by date. The
+        values are a view of the buffer, so they should not be changed.
+        """
+        return self.buffer.frame()
+
+    def to_parquet(self, path):
+        """
+        save frame to a Parquet file, it needs pyarrow or fastparquet.
+
+        parameter:
+            path (str): the file path
+        """
+        self.frame().to_parquet(path)
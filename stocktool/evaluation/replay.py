@@ -0,0 +1,298 @@
+"""
+This is the code for the replay engine, which runs the evaluation on a stream of daily bars
+"""
+import time
+import pandas as pd
+
+from stocktool import trading_calendar
+from stocktool.instrumentation import timer
+from stocktool.visualization.fetch import fetch_symbols
+from stocktool.visualization.panel import StockPanel
+
+PHASES = {"invest": "invest", "update": "model_update"}
+
+class SimulatedClock:
+    """
+    Class for the clock of a historical replay. Waiting moves the time at once, so the
+    replay goes straight from one session to the next.
+
+    parameters:
+        time (pd.Timestamp): the current time of the clock.
+    """
+    def __init__(self, start = "1990-01-01"):
+        """
+        Initialize the class.
+
+        parameters:
+            start (str or pd.Timestamp): the time the clock starts at.
+        """
+        self.time = pd.Timestamp(start)
+
+    def now(self):
+        """
+        return the current time.
+        """
+        return self.time
+
+    def wait_until(self, when):
+        """
+        move the clock to the given time, it never goes back.
+        """
+        self.time = max(self.time, pd.Timestamp(when))
+
+class LiveClock:
+    """
+    Class for the clock of a live run, the local time. Waiting sleeps until the time.
+    """
+    def now(self):
+        """
+        return the current time.
+        """
+        return pd.Timestamp.now()
+
+    def wait_until(self, when):
+        """
+        sleep until the given time, nothing if it is already past.
+        """
+        seconds = (pd.Timestamp(when) - self.now()).total_seconds()
+        if seconds > 0:
+            time.sleep(seconds)
+
+class PanelSource:
+    """
+    Class for the bars of a replay read from memory.
+
+    parameters:
+        panel (StockPanel): the prices of the stocks, it needs the columns used by the
+                            handlers, e.g. Open and Close.
+    """
+    def __init__(self, panel):
+        """
+        Initialize the class.
+
+        parameters:
+            panel (StockPanel or dict): the panel, or stock symbol -> price DataFrame
+                                        indexed by date, e.g. StockData.df.
+        """
+        if isinstance(panel, dict):
+            panel = StockPanel.from_frames(panel)
+        self.panel = panel
+
+    def bars(self, session):
+        """
+        return the bars of the session.
+
+        parameter:
+            session (pd.Timestamp): the market open day
+
+        return:
+            : (dict) stock symbol -> DataFrame with the row of the session, empty if the
+              stock has no price that day. None if the panel has no row for the session.
+        """
+        row = self.panel.dates.get_indexer([session])[0]
+        if row < 0:
+            return None
+        index = pd.DatetimeIndex([session], name = "Date")
+        frames = {}
+        for j, stock in enumerate(self.panel.stocks):
+            frame = pd.DataFrame(self.panel.values[:, row, j][None], index = index,
+                                 columns = self.panel.fields)
+            frames[stock] = frame.dropna()
+        return frames
+
+class StoreSource:
+    """
+    Class for the bars of a replay read through the store, `window` days at once. With a
+    LiveClock it is a live feed: today's bar is read again until every stock has it.
+
+    parameters:
+        stocks (list of str): the stocks.
+        store (BarStore): the store the prices are read through.
+        window (int): number of calendar days read at once.
+        workers (int): max number of concurrent downloads.
+        frames (dict): stock symbol -> the prices read last.
+        start, end (pd.Timestamp): the days the frames cover.
+    """
+    def __init__(self, stocks, store = None, window = 30, workers = 1):
+        """
+        Initialize the class.
+
+        parameters:
+            stocks (list of str): the stocks
+            store (BarStore): Default is the shared store.
+            window (int): Default is 30 days.
+            workers (int): Default is 1.
+        """
+        if window < 1:
+            raise ValueError("window should be at least 1.")
+        self.stocks, self.store = list(stocks), store
+        self.window, self.workers = window, workers
+        self.frames, self.start, self.end = {}, None, None
+
+    def bars(self, session):
+        """
+        return the bars of the session, see PanelSource.bars. None if today's bar of a
+        stock is not there yet.
+        """
+        today = pd.Timestamp.now().normalize()
+        if self.start is None or not self.start <= session <= self.end:
+            end = max(session, min(session + pd.Timedelta(days = self.window - 1), today))
+            frames, errors = fetch_symbols(self.stocks, session, end, workers = self.workers,
+                                           store = self.store)
+            if errors:
+                raise ValueError("; ".join(f"{name}: {err}" for name, err in errors.items()))
+            ### today's bar might not be complete yet, so it is read again next time
+            self.frames, self.start = frames, session
+            self.end = min(end, today - pd.Timedelta(days = 1))
+        frames = {stock: self.frames[stock].loc[session: session] for stock in self.stocks}
+        if session >= today and any(frame.empty for frame in frames.values()):
+            return None
+        return frames
+
+class Event:
+    """
+    Class for the event of one session, given to the handlers.
+
+    parameters:
+        kind (str): "invest" or "update"
+        session (pd.Timestamp): the market open day
+        time (pd.Timestamp): the time of the clock when the event is sent
+        bars (dict): stock symbol -> DataFrame with the row of the session
+    """
+    def __init__(self, kind, session, time, bars):
+        """
+        Initialize the class.
+        """
+        self.kind, self.session, self.time, self.bars = kind, session, time, bars
+
+class ReplayEngine:
+    """
+    Class for running an evaluation on a stream of bars. The clock goes from the close
+    of one market open day to the next, the source gives the bars of the day, and the
+    "invest" then the "update" handlers are called with them. With a SimulatedClock and
+    a PanelSource nothing waits and nothing is downloaded, with a LiveClock and a
+    StoreSource the same handlers run every day after the close.
+
+    parameters:
+        evaluation (StockEvaluation): the evaluation
+        source (PanelSource or StoreSource): where the bars come from
+        clock (SimulatedClock or LiveClock): when the sessions happen
+        weighted (bool): see StockEvaluation.invest
+        close (pd.Timedelta): time of the day the bars of a session are read
+        poll (float): seconds to wait before asking the source again for missing bars
+        retries (int): number of times to ask the source again
+        handlers (dict): "invest" or "update" -> list of functions called with the Event
+        records (list of dict): the session and the asset after every session
+    """
+    def __init__(self, evaluation, source = None, clock = None, weighted = False,
+                 close = "16:30", poll = 300, retries = 12):
+        """
+        Initialize the class.
+
+        parameters:
+            evaluation (StockEvaluation): the evaluation, its model is trained until the
+                                          last invest day.
+            source: Default is a StoreSource on the store of the model data.
+            clock: Default is a SimulatedClock at the last invest day.
+            weighted (bool): Default is False.
+            close (str): local time the bars of a day are complete. Default is 16:30.
+            poll (float): Default is 5 minutes.
+            retries (int): Default is 12, so an hour with the default poll.
+        """
+        self.evaluation = evaluation
+        model = evaluation.model
+        if source is None:
+            source = StoreSource(model.stocks, model.data.store, evaluation.bars.window,
+                                 getattr(model.data, "workers", 1))
+        self.source = source
+        self.clock = clock if clock is not None else SimulatedClock(evaluation.date)
+        self.weighted = weighted
+        self.close = pd.Timedelta(close + ":00")
+        self.poll, self.retries = poll, retries
+        self.handlers = {"invest": [self.invest], "update": [self.update]}
+        self.records = []
+
+    def on(self, kind, handler, replace = False):
+        """
+        add a handler.
+
+        parameters:
+            kind (str): "invest" or "update"
+            handler (function): called with the Event after the handlers added before
+            replace (bool): remove the other handlers of the kind first, e.g. for another
+                            invest strategy. Default is False.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"kind should be one of {list(self.handlers)}.")
+        if replace:
+            self.handlers[kind] = []
+        self.handlers[kind].append(handler)
+
+    def invest(self, event):
+        """
+        the default invest handler, StockEvaluation.invest with the prices of the event.
+        """
+        for stock, frame in event.bars.items():
+            self.evaluation.bars.add(stock, frame, event.session, event.session)
+        self.evaluation.invest(event.session, self.weighted)
+
+    def update(self, event):
+        """
+        the default update handler, StockPrediction.update with the bars of the event.
+        """
+        self.evaluation.model.update(event.session, message = False, bars = event.bars)
+
+    def sessions(self, end = None):
+        """
+        helper function, yield the market open days after the last invest day.
+        """
+        calendar = trading_calendar()
+        session = calendar.next_session(self.evaluation.date + pd.Timedelta(days = 1))
+        while end is None or session <= end:
+            yield session
+            session = calendar.next_session(session + pd.Timedelta(days = 1))
+
+    def bars(self, session):
+        """
+        helper function, return the bars of the session, waiting for them if needed.
+        """
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.clock.wait_until(self.clock.now() + pd.Timedelta(seconds = self.poll))
+            bars = self.source.bars(session)
+            if bars is not None:
+                return bars
+        raise ValueError(f"No bars on {session.strftime('%Y-%m-%d')}.")
+
+    def dispatch(self, event):
+        """
+        call the handlers of the event.
+        """
+        for handler in self.handlers[event.kind]:
+            with timer(PHASES[event.kind]):
+                handler(event)
+
+    def run(self, end = None, limit = None):
+        """
+        replay the sessions.
+
+        parameters:
+            end (str or pd.Timestamp): the last day. Default is no end, it runs until it
+                                       is stopped, e.g. live.
+            limit (int): max number of sessions. Default is no limit.
+
+        return:
+            : (DataFrame) indexed by date, the asset after every session replayed.
+        """
+        end = None if end is None else pd.Timestamp(end)
+        start = len(self.records)
+        for number, session in enumerate(self.sessions(end)):
+            if limit is not None and number >= limit:
+                break
+            self.clock.wait_until(session + self.close)
+            bars = self.bars(session)
+            for kind in ("invest", "update"):
+                self.dispatch(Event(kind, session, self.clock.now(), bars))
+            self.records.append({"date": session, "asset": self.evaluation.asset})
+        records = pd.DataFrame(self.records[start:], columns = ["date", "asset"])
+        return records.set_index("date")
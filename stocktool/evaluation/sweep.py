@@ -0,0 +1,185 @@
+"""
+This is the code for the sweep over the strategy settings, on forecasts computed once
+"""
+import itertools
+import numpy as np
+import pandas as pd
+
+from stocktool import trading_calendar
+from stocktool.model.parallel import run_jobs
+from .backtest import load_prices, strategy, walk_forward
+
+def score(values, sessions, stocks, config):
+    """
+    run one strategy setting on the forecast and price arrays.
+
+    parameters:
+        values (np.ndarray): shape (3, sessions, stocks), the forecast, open and close
+        sessions (np.ndarray): datetime64 market open days of the rows
+        stocks (list of str): the stocks of the columns
+        config (dict): weighted, asset, stocks (tuple), threshold, start and end
+
+    return:
+        : (dict) final asset, total return, number of days invested and the max drawdown
+    """
+    columns = [stocks.index(stock) for stock in config["stocks"]]
+    left = np.searchsorted(sessions, np.datetime64(config["start"]), side = "left")
+    right = np.searchsorted(sessions, np.datetime64(config["end"]), side = "right")
+    forecast, open_, close = (array[left:right][:, columns] for array in values)
+    growth, bought = strategy(forecast, open_, close, config["weighted"], config["threshold"])
+    asset = np.multiply.accumulate(np.concatenate([[config["asset"]], growth]))
+    drawdown = 1 - asset / np.maximum.accumulate(asset)
+    return {"final": asset[-1], "return": asset[-1] / config["asset"] - 1,
+            "invested": int(bought.any(axis = 1).sum()), "max_drawdown": drawdown.max()}
+
+def shared_module():
+    """
+    helper function, return multiprocessing.shared_memory, None before Python 3.8.
+    """
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        return None
+    return shared_memory
+
+def score_chunk(values, sessions, stocks, configs):
+    """
+    run several settings on the arrays, see score.
+
+    parameters:
+        values, sessions, stocks: see score
+        configs (list of dict): the settings
+    """
+    return [score(values, sessions, stocks, config) for config in configs]
+
+def score_shared(name, shape, sessions, stocks, configs):
+    """
+    run several settings on the arrays in a shared memory block, in a worker process.
+
+    parameters:
+        name (str): name of the shared memory block
+        shape (tuple): shape of the arrays, (3, sessions, stocks)
+        sessions, stocks: see score
+        configs (list of dict): the settings
+    """
+    block = shared_module().SharedMemory(name = name)
+    values = np.ndarray(shape, dtype = "float64", buffer = block.buf)
+    values.flags.writeable = False
+    try:
+        return score_chunk(values, sessions, stocks, configs)
+    finally:
+        ### the array must be released before the block is closed
+        del values
+        block.close()
+
+class StrategySweep:
+    """
+    Class for comparing the invest strategies over many settings. The forecasts and the
+    prices are computed once, as in StockEvaluation.backtest, then every setting is run
+    on the same arrays, which the worker processes read from shared memory (Python 3.8
+    or newer, otherwise every job gets a copy of the arrays).
+
+    parameters:
+        sessions (pd.DatetimeIndex): the market open days
+        stocks (list of str): the stocks of the model
+        values (np.ndarray): shape (3, sessions, stocks), the forecast close, the open and
+                             the close of every stock on every day
+        errors (dict): chunk number -> exception, for the settings that failed in run
+    """
+    def __init__(self, model, days = 30):
+        """
+        Initialize the class. The model is walked forward through the days, as evaluate
+        does, so it is trained until the last day afterwards.
+
+        parameters:
+            model (StockPrediction): the prediction model
+            days (int): number of calendar days after the last train day. Default is 30.
+        """
+        dates = pd.date_range(model.date_train, periods = days + 1)
+        self.sessions = trading_calendar().session_range(dates[1], dates[-1])
+        if not len(self.sessions):
+            raise ValueError("The market is not open on any of the days.")
+        self.stocks = list(model.stocks)
+        frames, panel = load_prices(model, self.sessions)
+        forecast = walk_forward(model, self.sessions, frames)
+        self.values = np.stack([forecast, panel.values[0], panel.values[1]])
+        self.errors = {}
+
+    def grid(self, weighted = (False, True), asset = (100,), stocks = None,
+             threshold = (0.0,), periods = None):
+        """
+        return every combination of the given settings.
+
+        parameters:
+            weighted (tuple of bool): Default is both strategies.
+            asset (tuple of float): starting asset. Default is 100.
+            stocks (list of list of str): stock subsets. Default is all the stocks.
+            threshold (tuple of float): min predicted profit to buy. Default is 0.
+            periods (list of tuple): (start, end) dates. Default is all the days.
+
+        return:
+            : (list of dict) one setting per combination
+        """
+        if stocks is None:
+            stocks = [self.stocks]
+        if periods is None:
+            periods = [(self.sessions[0], self.sessions[-1])]
+        configs = []
+        for mode, money, subset, limit, (start, end) in itertools.product(
+                weighted, asset, stocks, threshold, periods):
+            if not subset or any(stock not in self.stocks for stock in subset):
+                raise ValueError(f"{subset} should be a non-empty subset of {self.stocks}.")
+            configs.append({"weighted": mode, "asset": money, "stocks": tuple(subset),
+                            "threshold": limit, "start": pd.Timestamp(start),
+                            "end": pd.Timestamp(end)})
+        return configs
+
+    def run(self, configs = None, workers = 1, **grid):
+        """
+        run every setting and rank them by the final asset.
+
+        parameters:
+            configs (list of dict): the settings. Default is self.grid(**grid).
+            workers (int): number of worker processes. Default is 1.
+            grid: see grid, e.g. run(threshold = (0, 0.01), workers = 4)
+
+        return:
+            : (DataFrame) one row per setting with columns weighted, asset, stocks,
+              threshold, start, end, final, return, invested (days) and max_drawdown,
+              sorted by final asset, the best first.
+        """
+        if configs is None:
+            configs = self.grid(**grid)
+        sessions = self.sessions.values
+        ### a few chunks per worker, so the settings are sent in a few messages
+        chunks = np.array_split(np.arange(len(configs)), max(1, min(len(configs),
+                                                                    4 * workers)))
+        batches = {i: [configs[j] for j in chunk] for i, chunk in enumerate(chunks)}
+        shared_memory = shared_module() if workers > 1 else None
+        if shared_memory is None:
+            jobs = {i: (self.values, sessions, self.stocks, batch)
+                    for i, batch in batches.items()}
+            results, self.errors = run_jobs(score_chunk, jobs, workers)
+        else:
+            block = shared_memory.SharedMemory(create = True, size = self.values.nbytes)
+            try:
+                shared = np.ndarray(self.values.shape, dtype = "float64", buffer = block.buf)
+                shared[:] = self.values
+                jobs = {i: (block.name, self.values.shape, sessions, self.stocks, batch)
+                        for i, batch in batches.items()}
+                results, self.errors = run_jobs(score_shared, jobs, workers)
+                del shared
+            finally:
+                block.close()
+                block.unlink()
+
+        rows = []
+        for i, chunk in enumerate(chunks):
+            for j, result in zip(chunk, results.get(i, [])):
+                config = dict(configs[j], stocks = ",".join(configs[j]["stocks"]))
+                rows.append({**config, **result})
+        columns = ["weighted", "asset", "stocks", "threshold", "start", "end", "final",
+                   "return", "invested", "max_drawdown"]
+        table = pd.DataFrame(rows, columns = columns)
+        return table.sort_values("final", ascending = False, kind = "stable",
+                                 ignore_index = True)
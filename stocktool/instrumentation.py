@@ -0,0 +1,403 @@
+"""
+This is the code for the timers and counters of the downloads, fit, update and predict
+"""
+import cProfile
+import contextlib
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+import pandas as pd
+
+STATE = {"instruments": None, "profiling": 0}
+OFF = contextlib.nullcontext()
+
+class Instruments:
+    """
+    Class for the timers and counters of every stock and phase, e.g. the seconds the
+    fit of each stock took or the number of downloads. It only records while it is
+    turned on, see enable.
+
+    parameters:
+        timers (dict): (symbol, phase) -> [count, seconds, max seconds]. The symbol is ""
+                       for the phases which are not about one stock, e.g. "calendar".
+        counters (dict): (symbol, name) -> value, e.g. ("AAPL", "bytes_fetched").
+        profiles (list of Capture): the captures taken while it was on.
+        sinks (list): every timer and counter is also passed to sink.emit(event), and
+                      sink.close(instruments) is called when it is turned off.
+    """
+    def __init__(self, sinks = None):
+        """
+        Initialize the class.
+
+        parameter:
+            sinks (list): MemorySink, JsonLinesSink or PrometheusSink. Default is none,
+                          the summary is only kept in memory.
+        """
+        self.timers, self.counters = {}, {}
+        self.profiles = []
+        self.sinks = list(sinks or [])
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if STATE["instruments"] is self:
+            disable()
+        else:
+            self.close()
+
+    def emit(self, kind, name, symbol, value):
+        """
+        helper function, pass one measurement to the sinks.
+        """
+        if not self.sinks:
+            return
+        event = {"time": time.time(), "kind": kind, "name": name, "symbol": symbol,
+                 "value": value}
+        for sink in self.sinks:
+            sink.emit(event)
+
+    def record(self, phase, symbol, seconds):
+        """
+        add the seconds one phase took.
+
+        parameters:
+            phase (str): e.g. "fit", "update", "predict" or "fetch"
+            symbol (str): stock symbol, "" if it is not about one stock
+            seconds (float): how long it took
+        """
+        with self.lock:
+            entry = self.timers.setdefault((symbol, phase), [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            self.emit("timer", phase, symbol, seconds)
+
+    def count(self, name, symbol, value = 1):
+        """
+        add value to a counter.
+
+        parameters:
+            name (str): e.g. "datareader_calls", "bytes_fetched" or "cache_hits"
+            symbol (str): stock symbol, "" if it is not about one stock
+            value (int): Default is 1.
+        """
+        with self.lock:
+            self.counters[(symbol, name)] = self.counters.get((symbol, name), 0) + value
+            self.emit("counter", name, symbol, value)
+
+    def summary(self):
+        """
+        return the timers.
+
+        return:
+            : (DataFrame) indexed by symbol and phase, columns count, seconds (total),
+              mean and max.
+        """
+        with self.lock:
+            rows = [(symbol, phase, *entry) for (symbol, phase), entry in self.timers.items()]
+        summary = pd.DataFrame(rows, columns = ["symbol", "phase", "count", "seconds", "max"])
+        summary.insert(4, "mean", summary["seconds"] / summary["count"])
+        return summary.set_index(["symbol", "phase"]).sort_index()
+
+    def counts(self):
+        """
+        return the counters.
+
+        return:
+            : (DataFrame) indexed by symbol and name, column value.
+        """
+        with self.lock:
+            rows = [(symbol, name, value) for (symbol, name), value in self.counters.items()]
+        counts = pd.DataFrame(rows, columns = ["symbol", "name", "value"])
+        return counts.set_index(["symbol", "name"]).sort_index()
+
+    def prometheus(self):
+        """
+        return the timers and counters in the Prometheus text format.
+        """
+        with self.lock:
+            timers, counters = dict(self.timers), dict(self.counters)
+        lines = ["# TYPE stocktool_phase_calls_total counter"]
+        lines += [f"stocktool_phase_calls_total{labels(symbol, phase = phase)} {entry[0]}"
+                  for (symbol, phase), entry in sorted(timers.items())]
+        lines.append("# TYPE stocktool_phase_seconds_total counter")
+        lines += [f"stocktool_phase_seconds_total{labels(symbol, phase = phase)} {entry[1]:.6f}"
+                  for (symbol, phase), entry in sorted(timers.items())]
+        for name in sorted({name for _, name in counters}):
+            metric = "stocktool_" + re.sub(r"[^a-zA-Z0-9_]", "_", name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines += [f"{metric}{labels(symbol)} {value}"
+                      for (symbol, key), value in sorted(counters.items()) if key == name]
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        """
+        close the sinks, e.g. write the Prometheus file.
+        """
+        for sink in self.sinks:
+            sink.close(self)
+
+def labels(symbol, **extra):
+    """
+    helper function, return the Prometheus labels of a metric.
+    """
+    text = []
+    for key, value in {"symbol": symbol, **extra}.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        text.append(f'{key}="{value}"')
+    return "{" + ",".join(text) + "}"
+
+class MemorySink:
+    """
+    Class for the sink which keeps every event in a list.
+
+    parameters:
+        events (list of dict): time, kind ("timer" or "counter"), name, symbol and value.
+    """
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+    def close(self, instruments):
+        pass
+
+class JsonLinesSink:
+    """
+    Class for the sink which appends every event to a file, one JSON object per line.
+
+    parameters:
+        path (str): the file path
+    """
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.file = None
+
+    def emit(self, event):
+        if self.file is None:
+            ### kept open until close, so every event is not a new open
+            self.file = open(self.path, "a", encoding = "utf-8")  # pylint: disable=R1732
+        self.file.write(json.dumps(event) + "\n")
+
+    def close(self, instruments):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+class PrometheusSink:
+    """
+    Class for the sink which writes the totals in the Prometheus text format when the
+    instruments are turned off, e.g. for the textfile collector of node_exporter.
+
+    parameters:
+        path (str): the file path, replaced atomically.
+    """
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+
+    def emit(self, event):
+        pass
+
+    def close(self, instruments):
+        temp = self.path + ".tmp"
+        with open(temp, "w", encoding = "utf-8") as file:
+            file.write(instruments.prometheus())
+        os.replace(temp, self.path)
+
+def enable(sinks = None):
+    """
+    turn the instruments on, the ones already on are turned off first. Can be used as
+    `with enable() as instruments:`.
+
+    parameter:
+        sinks (list): see Instruments
+
+    return:
+        : (Instruments) the new instruments
+    """
+    disable()
+    STATE["instruments"] = Instruments(sinks)
+    return STATE["instruments"]
+
+def disable():
+    """
+    turn the instruments off and close their sinks.
+
+    return:
+        : (Instruments) the instruments which were on, None if they were off.
+    """
+    instruments, STATE["instruments"] = STATE["instruments"], None
+    if instruments is not None:
+        instruments.close()
+    return instruments
+
+def current():
+    """
+    return the instruments which are on, None if they are off.
+    """
+    return STATE["instruments"]
+
+class Timer:
+    """
+    Class for a with block which records the seconds it took.
+    """
+    def __init__(self, instruments, phase, symbol):
+        self.instruments, self.phase, self.symbol = instruments, phase, symbol
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.instruments.record(self.phase, self.symbol, time.perf_counter() - self.start)
+
+def timer(phase, symbol = ""):
+    """
+    return a with block which records the seconds the phase took. When the instruments
+    are off it is a shared block which does nothing.
+    """
+    instruments = STATE["instruments"]
+    if instruments is None:
+        return OFF
+    return Timer(instruments, phase, symbol)
+
+def record(phase, symbol, seconds):
+    """
+    record seconds measured elsewhere, e.g. in a worker process. Nothing is done when
+    the instruments are off.
+    """
+    instruments = STATE["instruments"]
+    if instruments is not None:
+        instruments.record(phase, symbol, seconds)
+
+def count(name, symbol = "", value = 1):
+    """
+    add value to a counter. Nothing is done when the instruments are off.
+    """
+    instruments = STATE["instruments"]
+    if instruments is not None:
+        instruments.count(name, symbol, value)
+
+class Capture:
+    """
+    Class for a with block which runs under cProfile, and tracemalloc if memory is on.
+    cProfile cannot run twice at once, so a capture inside another one only records
+    its seconds. The capture is added to the profiles of the current instruments.
+
+    parameters:
+        label (str): e.g. "StockPrediction.update"
+        memory (bool): whether the peak memory is measured, which is much slower.
+        seconds (float): how long the block took.
+        stats (pstats.Stats): the profile, None for a capture inside another one.
+        peak (int): peak bytes allocated in the block, above the bytes in use when it
+                    started. None if memory is off.
+    """
+    def __init__(self, label, memory = False):
+        self.label, self.memory = label, memory
+        self.seconds, self.stats, self.peak = None, None, None
+        self.profiler, self.tracing, self.base, self.start = None, False, 0, None
+
+    def __enter__(self):
+        outer = STATE["profiling"] == 0
+        STATE["profiling"] += 1
+        if outer and self.memory:
+            self.tracing = not tracemalloc.is_tracing()
+            if self.tracing:
+                tracemalloc.start()
+            elif hasattr(tracemalloc, "reset_peak"):
+                ### Python 3.9 or newer, before it the peak may be from before the block
+                tracemalloc.reset_peak()
+            self.base = tracemalloc.get_traced_memory()[0]
+        if outer:
+            self.profiler = cProfile.Profile()
+        self.start = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.seconds = time.perf_counter() - self.start
+        STATE["profiling"] -= 1
+        if self.profiler is not None:
+            self.stats = pstats.Stats(self.profiler)
+            if self.memory:
+                self.peak = tracemalloc.get_traced_memory()[1] - self.base
+                if self.tracing:
+                    tracemalloc.stop()
+        instruments = STATE["instruments"]
+        if instruments is not None:
+            with instruments.lock:
+                instruments.profiles.append(self)
+
+    def top(self, lines = 10, sort = "cumulative"):
+        """
+        return the functions which took the most time as text.
+
+        parameters:
+            lines (int): number of functions. Default is 10.
+            sort (str): pstats sort key. Default is "cumulative".
+        """
+        if self.stats is None:
+            return ""
+        text = io.StringIO()
+        pstats.Stats(self.profiler, stream = text).sort_stats(sort).print_stats(lines)
+        return text.getvalue()
+
+def capture(label, memory = False):
+    """
+    return a Capture, see the class.
+    """
+    return Capture(label, memory)
+
+def profile(obj, names = None, memory = False):
+    """
+    run every call of the public methods of obj inside a Capture, e.g.
+    profile(model, ["update", "predict"]). The methods are only replaced on obj, see
+    unprofile.
+
+    parameters:
+        obj: e.g. a StockPrediction or a StockEvaluation
+        names (list of str): the methods. Default is every public method.
+        memory (bool): whether the peak memory is measured. Default is False.
+
+    return:
+        : obj
+    """
+    kind = type(obj)
+    if names is None:
+        names = [name for name in dir(kind)
+                 if not name.startswith("_") and callable(getattr(kind, name))]
+    for name in names:
+        setattr(obj, name, profiled(getattr(obj, name), f"{kind.__name__}.{name}", memory))
+    return obj
+
+def profiled(method, label, memory):
+    """
+    helper function, return method wrapped in a Capture.
+    """
+    def wrapper(*args, **kwargs):
+        with Capture(label, memory):
+            return method(*args, **kwargs)
+
+    wrapper.profiled = True
+    return wrapper
+
+def unprofile(obj):
+    """
+    remove the wrappers added by profile.
+    """
+    for name, value in list(vars(obj).items()):
+        if getattr(value, "profiled", False):
+            delattr(obj, name)
+    return obj
@@ -1,3 +1,9 @@
+from .global_model import GlobalForecaster, GlobalPrediction
 from .model import StockPrediction
+from .policy import RefitPolicy
+from .registry import ModelRegistry, default_registry, set_default_registry
+from .tuning import tune
+from .validation import WalkForward
 
-__all__ = ["StockPrediction"]
\ No newline at end of file
+__all__ = ["GlobalForecaster", "GlobalPrediction", "ModelRegistry", "RefitPolicy",
+           "StockPrediction", "WalkForward", "default_registry", "set_default_registry", "tune"]
@@ -0,0 +1,145 @@
+"""
+This is the code for the time series buffer, the train data and predictions of the model
+"""
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+
+class SeriesBuffer:
+    """
+    Class for an append-only daily time series. The dates and values are kept in numpy
+    arrays with spare room at the end, which double in size when they are full, so
+    appending a day costs O(1) amortized.
+
+    parameters:
+        columns (list of str): names of the value columns.
+        name (str): name of the date index, e.g. "Date".
+        dates (np.ndarray): datetime64[ns] array, the first size entries are used.
+        values (np.ndarray): float64 array with shape (capacity, columns).
+        size (int): number of rows.
+    """
+    def __init__(self, columns, name = None, capacity = 64):
+        """
+        Initialize an empty buffer.
+
+        parameters:
+            columns (list of str): names of the value columns
+            name (str): name of the date index. Default is no name.
+            capacity (int): number of rows to allocate at first.
+        """
+        self.columns = list(columns)
+        self.name = name
+        self.dates = np.empty(capacity, dtype = "datetime64[ns]")
+        self.values = np.empty((capacity, len(self.columns)))
+        self.size = 0
+
+    def from_frame(frame, columns = None, name = None):
+        """
+        build the buffer from a DataFrame indexed by date.
+
+        parameters:
+            frame (DataFrame): the data, sorted by ascending date
+            columns (list of str): columns to keep, default is all of them.
+            name (str): name of the date index, default is the name of frame.index.
+        """
+        columns = list(frame.columns) if columns is None else list(columns)
+        name = frame.index.name if name is None else name
+        buffer = SeriesBuffer(columns, name, max(64, 2 * len(frame)))
+        buffer.append(frame.index.values, frame[columns].to_numpy(dtype = "float64"))
+        return buffer
+
+    def reserve(self, size):
+        """
+        helper function, make room for size rows, at least doubling the capacity.
+        """
+        if size <= len(self.dates):
+            return
+        capacity = max(size, 2 * len(self.dates))
+        dates = np.empty(capacity, dtype = self.dates.dtype)
+        values = np.empty((capacity, len(self.columns)))
+        dates[:self.size] = self.dates[:self.size]
+        values[:self.size] = self.values[:self.size]
+        self.dates, self.values = dates, values
+
+    def append(self, dates, values):
+        """
+        add rows at the end.
+
+        parameters:
+            dates (array like): the dates of the new rows
+            values (array like): shape (rows, columns), or (rows,) for one column
+        """
+        dates = np.asarray(dates, dtype = "datetime64[ns]").reshape(-1)
+        rows = len(dates)
+        values = np.asarray(values, dtype = "float64").reshape(rows, len(self.columns))
+        self.reserve(self.size + rows)
+        self.dates[self.size: self.size + rows] = dates
+        self.values[self.size: self.size + rows] = values
+        self.size += rows
+
+    def __len__(self):
+        return self.size
+
+    def last_date(self):
+        """
+        return the date of the last row.
+        """
+        return pd.Timestamp(self.dates[self.size - 1])
+
+    def frame(self, start = 0):
+        """
+        return the rows from start on as a DataFrame indexed by date. The values are a
+        view of the buffer, so they should not be changed.
+        """
+        index = pd.DatetimeIndex(self.dates[start:self.size], name = self.name)
+        return pd.DataFrame(self.values[start:self.size], index = index,
+                            columns = self.columns, copy = False)
+
+    def series(self, column, start = 0):
+        """
+        return one column from start on as a Series indexed by the row number, which is
+        how the models are fitted. The values are a view of the buffer.
+        """
+        j = self.columns.index(column)
+        return pd.Series(self.values[start:self.size, j], index = pd.RangeIndex(start, self.size),
+                         name = column, copy = False)
+
+def train_view(buffer):
+    """
+    the train data of a stock: columns Date and the value.
+    """
+    return buffer.frame().reset_index()
+
+def y_view(buffer):
+    """
+    the values the model of a stock is fitted on.
+    """
+    return buffer.series(buffer.columns[0])
+
+def frame_view(buffer):
+    """
+    the whole buffer as a DataFrame, e.g. the predictions of a stock.
+    """
+    return buffer.frame()
+
+class BufferViews(Mapping):
+    """
+    Read-only mapping from stock symbol to a pandas view of its buffer, the view is
+    made on every access.
+
+    parameters:
+        buffers (dict): stock symbol -> SeriesBuffer
+        view (callable): module level function, view(buffer) returns the pandas object.
+    """
+    def __init__(self, buffers, view):
+        self.buffers = buffers
+        self.view = view
+
+    def __getitem__(self, name):
+        return self.view(self.buffers[name])
+
+    def __iter__(self):
+        return iter(self.buffers)
+
+    def __len__(self):
+        return len(self.buffers)
@@ -0,0 +1,101 @@
+"""
+This is the code for the forecaster registry, the ML models StockPrediction can use
+"""
+import numpy as np
+from sktime.forecasting.arima import ARIMA
+from sktime.forecasting.ets import AutoETS
+from sktime.forecasting.naive import NaiveForecaster
+from sktime.forecasting.tbats import TBATS
+from sktime.forecasting.theta import ThetaForecaster
+
+FORECASTERS = {}
+
+def register_forecaster(name, build, refit = False, append = False):
+    """
+    add a forecaster which StockPrediction can use as its method.
+
+    parameters:
+        name (str): the method name, e.g. "TBATS"
+        build (callable): build(n_jobs) returns a new sktime forecaster which supports
+                          predict_interval. n_jobs is 1 when the stocks are already fitted
+                          in parallel, otherwise None.
+        refit (bool): True means the forecaster is fitted again on the whole train data
+                      instead of updated with the new rows, for forecasters whose update
+                      does not use the new rows.
+        append (bool): True means update with update_params = False keeps the fitted
+                       parameters and only adds the new rows, which is the cheap update
+                       of RefitPolicy. Otherwise the cheap update is a normal update.
+    """
+    FORECASTERS[name] = {"build": build, "refit": refit, "append": append}
+
+def check_forecaster(method):
+    """
+    raise ValueError if the method is not in the registry.
+    """
+    if method not in FORECASTERS:
+        raise ValueError(f"{method} is not a forecaster, choose from {', '.join(FORECASTERS)}.")
+
+def build_forecaster(method, n_jobs = None, params = None):
+    """
+    return a new forecaster of the given method.
+
+    parameters:
+        method (str): the method name, e.g. "TBATS" or "ETS"
+        n_jobs (int): number of cores the forecaster may use, None is its default.
+        params (dict): parameters to change from the default, e.g. {"sp": 21} for
+                       TBATS, see tuning.
+    """
+    check_forecaster(method)
+    forecaster = FORECASTERS[method]["build"](n_jobs)
+    if params:
+        forecaster.set_params(**params)
+    return forecaster
+
+def refit_on_update(method):
+    """
+    return whether the forecaster of the given method is fitted again on update.
+    """
+    check_forecaster(method)
+    return FORECASTERS[method]["refit"]
+
+def append_on_update(method):
+    """
+    return whether the forecaster of the given method can add new rows without fitting
+    its parameters again.
+    """
+    check_forecaster(method)
+    return FORECASTERS[method]["append"]
+
+def forecast(forecaster, days, level):
+    """
+    return the point forecast and the interval of the next days together.
+
+    parameters:
+        forecaster: a fitted forecaster
+        days (int): number of days to predict
+        level (float): confidence level of the interval
+
+    return:
+        : (np.ndarray) shape (days, 3), the columns are the prediction, low and high.
+    """
+    fitted = getattr(forecaster, "_forecaster", None)  # pylint: disable=protected-access
+    if isinstance(forecaster, TBATS) and hasattr(fitted, "forecast"):
+        ### the fitted tbats model gives the prediction and the interval in one pass,
+        ### predict and predict_interval would run the forecast twice
+        pred, interval = fitted.forecast(steps = days, confidence_level = level)
+        return np.column_stack([pred, interval["lower_bound"], interval["upper_bound"]])
+    fh = list(range(1, days + 1))
+    pred = forecaster.predict(fh = fh).to_numpy(dtype = "float64")
+    interval = forecaster.predict_interval(fh = fh, coverage = level).to_numpy(dtype = "float64")
+    return np.column_stack([pred, interval])
+
+### TBATS is accurate but slow, the others fit in milliseconds to a second
+register_forecaster("TBATS", lambda n_jobs: TBATS(use_box_cox = True, use_trend = True,
+                                                  use_arma_errors = True, sp = 5,
+                                                  n_jobs = n_jobs), append = True)
+register_forecaster("Naive", lambda n_jobs: NaiveForecaster(strategy = "last"), append = True)
+register_forecaster("Drift", lambda n_jobs: NaiveForecaster(strategy = "drift"), append = True)
+register_forecaster("ETS", lambda n_jobs: AutoETS(auto = True, n_jobs = n_jobs))
+register_forecaster("Theta", lambda n_jobs: ThetaForecaster(sp = 5), refit = True)
+### needs the optional pmdarima package
+register_forecaster("ARIMA", lambda n_jobs: ARIMA(order = (1, 1, 1), suppress_warnings = True))
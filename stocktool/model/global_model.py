@@ -0,0 +1,288 @@
+"""
+This is the code for the global model, one model for all the stocks at once
+"""
+import time
+import numpy as np
+import pandas as pd
+
+from stocktool import StockData, trading_calendar
+from stocktool.instrumentation import count, record
+from stocktool.visualization.panel import StockPanel
+from .buffer import SeriesBuffer
+from .model import StockPrediction
+from .policy import RefitPolicy
+
+class GlobalForecaster:
+    """
+    Class for one ridge regression over all the stocks. The next log return of a stock,
+    divided by its recent volatility, is predicted from its last lags log returns divided
+    by the same volatility, and from the weekday of the next day. The interval comes from
+    the quantiles of the residuals of all the stocks.
+
+    parameters:
+        lags (int): number of past returns in the features.
+        alpha (float): ridge penalty.
+        vol_window (int): number of returns the volatility is computed on.
+        stocks (list of str): the stocks, in the order of the columns.
+        gram, moment (np.ndarray): X'X and X'y of all the fitted rows.
+        beta (np.ndarray): the coefficients, lags for the returns and 5 for the weekdays.
+        residuals (np.ndarray): the latest residuals, at most max_residuals of them.
+        dates, log_prices, returns (np.ndarray): the last rows of the data, enough to
+                                                 build the features of the next rows.
+    """
+    def __init__(self, lags = 5, alpha = 1.0, vol_window = 20, max_residuals = 100000):
+        """
+        Initialize the class.
+
+        parameters:
+            lags (int): number of past returns. Default is 5.
+            alpha (float): ridge penalty. Default is 1.0.
+            vol_window (int): number of returns for the volatility. Default is 20.
+            max_residuals (int): number of residuals kept for the interval.
+        """
+        self.lags, self.alpha, self.vol_window = lags, alpha, vol_window
+        self.max_residuals = max_residuals
+        self.warmup = max(lags, vol_window)
+        self.stocks = []
+
+    def rows(self, dates, returns, first):
+        """
+        helper function, return the features X and the targets y of every stock whose
+        feature row is first or later. Rows with missing values are left out.
+
+        parameters:
+            dates (np.ndarray): datetime64 dates, starting self.warmup rows before first
+            returns (np.ndarray): log returns with shape (dates, stocks)
+            first (int): position of the first feature row, at least self.warmup
+        """
+        scales = pd.DataFrame(returns).rolling(self.vol_window).std().to_numpy()
+        rows = np.arange(first, len(returns) - 1)
+        scale = scales[rows]
+        lagged = np.stack([returns[rows - k] for k in range(self.lags)], axis = -1)
+        weekday = pd.DatetimeIndex(dates[rows + 1]).weekday.to_numpy()
+        days = np.broadcast_to((weekday[:, None] == np.arange(5))[:, None, :],
+                               (len(rows), returns.shape[1], 5))
+        features = np.concatenate([lagged / scale[..., None], days], axis = -1)
+        target = returns[rows + 1] / scale
+        features = features.reshape(-1, self.lags + 5)
+        target = target.reshape(-1)
+        keep = np.isfinite(features).all(axis = 1) & np.isfinite(target)
+        return features[keep], target[keep]
+
+    def keep_tail(self, dates, log_prices, returns):
+        """
+        helper function, keep the rows needed to build the next features.
+        """
+        self.dates = dates[-(self.warmup + 1):]
+        self.log_prices = log_prices[-(self.warmup + 1):]
+        self.returns = returns[-(self.warmup + 1):]
+
+    def solve(self, features, target):
+        """
+        helper function, add the rows to X'X and X'y, solve the ridge regression and
+        keep the new residuals.
+        """
+        self.gram += features.T @ features
+        self.moment += features.T @ target
+        self.beta = np.linalg.solve(self.gram + self.alpha * np.eye(len(self.gram)),
+                                    self.moment)
+        residuals = target - features @ self.beta
+        self.residuals = np.concatenate([self.residuals, residuals])[-self.max_residuals:]
+
+    def fit(self, dates, prices, stocks):
+        """
+        fit the model on the prices of all the stocks.
+
+        parameters:
+            dates (np.ndarray): the dates, sorted
+            prices (np.ndarray): shape (dates, stocks), NaN where a stock has no price
+            stocks (list of str): the stocks of the columns
+        """
+        if len(dates) < self.warmup + 2:
+            raise ValueError(f"The global model needs at least {self.warmup + 2} days of data.")
+        self.stocks = list(stocks)
+        dates = np.asarray(dates, dtype = "datetime64[ns]")
+        log_prices = np.log(np.asarray(prices, dtype = "float64"))
+        returns = np.vstack([np.full((1, len(self.stocks)), np.nan), np.diff(log_prices, axis = 0)])
+        size = self.lags + 5
+        self.gram, self.moment = np.zeros((size, size)), np.zeros(size)
+        self.residuals = np.empty(0)
+        self.solve(*self.rows(dates, returns, self.warmup))
+        self.keep_tail(dates, log_prices, returns)
+        return self
+
+    def update(self, dates, prices):
+        """
+        add new days to the model. Only the new rows are added to X'X and X'y, so the
+        cost does not grow with the length of the data.
+
+        parameters:
+            dates (np.ndarray): the new dates, after the fitted ones
+            prices (np.ndarray): shape (new dates, stocks)
+        """
+        dates = np.concatenate([self.dates, np.asarray(dates, dtype = "datetime64[ns]")])
+        log_prices = np.vstack([self.log_prices, np.log(np.asarray(prices, dtype = "float64"))])
+        returns = np.vstack([self.returns, np.diff(log_prices[len(self.dates) - 1:], axis = 0)])
+        self.solve(*self.rows(dates, returns, self.warmup))
+        self.keep_tail(dates, log_prices, returns)
+        return self
+
+    def predict(self, dates, level = 0.95):
+        """
+        return the prediction and the interval of every stock on the given days. Each
+        day is one matrix multiply for all the stocks.
+
+        parameters:
+            dates (np.ndarray): the next open days
+            level (float): confidence level of the interval
+
+        return:
+            : (np.ndarray) shape (days, stocks, 3), the prediction, low and high.
+        """
+        scale = np.std(self.returns[-self.vol_window:], axis = 0, ddof = 1)
+        lagged = self.returns[::-1][:self.lags].T
+        low_q, high_q = np.quantile(self.residuals, [(1 - level) / 2, (1 + level) / 2])
+        weekday = pd.DatetimeIndex(dates).weekday.to_numpy()
+        total = np.zeros(len(self.stocks))
+        result = np.empty((len(dates), len(self.stocks), 3))
+        for step in range(len(dates)):
+            days = np.broadcast_to(weekday[step] == np.arange(5), (len(self.stocks), 5))
+            features = np.concatenate([lagged / scale[:, None], days], axis = 1)
+            change = (features @ self.beta) * scale
+            total += change
+            lagged = np.concatenate([change[:, None], lagged[:, :-1]], axis = 1)
+            center = self.log_prices[-1] + total
+            spread = scale * np.sqrt(step + 1)
+            result[step] = np.exp(np.stack([center, center + low_q * spread,
+                                            center + high_q * spread], axis = 1))
+        return result
+
+class GlobalPrediction(StockPrediction):
+    """
+    Class for the prediction and update with one GlobalForecaster for all the stocks,
+    instead of one model per stock. It has the same predict, predict_frame, update and
+    pred as StockPrediction, and model[stock] is the shared GlobalForecaster.
+    """
+    def __init__(self, data = None, val = "Close", stocks = ["^DJI"], start = "", end = "",
+                 period = None, lags = 5, alpha = 1.0, vol_window = 20, lookback = None,
+                 policy = None):
+        """
+        Initialize the class.
+
+        parameters:
+            data (StockData): the stock data that we will build our model.
+            val: (str): The value we will use for the prediction. Default is "Close".
+            stocks, start, end, period : If data is not given, we will use these to
+                                         build a StockData class
+            lags, alpha, vol_window: see GlobalForecaster
+            lookback (int or str): see StockPrediction
+            policy (RefitPolicy): when update fits the model again on the train window
+                                  instead of adding the new rows. Default is
+                                  RefitPolicy(), which only adds new rows.
+        """
+        if not data:
+            self.data = StockData(stocks, start, end, period)
+        else:
+            self.data = data
+
+        self.stocks = list(self.data.stocks)
+        self.history, self.pred_history = {}, {}
+        self.make_views()
+        self.val, self.method = val, "Global"
+        self.methods = {stock: "Global" for stock in self.stocks}
+        self.failed = {}
+        ### one model, so every stock shares the same timings
+        shared = {}
+        self.timings = {stock: shared for stock in self.stocks}
+        self.forecasts = {}
+        self.workers, self.timeout, self.pool, self.registry = 1, None, None, None
+        self.lookback = StockPrediction.check_lookback(lookback)
+        self.policy = policy if policy is not None else RefitPolicy()
+
+        for stock in self.stocks:
+            self.history[stock] = SeriesBuffer.from_frame(self.data.df[stock], [val], "Date")
+            self.pred_history[stock] = SeriesBuffer([stock, stock + "-low", stock + "-high"])
+            self.date_pred = self.history[stock].last_date()
+            self.date_train = self.date_pred
+
+        self.fit_global(GlobalForecaster(lags, alpha, vol_window), "fit")
+        self.burn_in = len(self.history[self.stocks[0]])
+
+    def matrix(self, starts):
+        """
+        helper function, return the dates and the prices of all the stocks from the
+        given rows on, aligned by date.
+
+        parameter:
+            starts (dict): stock symbol -> first row
+        """
+        frames = {stock: self.history[stock].frame(start) for stock, start in starts.items()}
+        panel = StockPanel.from_frames(frames, self.stocks, [self.val])
+        return panel.dates.values, panel.values[0]
+
+    def fit_global(self, forecaster, step):
+        """
+        helper function, fit the forecaster on the train window of all the stocks.
+        """
+        dates, prices = self.matrix({stock: self.window_start(stock) for stock in self.stocks})
+        begin = time.perf_counter()
+        forecaster.fit(dates, prices, self.stocks)
+        self.store_global(forecaster, step, time.perf_counter() - begin)
+
+    def store_global(self, forecaster, step, seconds):
+        """
+        helper function, keep the forecaster and the seconds it took.
+        """
+        self.model = {stock: forecaster for stock in self.stocks}
+        self.timings[self.stocks[0]]["fit" if step == "refit" else step] = seconds
+        self.policy.record("global", self.date_train, step, seconds)
+        record(step, "global", seconds)
+
+    def update_models(self, new):
+        """
+        helper function, add the new rows to the global model or fit it again, as the
+        policy chooses.
+
+        parameter:
+            new (dict): stock symbol -> the new values, already added to the train data
+        """
+        if not new:
+            return
+        forecaster = self.model[self.stocks[0]]
+        ### a stock without new rows, e.g. halted, is NaN on the new days
+        dates, prices = self.matrix({stock: len(self.history[stock]) - len(new.get(stock, ()))
+                                     for stock in self.stocks})
+        error = None
+        if self.policy.drift is not None:
+            pred = forecaster.predict(dates, 0.95)[:, :, 0]
+            error = float(np.nanmean(np.abs(pred - prices) / np.abs(prices)))
+        if self.policy.choose("global", error) == "refit":
+            self.fit_global(GlobalForecaster(forecaster.lags, forecaster.alpha,
+                                             forecaster.vol_window), "refit")
+            return
+        begin = time.perf_counter()
+        forecaster.update(dates, prices)
+        self.store_global(forecaster, "update", time.perf_counter() - begin)
+
+    def predict_frame(self, days = 1, level = 0.95, stocks = None):
+        """
+        return the predicted values of the stocks as one DataFrame, see
+        StockPrediction.predict_frame. All the stocks are forecast together.
+        """
+        stocks = self.stocks if stocks is None else list(stocks)
+        start_day = self.history[self.stocks[0]].last_date()
+        index = pd.DatetimeIndex(trading_calendar().sessions_after(start_day, days))
+
+        forecaster = self.model[self.stocks[0]]
+        key = ("global", self.date_train, days, level)
+        if key not in self.forecasts:
+            begin = time.perf_counter()
+            self.forecasts[key] = forecaster.predict(index.values, level)
+            self.timings[self.stocks[0]]["predict"] = time.perf_counter() - begin
+            record("predict", "global", self.timings[self.stocks[0]]["predict"])
+        else:
+            count("forecast_cache_hits", "global")
+        positions = [forecaster.stocks.index(stock) for stock in stocks]
+        values = self.forecasts[key][:, positions, :].reshape(days, -1)
+        columns = [name for stock in stocks for name in (stock, stock + "-low", stock + "-high")]
+        return pd.DataFrame(values, index = index, columns = columns)
@@ -1,15 +1,24 @@
 """
-This is the code for ML part, we used the TBATS model
+This is the code for ML part, we used the TBATS model and the faster models in forecasters
 """
-import datetime as dt
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 import pandas as pd
-from pandas_datareader.data import DataReader
-import pandas_market_calendars as mcal
-import requests_cache
-from pandas_datareader.yahoo.headers import DEFAULT_HEADERS
-from sktime.forecasting.tbats import TBATS
 
-from stocktool import StockData
+from stocktool import StockData, get_bars, trading_calendar
+from stocktool.instrumentation import count, record
+from .buffer import BufferViews, SeriesBuffer, frame_view, train_view, y_view
+from .forecasters import append_on_update, build_forecaster, check_forecaster, forecast
+from .forecasters import refit_on_update
+from .parallel import fit_forecaster, run_jobs, update_forecaster
+from .policy import RefitPolicy
+from .registry import default_registry
+
+VERSION = 4
 
 class StockPrediction:
     """
@@ -17,51 +26,299 @@ class StockPrediction:
 
     parameters:
         data (StockData): build a StockData class variable based on users request.
+        history (dict): Use the stock symbol as the keys. Value is the SeriesBuffer of the
+                        train data, train and y are views of it.
         train (dict): Use the stock symbol as the keys. Value is the train data
                        for the current model, has two columns: Data and price.
         y (dict): Use the srock symbol. Stores the train data. Difference from train is that
                    in y we do not store Data. We will fit model based on y.
+        pred_history (dict): Use the stock symbol as the keys. Value is the SeriesBuffer of
+                             the predicted values, pred is a view of it.
         pred (dict): Use the stock symbol as the keys. Value stores the predicted values.
         val (str): the value we will use for prediction. Can be "Open" or "Close".
+        method (str or dict): the ML model, e.g. "TBATS", or one per stock.
+        methods (dict): Use the stock symbol as the keys. Value is the ML model of the stock.
+        timings (dict): Use the stock symbol as the keys. Value is a dict with the seconds
+                        the last "fit", "update" and "predict" of the stock took.
+        forecasts (dict): cache of the forecasts, keys are (stock, date_train, days, level)
+                          and values are arrays with columns prediction, low and high.
+                          It is cleared when update changes the models.
         date_pred, date_train (Timestamp): last date predicted and in train set.
+        failed (dict): Use the stock symbol as the keys. Value is the reason why the model
+                       of the stock could not be fitted or updated. These stocks are removed
+                       from the model.
+        workers (int): number of worker processes used to fit and update the models.
+        timeout (float): max seconds to fit or update the model of one stock.
+        pool (ProcessPoolExecutor): the worker processes, created on the first jobs and
+                                    kept for the next updates, see close.
+        registry (ModelRegistry): where the fitted models are saved and reused from.
+        lookback (int or pd.Timedelta): the models are fitted on the last lookback rows, or
+                                        the last lookback of time, of the train data.
+                                        None means all of it.
+        policy (RefitPolicy): decides between a cheap update and a refit on every update,
+                              and keeps the stats of the path each stock took.
 
     """
 
     def __init__(self, data = None, val = "Close", method = "TBATS",
-                    stocks = ["^DJI"], start = "", end = "", period = None):
+                    stocks = ["^DJI"], start = "", end = "", period = None,
+                    workers = 1, timeout = None, registry = None, lookback = None,
+                    policy = None):
         """
         Initialize the class.
 
         parameters:
         data (StockData): the stock data that we will build our model.
         val: (str): The value we will use for the prediction. Default is "Close".
-        method (str): ML model we will use. Default is TBATS.
+        method (str or dict): ML model we will use, see forecasters.FORECASTERS for the
+                              choices. Default is TBATS. A dict uses the stock symbol as
+                              the keys, and the stocks not in it use TBATS, e.g. TBATS for
+                              a shortlist and "ETS" for the rest.
         stocks, start, end, period : If data is not given, we will use these to build a
                                      a StockData class
+        workers (int): number of worker processes to fit the models of the stocks in
+                       parallel. Default is 1, which fits them one after another.
+        timeout (float): max seconds to fit the model of one stock, a stock which takes
+                         longer is reported in self.failed. Default is no limit.
+        registry (ModelRegistry): a stored model fitted on the same train data is reused
+                                  instead of fitted again, and a stored model fitted on
+                                  the start of the train data is updated with the new
+                                  rows only. Default is the shared registry.
+        lookback (int or str): max number of rows, e.g. 500, or max span of time, e.g.
+                               "730D", the models are fitted on. Default is no limit.
+        policy (RefitPolicy): when update refits a model on the train window instead of
+                              only adding the new rows. Default is RefitPolicy(), which
+                              never does, e.g. Drift or ETS only add the new rows.
         """
-        expire_after = dt.timedelta(days=3)
-        session = requests_cache.CachedSession(cache_name='cache', expire_after=expire_after)
-        session.headers = DEFAULT_HEADERS
-
         if not data:
             self.data = StockData(stocks, start, end, period)
         else:
             self.data = data
 
-        self.stocks = self.data.stocks
-        self.train, self.y = {}, {}
+        self.stocks = list(self.data.stocks)
+        self.history, self.pred_history = {}, {}
+        self.make_views()
         self.model = {}
-        self.pred = {}
-        self.val = val
+        self.val, self.method = val, method
+        if isinstance(method, dict):
+            self.methods = {stock: method.get(stock, "TBATS") for stock in self.stocks}
+        else:
+            self.methods = {stock: method for stock in self.stocks}
+        for name in set(self.methods.values()):
+            check_forecaster(name)
+        self.failed = {}
+        self.timings = {stock: {} for stock in self.stocks}
+        self.forecasts = {}
+        self.workers, self.timeout, self.pool = workers, timeout, None
+        self.registry = registry if registry is not None else default_registry()
+        self.lookback = StockPrediction.check_lookback(lookback)
+        self.policy = policy if policy is not None else RefitPolicy()
 
+        fit_jobs, update_jobs = {}, {}
         for stock in self.stocks:
-            self.train[stock], self.y[stock] = self.get_train_y(self.data.df[stock])
-            self.model[stock] = self.build_model(method)
-            self.model[stock].fit(self.y[stock])
-            self.pred[stock] = pd.DataFrame()
-            self.date_pred = self.train[stock]["Date"].iloc[-1]
+            method = self.methods[stock]
+            self.history[stock] = SeriesBuffer.from_frame(self.data.df[stock], [val], "Date")
+            self.pred_history[stock] = SeriesBuffer([stock, stock + "-low", stock + "-high"])
+            self.date_pred = self.history[stock].last_date()
             self.date_train = self.date_pred
-        self.burn_in = len(self.train[self.stocks[0]])
+
+            stored = None
+            if self.registry is not None:
+                stored = self.registry.find(stock, val, method, self.train_window(stock))
+            if stored is None:
+                fit_jobs[stock] = (self.build_model(method, stock), self.y_window(stock))
+                continue
+            count("registry_hits", stock)
+            ### keep the stored predictions up to the end of the train data
+            pred = stored["pred"]
+            if len(pred):
+                pred = pred[pred.index <= self.date_train]
+                self.pred_history[stock].append(pred.index.values, pred.values)
+            start = self.window_start(stock) + stored["rows"]
+            if start == len(self.history[stock]):
+                self.model[stock] = stored["model"]
+                self.policy.record(stock, self.date_train, "reuse", 0.0)
+            else:
+                full = self.y_window(stock) if refit_on_update(method) else None
+                update_jobs[stock] = (stored["model"], self.history[stock].series(val, start),
+                                      full)
+
+        fitted, errors = self.run_workers(fit_forecaster, fit_jobs)
+        updated, update_errors = self.run_workers(update_forecaster, update_jobs)
+        errors.update(update_errors)
+        self.store_models(fitted, "fit")
+        self.store_models(updated, "update")
+        try:
+            self.drop_failed(errors)
+        except ValueError:
+            ### the class is not built, so nothing else can shut the pool down
+            self.close()
+            raise
+        self.burn_in = len(self.history[self.stocks[0]])
+
+        if self.registry is not None:
+            for stock in list(fitted) + list(updated):
+                if stock in self.model:
+                    self.registry.save(stock, val, self.methods[stock], self.train_window(stock),
+                                       self.model[stock], self.pred[stock])
+
+    def check_lookback(lookback):
+        """
+        helper function, return the lookback as an int or a pd.Timedelta.
+        """
+        if isinstance(lookback, int):
+            if lookback < 1:
+                raise ValueError("lookback should be at least 1.")
+            return lookback
+        if lookback is None:
+            return None
+        return pd.Timedelta(lookback)
+
+    def window_start(self, stock):
+        """
+        helper function, return the first row of the train window of the given stock.
+        """
+        history = self.history[stock]
+        if self.lookback is None:
+            return 0
+        if isinstance(self.lookback, int):
+            return max(0, len(history) - self.lookback)
+        first = np.datetime64(history.last_date() - self.lookback)
+        return int(np.searchsorted(history.dates[:len(history)], first, side = "right"))
+
+    def train_window(self, stock):
+        """
+        return the train data the model of the given stock is fitted on, see lookback.
+        """
+        return self.history[stock].frame(self.window_start(stock)).reset_index()
+
+    def y_window(self, stock):
+        """
+        return the values the model of the given stock is fitted on, see lookback.
+        """
+        return self.history[stock].series(self.val, self.window_start(stock))
+
+    def make_views(self):
+        """
+        helper function, build train, y and pred as views of the buffers.
+        """
+        self.train = BufferViews(self.history, train_view)
+        self.y = BufferViews(self.history, y_view)
+        self.pred = BufferViews(self.pred_history, frame_view)
+
+    def run_workers(self, func, jobs):
+        """
+        helper function, run the jobs with the workers and the timeout of the class, see
+        parallel.run_jobs. The pool is created on the first jobs which need it and kept.
+
+        return:
+            results, errors: see parallel.run_jobs
+        """
+        if self.workers > 1 and len(jobs) > 1 and self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers = self.workers)
+        results, errors = run_jobs(func, jobs, self.workers, self.timeout, pool = self.pool)
+        if any(isinstance(err, BrokenProcessPool) for err in errors.values()):
+            ### a worker died, the next jobs get a new pool
+            self.close()
+        return results, errors
+
+    def close(self):
+        """
+        shut down the worker processes. They are started again if more jobs need them.
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def store_models(self, results, step):
+        """
+        helper function, keep the models returned by run_jobs and the seconds they took.
+
+        parameters:
+            results (dict): stock symbol -> (forecaster, seconds)
+            step (str): "fit", "update" or "refit"
+        """
+        for stock, (forecaster, seconds) in results.items():
+            self.model[stock] = forecaster
+            self.timings[stock]["fit" if step == "refit" else step] = seconds
+            self.policy.record(stock, self.date_train, step, seconds)
+            record(step, stock, seconds)
+
+    def drop_failed(self, errors):
+        """
+        remove the stocks whose model failed and record the reasons in self.failed.
+
+        parameter:
+            errors (dict): stock symbol -> exception
+        """
+        for stock, err in errors.items():
+            print(f"The model of {stock} failed and it is removed: {err!r}")
+            self.failed[stock] = err
+            for values in (self.history, self.pred_history, self.model, self.timings):
+                values.pop(stock, None)
+        self.stocks = [stock for stock in self.stocks if stock not in errors]
+        if not self.stocks:
+            raise ValueError("The models of all the stocks failed.")
+
+    def save(self, path):
+        """
+        save the whole class to a file: the fitted models, the train data, the
+        predictions, date_train and date_pred. The stock data is not saved, see load.
+
+        parameter:
+            path (str): the file path
+        """
+        state = {"version": VERSION, "class": type(self), "val": self.val, "method": self.method,
+                 "methods": self.methods, "timings": self.timings, "stocks": self.stocks,
+                 "history": self.history, "pred_history": self.pred_history,
+                 "model": self.model, "date_train": self.date_train,
+                 "date_pred": self.date_pred, "burn_in": self.burn_in,
+                 "lookback": self.lookback, "policy": self.policy}
+        temp = path + ".tmp"
+        with open(temp, "wb") as file:
+            pickle.dump(state, file)
+        os.replace(temp, path)
+
+    def load(path, data = None, workers = 1, timeout = None, registry = None):
+        """
+        load the class saved by save.
+
+        parameters:
+            path (str): the file path
+            data (StockData): the stock data of the model. Default is built from the
+                              stocks and the dates of the saved train data.
+            workers, timeout, registry: see __init__
+
+        return:
+            : (StockPrediction) the saved class, no model is fitted again.
+        """
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+        if state.get("version") != VERSION:
+            raise ValueError(f"{path} is saved by another version of StockPrediction.")
+
+        kind = state.get("class", StockPrediction)
+        prediction = kind.__new__(kind)
+        if not data:
+            first = min(pd.Timestamp(history.dates[0]) for history in state["history"].values())
+            data = StockData(state["stocks"], first.strftime("%Y-%m-%d"),
+                             state["date_train"].strftime("%Y-%m-%d"))
+        prediction.data = data
+        prediction.stocks = list(state["stocks"])
+        for key in ("val", "method", "methods", "timings", "history", "pred_history", "model",
+                    "date_train", "date_pred", "burn_in", "lookback", "policy"):
+            setattr(prediction, key, state[key])
+        prediction.make_views()
+        prediction.failed, prediction.forecasts = {}, {}
+        prediction.workers, prediction.timeout, prediction.pool = workers, timeout, None
+        prediction.registry = registry if registry is not None else default_registry()
+        return prediction
 
     def check_day_open(self, date):
         """
@@ -73,30 +330,64 @@ class StockPrediction:
         return:
             : (bool) True means the stock market is open on the given date. And False otherwise.
         """
-        nyse = mcal.get_calendar("NYSE")
-        start, end = date - pd.Timedelta(days = 5), date + pd.Timedelta(days = 5)
-        market_days = nyse.valid_days(start, end)
+        return trading_calendar().is_open(date)
 
-        return date.tz_localize("UTC") in market_days
+    def build_model(self, method, stock = None):
+        """
+        build the ml model, see forecasters.FORECASTERS for the choices. If the method
+        is tuned for the stock (see tuning.tune), the tuned parameters are used.
+        """
+        params = None
+        if stock is not None and self.registry is not None:
+            params = self.registry.load_config(stock, self.val, method)
+        ### the stocks are already fitted in parallel, so the model itself uses one core
+        return build_forecaster(method, 1 if self.workers > 1 else None, params)
 
-    def get_train_y(self, df):
+    def costs(self):
         """
-        Helper function for building train and y variable.
+        return the seconds the last fit, update and predict of each stock took.
 
-        parameter:
-            df (DataFrame): get from data.df[stock]
+        return:
+            : (DataFrame) one row per stock with columns method, fit, update and predict,
+              NaN if the step has not run (e.g. the model is reused from the registry).
         """
-        train = df.reset_index()[["Date", self.val]]
-        y = train[self.val]
-        return train, y
+        costs = pd.DataFrame([self.timings[stock] for stock in self.stocks], index = self.stocks,
+                             columns = ["fit", "update", "predict"], dtype = "float64")
+        costs.insert(0, "method", [self.methods[stock] for stock in self.stocks])
+        return costs
 
-    def build_model(self, method):
+    def predict_frame(self, days = 1, level = 0.95, stocks = None):
         """
-        build the ml model
+        return the predicted values of the stocks as one DataFrame. Every stock is
+        forecast once for the current model, later calls with the same days and level
+        read the cache.
+
+        parameters:
+            days (int): number of days we want to predict. Default value is 1.
+            level (float): confidence level for the prediction interval
+            stocks (list of str): default is all the stocks in the model.
+
+        return:
+            : (DataFrame) index is the next open days, columns are "<stock>",
+              "<stock>-low" and "<stock>-high" for every stock.
         """
-        if method == "TBATS":
-            forecaster = TBATS(use_box_cox=True, use_trend=True, use_arma_errors=True, sp = 5)
-        return forecaster
+        stocks = self.stocks if stocks is None else list(stocks)
+        start_day = self.history[self.stocks[0]].last_date()
+        index = pd.DatetimeIndex(trading_calendar().sessions_after(start_day, days))
+
+        values = np.empty((days, 3 * len(stocks)))
+        for i, stock in enumerate(stocks):
+            key = (stock, self.date_train, days, level)
+            if key not in self.forecasts:
+                begin = time.perf_counter()
+                self.forecasts[key] = forecast(self.model[stock], days, level)
+                self.timings[stock]["predict"] = time.perf_counter() - begin
+                record("predict", stock, self.timings[stock]["predict"])
+            else:
+                count("forecast_cache_hits", stock)
+            values[:, 3 * i: 3 * i + 3] = self.forecasts[key]
+        columns = [name for stock in stocks for name in (stock, stock + "-low", stock + "-high")]
+        return pd.DataFrame(values, index = index, columns = columns)
 
     def predict(self, days = 1, level = 0.95):
         """
@@ -108,36 +399,22 @@ class StockPrediction:
 
         """
         pred = {}
-        #interval = defaultdict(list)
-        fh = list(range(1,days+1))
+        frame = self.predict_frame(days, level)
+        index = frame.index
 
-        start_day = self.train[self.stocks[0]]["Date"].iloc[-1]
-        index = []
-        for _ in range(days):
-            start_day = StockData.next_open_day(start_day+pd.Timedelta(days = 1))
-            index.append(start_day)
-
-        for stock in self.stocks:
-            pred_val = self.model[stock].predict(fh = fh).values
-            temp = self.model[stock].predict_interval(fh = fh, coverage = level).values
-            low = [x[0] for x in temp]
-            high = [x[1] for x in temp]
-
-            pred[stock] = pd.DataFrame({stock : pred_val, stock + "-low" : low,
-                                        stock + "-high": high}, index = index)
+        for i, stock in enumerate(self.stocks):
+            pred[stock] = frame[[stock, stock + "-low", stock + "-high"]]
 
             ## Since this method might be called multiple times, we will only store values
             ## to self.pred if it haven't been stored.
             if index[0] > self.date_pred:
                 #update
-                pred_tomorrow = pd.DataFrame({stock : pred_val[:1], stock + "-low" : low[:1],
-                                        stock + "-high": high[:1]}, index = index[:1])
-                self.pred[stock] = pd.concat([self.pred[stock], pred_tomorrow])
+                self.pred_history[stock].append(index[:1], frame.values[:1, 3 * i: 3 * i + 3])
 
         self.date_pred = index[0]
         return pred
 
-    def update(self, date = None, message = True):
+    def update(self, date = None, message = True, bars = None):
         """
         update the train set until the given date.
 
@@ -145,6 +422,8 @@ class StockPrediction:
             date (str): will update the train set until the given date.
             message (bool): whether we will need to print the message. When update inside of
                             of other functions, message = False.
+            bars (dict): stock symbol -> price DataFrame indexed by date, e.g. read once
+                         for a whole backtest. Default is to read the new days with get_bars.
         """
         if not date:
             date = pd.Timestamp(pd.Timestamp.now().date()) ## take to be today
@@ -166,13 +445,53 @@ class StockPrediction:
                     +"no update needed")
             return
 
-        ### update model, train, y
+        ### update train, y
+        new = {}
         for stock in self.stocks:
-            data = DataReader(stock, 'stooq', self.date_train+pd.Timedelta(days = 1), date)
-            train, y = self.get_train_y(data)
-            self.train[stock] = pd.concat([self.train[stock], train]).reset_index(drop = True)
-            self.y[stock] = pd.concat([self.y[stock], y]).reset_index(drop = True)
-            self.model[stock].update(y = self.y[stock][-len(data):])
+            if bars is None:
+                data = get_bars(stock, self.date_train+pd.Timedelta(days = 1), date,
+                                store = self.data.store)
+            else:
+                data = bars[stock].loc[self.date_train+pd.Timedelta(days = 1): date]
+            if data.empty:
+                continue
+            start = len(self.history[stock])
+            self.history[stock].append(data.index.values, data[self.val].values)
+            new[stock] = self.history[stock].series(self.val, start)
+
+        ### update model
         self.date_train = date
+        self.update_models(new)
+        self.forecasts.clear()
 
         return
+
+    def update_models(self, new):
+        """
+        helper function, update or refit the model of every stock with new rows, as the
+        policy chooses.
+
+        parameter:
+            new (dict): stock symbol -> the new values, already added to the train data
+        """
+        refit_jobs, update_jobs = {}, {}
+        for stock, values in new.items():
+            error = None
+            if self.policy.drift is not None:
+                pred = forecast(self.model[stock], len(values), 0.95)[:, 0]
+                error = float(np.mean(np.abs(pred - values.values) / np.abs(values.values)))
+            method = self.methods[stock]
+            if self.policy.choose(stock, error) == "refit":
+                refit_jobs[stock] = (self.build_model(method, stock), self.y_window(stock))
+            elif refit_on_update(method):
+                update_jobs[stock] = (self.model[stock], values, self.y_window(stock))
+            else:
+                update_jobs[stock] = (self.model[stock], values, None,
+                                      not append_on_update(method))
+
+        refitted, errors = self.run_workers(fit_forecaster, refit_jobs)
+        updated, update_errors = self.run_workers(update_forecaster, update_jobs)
+        errors.update(update_errors)
+        self.store_models(refitted, "refit")
+        self.store_models(updated, "update")
+        self.drop_failed(errors)
@@ -0,0 +1,127 @@
+"""
+This is the code for fitting and updating the models of many stocks in a process pool
+"""
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+def call_with_timeout(func, timeout, *args):
+    """
+    call func(*args), raise TimeoutError if it runs longer than timeout seconds.
+    The timeout uses SIGALRM, so it is only applied in the main thread on Unix.
+
+    parameters:
+        func (callable): the function
+        timeout (float): seconds, None means no limit.
+    """
+    if not timeout or not hasattr(signal, "SIGALRM"):
+        return func(*args)
+
+    def handler(signum, frame):
+        raise TimeoutError(f"did not finish in {timeout} seconds")
+
+    try:
+        old = signal.signal(signal.SIGALRM, handler)
+    except ValueError:
+        ### not the main thread
+        return func(*args)
+    start = time.perf_counter()
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        result = func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old)
+    ### the alarm is lost if it is raised inside a callback which ignores exceptions
+    if time.perf_counter() - start > timeout:
+        raise TimeoutError(f"did not finish in {timeout} seconds")
+    return result
+
+def call_before(func, timeout, deadline, *args):
+    """
+    call func(*args) with a timeout that also ends at the deadline, raise TimeoutError
+    without calling it if the deadline has passed.
+
+    parameters:
+        func (callable): the function
+        timeout (float): seconds, None means no limit.
+        deadline (float): time.time() by which the call should end, None means no limit.
+    """
+    if deadline is not None:
+        left = deadline - time.time()
+        if left <= 0:
+            raise TimeoutError("the time budget is spent")
+        timeout = left if timeout is None else min(timeout, left)
+    return call_with_timeout(func, timeout, *args)
+
+def run_jobs(func, jobs, workers = 1, timeout = None, deadline = None, pool = None):
+    """
+    run func(*args) for every job. A job that raises or times out does not stop the
+    other jobs.
+
+    parameters:
+        func (callable): module level function, so it can be sent to the workers.
+        jobs (dict): job name (e.g. the stock symbol) -> tuple of arguments
+        workers (int): number of worker processes, 1 means run in this process.
+        timeout (float): max seconds for each job, None means no limit.
+        deadline (float): time.time() by which all the jobs should end. Jobs still running
+                          then are stopped and jobs not started fail with TimeoutError.
+        pool (ProcessPoolExecutor): the pool the jobs are sent to, it is not shut down.
+                                    Default is a new pool for these jobs.
+
+    return:
+        results (dict): job name -> return value, for the jobs that finished
+        errors (dict): job name -> exception, for the jobs that failed
+    """
+    results, errors = {}, {}
+    if workers <= 1 or len(jobs) <= 1:
+        for name, args in jobs.items():
+            try:
+                results[name] = call_before(func, timeout, deadline, *args)
+            except Exception as err:  # pylint: disable=broad-except
+                errors[name] = err
+        return results, errors
+
+    if pool is not None:
+        return collect(pool, func, jobs, timeout, deadline)
+    with ProcessPoolExecutor(max_workers = min(workers, len(jobs))) as pool:
+        return collect(pool, func, jobs, timeout, deadline)
+
+def collect(pool, func, jobs, timeout, deadline):
+    """
+    helper function, send the jobs to the pool and wait for them, see run_jobs.
+    """
+    results, errors, futures = {}, {}, {}
+    for name, args in jobs.items():
+        try:
+            futures[name] = pool.submit(call_before, func, timeout, deadline, *args)
+        except Exception as err:  # pylint: disable=broad-except
+            ### e.g. a pool broken by a worker which died
+            errors[name] = err
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as err:  # pylint: disable=broad-except
+            errors[name] = err
+    return results, errors
+
+def fit_forecaster(forecaster, y):
+    """
+    fit the forecaster on y, return it and the seconds the fit took.
+    """
+    start = time.perf_counter()
+    forecaster.fit(y)
+    return forecaster, time.perf_counter() - start
+
+def update_forecaster(forecaster, y, full = None, update_params = True):
+    """
+    update the fitted forecaster with the new values y, return it and the seconds the
+    update took. If full is given, the forecaster is fitted again on full instead.
+    update_params = False keeps the fitted parameters.
+    """
+    start = time.perf_counter()
+    if full is None:
+        forecaster.update(y = y, update_params = update_params)
+    else:
+        forecaster.fit(full)
+    return forecaster, time.perf_counter() - start
@@ -0,0 +1,81 @@
+"""
+This is the code for the refit policy, when the model of a stock is fitted again
+"""
+import pandas as pd
+
+class RefitPolicy:
+    """
+    Class which decides, for every update of a stock, between a cheap update of the
+    fitted model with the new rows and a full refit on the train window.
+
+    parameters:
+        every (int): refit after this many updates since the last fit. 1 refits on every
+                     update, None only refits on drift.
+        drift (float): refit when the mean absolute percentage error of the model's
+                       forecast of the new rows is larger than this, e.g. 0.05.
+                       None turns the check off.
+        count (dict): Use the stock symbol as the keys. Value is the number of updates
+                      since the last fit.
+        records (list of dict): one record per fit or update, with the stock, the date,
+                                the path taken and the seconds it took.
+    """
+    def __init__(self, every = None, drift = None):
+        """
+        Initialize the class.
+
+        parameters:
+            every (int): refit after this many updates. Default is None, so the models
+                         only add the new rows, and TBATS, which cannot, is fitted again
+                         by its update.
+            drift (float): error which triggers a refit. Default is no check.
+        """
+        if every is not None and every < 1:
+            raise ValueError("every should be at least 1.")
+        self.every = every
+        self.drift = drift
+        self.count = {}
+        self.records = []
+
+    def choose(self, stock, error = None):
+        """
+        return "refit" or "update" for the next update of the given stock.
+
+        parameters:
+            stock (str): stock symbol
+            error (float): mean absolute percentage error of the forecast of the new
+                           rows, only needed when drift is set.
+        """
+        if self.every is not None and self.count.get(stock, 0) + 1 >= self.every:
+            return "refit"
+        if self.drift is not None and error is not None and error > self.drift:
+            return "refit"
+        return "update"
+
+    def record(self, stock, date, path, seconds):
+        """
+        record the path a stock took.
+
+        parameters:
+            stock (str): stock symbol
+            date (pd.Timestamp): last date of the train data
+            path (str): "fit", "reuse", "update" or "refit"
+            seconds (float): how long it took
+        """
+        self.records.append({"stock": stock, "date": date, "path": path, "seconds": seconds})
+        if path in ("fit", "reuse", "refit"):
+            self.count[stock] = 0
+        else:
+            self.count[stock] = self.count.get(stock, 0) + 1
+
+    def stats(self):
+        """
+        return the number of times and the seconds each stock took each path.
+
+        return:
+            : (DataFrame) indexed by stock and path, columns count, seconds (total) and
+              last (date of the last time).
+        """
+        records = pd.DataFrame(self.records, columns = ["stock", "date", "path", "seconds"])
+        return records.groupby(["stock", "path"]).agg(count = ("seconds", "size"),
+                                                     seconds = ("seconds", "sum"),
+                                                     last = ("date", "max"))
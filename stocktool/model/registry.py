@@ -0,0 +1,196 @@
+"""
+This is the code for the model registry, so a fitted model is reused across sessions
+"""
+import hashlib
+import json
+import os
+import pickle
+from urllib.parse import quote
+
+VERSION = 1
+
+class ModelRegistry:
+    """
+    Class for the on-disk store of fitted models. Every (stock, value, method) has its own
+    directory, and every model in it is saved as <hash>.pkl with <hash>.json, where hash
+    is the hash of the train data the model is fitted on. The directory also keeps the
+    tuned parameters of the method in config.json, see tuning.
+
+    parameters:
+        root (str): directory of the registry.
+    """
+    def __init__(self, root):
+        """
+        Initialize the class.
+
+        parameters:
+            root (str): directory of the registry, created if it does not exist.
+        """
+        self.root = os.path.expanduser(root)
+        os.makedirs(self.root, exist_ok = True)
+
+    def data_hash(train, val):
+        """
+        helper function, return the hash of the dates and values of the train data.
+
+        parameters:
+            train (DataFrame): has two columns, Date and val
+            val (str): the value column
+        """
+        digest = hashlib.sha1()
+        digest.update(train["Date"].values.astype("datetime64[ns]").view("int64").tobytes())
+        digest.update(train[val].to_numpy(dtype = "float64").tobytes())
+        return digest.hexdigest()
+
+    def path(self, stock, val, method):
+        """
+        helper function, return the directory of the given stock, value and method.
+        """
+        return os.path.join(self.root, quote(f"{stock}-{val}-{method}", safe = ""))
+
+    def entries(self, stock, val, method):
+        """
+        return the meta data of the models stored for the given stock, value and method,
+        the model fitted on the most rows first.
+        """
+        path = self.path(stock, val, method)
+        if not os.path.isdir(path):
+            return []
+        entries = []
+        for file_name in os.listdir(path):
+            if not file_name.endswith(".json") or file_name == "config.json":
+                continue
+            try:
+                with open(os.path.join(path, file_name), encoding = "utf-8") as file:
+                    meta = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if meta.get("version") == VERSION:
+                entries.append(meta)
+        return sorted(entries, key = lambda meta: meta["rows"], reverse = True)
+
+    def find(self, stock, val, method, train):
+        """
+        return the stored model whose train data is the same as, or the start of, the
+        given train data.
+
+        parameters:
+            stock (str): stock symbol
+            val (str): the value column, e.g. "Close"
+            method (str): the ML model, e.g. "TBATS"
+            train (DataFrame): the train data, has two columns: Date and val
+
+        return:
+            : (dict) with keys "model", "pred" and "rows" (number of train rows the model
+              has seen), None if no stored model can be used.
+        """
+        path = self.path(stock, val, method)
+        for meta in self.entries(stock, val, method):
+            rows = meta["rows"]
+            if rows > len(train) or ModelRegistry.data_hash(train[:rows], val) != meta["hash"]:
+                continue
+            try:
+                with open(os.path.join(path, meta["hash"] + ".pkl"), "rb") as file:
+                    saved = pickle.load(file)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+                continue
+            return {"model": saved["model"], "pred": saved["pred"], "rows": rows}
+        return None
+
+    def save(self, stock, val, method, train, model, pred):
+        """
+        save the fitted model of the given stock. Stored models whose train data is the
+        start of this train data are removed, since this model replaces them.
+
+        parameters:
+            stock, val, method: see find
+            train (DataFrame): the train data the model is fitted on
+            model: the fitted forecaster
+            pred (DataFrame): the predictions stored so far
+        """
+        path = self.path(stock, val, method)
+        os.makedirs(path, exist_ok = True)
+        key = ModelRegistry.data_hash(train, val)
+        old = [meta["hash"] for meta in self.entries(stock, val, method)
+               if meta["rows"] < len(train)
+               and ModelRegistry.data_hash(train[:meta["rows"]], val) == meta["hash"]]
+
+        temp = os.path.join(path, key + ".pkl.tmp")
+        with open(temp, "wb") as file:
+            pickle.dump({"model": model, "pred": pred}, file)
+        os.replace(temp, os.path.join(path, key + ".pkl"))
+        meta = {"version": VERSION, "hash": key, "rows": len(train),
+                "start": train["Date"].iloc[0].strftime("%Y-%m-%d"),
+                "end": train["Date"].iloc[-1].strftime("%Y-%m-%d")}
+        temp = os.path.join(path, key + ".json.tmp")
+        with open(temp, "w", encoding = "utf-8") as file:
+            json.dump(meta, file)
+        os.replace(temp, os.path.join(path, key + ".json"))
+
+        for name in old:
+            for suffix in (".json", ".pkl"):
+                try:
+                    os.remove(os.path.join(path, name + suffix))
+                except OSError:
+                    pass
+
+    def load_config(self, stock, val, method):
+        """
+        return the tuned parameters of the method for the given stock, None if it is
+        not tuned.
+        """
+        try:
+            with open(os.path.join(self.path(stock, val, method), "config.json"),
+                      encoding = "utf-8") as file:
+                config = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if config.get("version") != VERSION:
+            return None
+        return config["params"]
+
+    def save_config(self, stock, val, method, params):
+        """
+        save the tuned parameters of the method for the given stock. The stored models
+        use the old parameters, so they are removed.
+
+        parameters:
+            stock, val, method: see find
+            params (dict): the parameters, e.g. {"sp": 5, "use_box_cox": False}
+        """
+        path = self.path(stock, val, method)
+        os.makedirs(path, exist_ok = True)
+        for meta in self.entries(stock, val, method):
+            for suffix in (".json", ".pkl"):
+                try:
+                    os.remove(os.path.join(path, meta["hash"] + suffix))
+                except OSError:
+                    pass
+        temp = os.path.join(path, "config.json.tmp")
+        with open(temp, "w", encoding = "utf-8") as file:
+            json.dump({"version": VERSION, "params": params}, file)
+        os.replace(temp, os.path.join(path, "config.json"))
+
+REGISTRY = {}
+
+def default_registry():
+    """
+    return the shared ModelRegistry. The directory is the STOCKTOOL_MODELS environment
+    variable, default is ~/.stocktool/models. None means the registry is turned off.
+    """
+    if "default" not in REGISTRY:
+        REGISTRY["default"] = ModelRegistry(os.environ.get("STOCKTOOL_MODELS",
+                                            os.path.join("~", ".stocktool", "models")))
+    return REGISTRY["default"]
+
+def set_default_registry(registry):
+    """
+    change the shared ModelRegistry.
+
+    parameter:
+        registry (ModelRegistry or str or None): the new registry, a directory, or None
+                                                 to turn the registry off and always fit.
+    """
+    if isinstance(registry, str):
+        registry = ModelRegistry(registry)
+    REGISTRY["default"] = registry
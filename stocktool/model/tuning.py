@@ -0,0 +1,116 @@
+"""
+This is the code for the search of the model settings of every stock
+"""
+import itertools
+import time
+import numpy as np
+import pandas as pd
+
+from .forecasters import build_forecaster, check_forecaster, forecast
+from .parallel import run_jobs
+from .registry import default_registry
+
+def tbats_grid():
+    """
+    return the TBATS settings to search, the ones with the fewest parts (the fastest to
+    fit) first.
+    """
+    grid = []
+    for sp, box_cox, (trend, damped), arma in itertools.product(
+            [None, 5, 21], [False, True], [(False, False), (True, False), (True, True)],
+            [False, True]):
+        grid.append({"sp": sp, "use_box_cox": box_cox, "use_trend": trend,
+                     "use_damped_trend": damped, "use_arma_errors": arma})
+    return sorted(grid, key = lambda params: sum(bool(value) for value in params.values()))
+
+GRIDS = {"TBATS": tbats_grid()}
+
+def score_config(method, params, train, actual):
+    """
+    fit the method with the given parameters on train and score its forecast of actual.
+
+    parameters:
+        method (str): the method name, e.g. "TBATS"
+        params (dict): the parameters to try
+        train (pd.Series): the values the forecaster is fitted on
+        actual (np.ndarray): the real values of the holdout days
+
+    return:
+        : (dict) mae of the forecast and the seconds the fit took.
+    """
+    start = time.perf_counter()
+    forecaster = build_forecaster(method, 1, params)
+    forecaster.fit(train)
+    seconds = time.perf_counter() - start
+    pred = forecast(forecaster, len(actual), 0.95)[:, 0]
+    return {"mae": float(np.abs(pred - actual).mean()), "seconds": seconds}
+
+def tune(data, stocks = None, val = "Close", method = "TBATS", grid = None, holdout = 20,
+         budget = 600, timeout = None, workers = 1, tolerance = 0.01, registry = None):
+    """
+    search the settings of the method for every stock. Every setting is fitted on the
+    data before the last holdout days and scored by the mean absolute error on them.
+    The best setting of every stock is saved to the registry, and StockPrediction uses
+    it from then on. Among the settings whose error is within tolerance of the best one,
+    the fastest to fit is the best.
+
+    parameters:
+        data (StockData): the stock data
+        stocks (list of str): default is all the stocks of the data.
+        val (str): the value to forecast. Default is "Close".
+        method (str): the method name. Default is "TBATS".
+        grid (list of dict): the settings to try. Default is GRIDS[method].
+        holdout (int): number of days to score on. Default is 20.
+        budget (float): seconds for the whole search, the settings not tried by then
+                        are skipped. Default is 600.
+        timeout (float): max seconds for one setting, slower ones are stopped.
+                         Default is no limit other than the budget.
+        workers (int): number of worker processes. Default is 1.
+        tolerance (float): relative error which counts as equally good. Default is 0.01.
+        registry (ModelRegistry): where the best settings are saved. Default is the
+                                  shared registry.
+
+    return:
+        : (DataFrame) one row per stock and setting with columns stock, params, mae,
+          seconds, status ("ok", "timeout" or "error") and best.
+    """
+    check_forecaster(method)
+    if grid is None:
+        if method not in GRIDS:
+            raise ValueError(f"There is no default grid for {method}, please give one.")
+        grid = GRIDS[method]
+    if registry is None:
+        registry = default_registry()
+    stocks = data.stocks if stocks is None else list(stocks)
+
+    ### the cheap settings of all the stocks are tried first
+    jobs = {}
+    for i, params in enumerate(grid):
+        for stock in stocks:
+            values = data.df[stock][val].to_numpy(dtype = "float64")
+            if len(values) < 2 * holdout:
+                raise ValueError(f"{stock} has fewer than {2 * holdout} days of data.")
+            train = pd.Series(values[:-holdout], index = pd.RangeIndex(len(values) - holdout))
+            jobs[(stock, i)] = (method, params, train, values[-holdout:])
+    results, errors = run_jobs(score_config, jobs, workers, timeout, time.time() + budget)
+
+    rows = []
+    for (stock, i) in jobs:
+        row = {"stock": stock, "params": grid[i], "mae": np.nan, "seconds": np.nan,
+               "status": "ok", "best": False}
+        if (stock, i) in results:
+            row.update(results[(stock, i)])
+        else:
+            row["status"] = "timeout" if isinstance(errors[(stock, i)], TimeoutError) else "error"
+        rows.append(row)
+    scores = pd.DataFrame(rows, columns = ["stock", "params", "mae", "seconds", "status", "best"])
+
+    for stock in stocks:
+        done = scores[(scores["stock"] == stock) & (scores["status"] == "ok")]
+        if done.empty:
+            continue
+        good = done[done["mae"] <= done["mae"].min() * (1 + tolerance)]
+        best = good["seconds"].idxmin()
+        scores.loc[best, "best"] = True
+        registry.save_config(stock, val, method, scores.loc[best, "params"])
+    return scores
@@ -0,0 +1,142 @@
+"""
+This is the code for the walk-forward cross validation of the forecasters
+"""
+import time
+import numpy as np
+import pandas as pd
+
+from .forecasters import build_forecaster, check_forecaster, forecast
+from .parallel import run_jobs
+
+def score_fold(method, train, actual, level):
+    """
+    fit a new forecaster on train, forecast the next len(actual) days and score them.
+
+    parameters:
+        method (str): the method name, e.g. "TBATS"
+        train (pd.Series): the values the forecaster is fitted on
+        actual (np.ndarray): the real values of the next days
+        level (float): confidence level of the interval
+
+    return:
+        : (dict) mae, mape, coverage (share of the real values inside the interval) and
+          the seconds the fit and the forecast took.
+    """
+    start = time.perf_counter()
+    forecaster = build_forecaster(method, 1)
+    forecaster.fit(train)
+    values = forecast(forecaster, len(actual), level)
+    seconds = time.perf_counter() - start
+    error = np.abs(values[:, 0] - actual)
+    covered = (values[:, 1] <= actual) & (actual <= values[:, 2])
+    return {"mae": error.mean(), "mape": (error / np.abs(actual)).mean(),
+            "coverage": covered.mean(), "seconds": seconds}
+
+class WalkForward:
+    """
+    Class for the rolling-origin backtest of the forecasters. At every origin a new
+    model is fitted on the rows before it, and its forecast of the next horizon days is
+    scored against StockData.df.
+
+    parameters:
+        data (StockData): the stock data.
+        val (str): the value to forecast, "Open" or "Close".
+        methods (dict): Use the stock symbol as the keys. Value is the method to score.
+        initial (int): number of rows before the first origin.
+        step (int): number of rows between two origins.
+        horizon (int): number of days forecast at every origin.
+        window (str): "expanding" fits on all the rows before the origin, "sliding" on
+                      the last initial rows only.
+        level (float): confidence level of the interval.
+        scores (DataFrame): one row per fold, built by run.
+        errors (dict): (stock, origin) -> exception, for the folds that failed.
+    """
+    def __init__(self, data, val = "Close", method = "TBATS", initial = 60, step = 5,
+                 horizon = 1, window = "expanding", level = 0.95):
+        """
+        Initialize the class.
+
+        parameters:
+            data (StockData): the stock data
+            val (str): the value to forecast. Default is "Close".
+            method (str or dict): the method, or one per stock as in StockPrediction.
+                                  Default is TBATS.
+            initial, step, horizon (int): see the class. Defaults are 60, 5 and 1.
+            window (str): "expanding" or "sliding". Default is "expanding".
+            level (float): confidence level. Default is 0.95.
+        """
+        if window not in ("expanding", "sliding"):
+            raise ValueError("window should be 'expanding' or 'sliding'.")
+        if min(initial, step, horizon) < 1:
+            raise ValueError("initial, step and horizon should be at least 1.")
+        self.data = data
+        self.val = val
+        if isinstance(method, dict):
+            self.methods = {stock: method.get(stock, "TBATS") for stock in data.stocks}
+        else:
+            self.methods = {stock: method for stock in data.stocks}
+        for name in set(self.methods.values()):
+            check_forecaster(name)
+        self.initial, self.step, self.horizon = initial, step, horizon
+        self.window = window
+        self.level = level
+        self.scores = None
+        self.errors = {}
+
+    def folds(self, length):
+        """
+        return the (start, origin) rows of every fold for a series of the given length.
+        The model is fitted on rows start to origin - 1 and scored on the next horizon rows.
+        """
+        origins = range(self.initial, length - self.horizon + 1, self.step)
+        if self.window == "expanding":
+            return [(0, origin) for origin in origins]
+        return [(origin - self.initial, origin) for origin in origins]
+
+    def run(self, stocks = None, workers = 1, timeout = None):
+        """
+        fit and score every fold, the folds of all the stocks are spread over the
+        worker processes.
+
+        parameters:
+            stocks (list of str): default is all the stocks of the data.
+            workers (int): number of worker processes. Default is 1.
+            timeout (float): max seconds for one fold. Default is no limit.
+
+        return:
+            : (DataFrame) one row per fold with columns stock, origin (last date of the
+              train rows), rows (number of train rows), mae, mape, coverage and seconds.
+        """
+        stocks = self.data.stocks if stocks is None else list(stocks)
+        jobs, origins = {}, {}
+        for stock in stocks:
+            frame = self.data.df[stock]
+            values = frame[self.val].to_numpy(dtype = "float64")
+            for start, origin in self.folds(len(values)):
+                train = pd.Series(values[start:origin], index = pd.RangeIndex(start, origin))
+                actual = values[origin: origin + self.horizon]
+                jobs[(stock, origin)] = (self.methods[stock], train, actual, self.level)
+                origins[(stock, origin)] = (frame.index[origin - 1], origin - start)
+
+        results, self.errors = run_jobs(score_fold, jobs, workers, timeout)
+        rows = [{"stock": key[0], "origin": origins[key][0], "rows": origins[key][1],
+                 **results[key]} for key in jobs if key in results]
+        self.scores = pd.DataFrame(rows, columns = ["stock", "origin", "rows", "mae", "mape",
+                                                    "coverage", "seconds"])
+        return self.scores
+
+    def summary(self):
+        """
+        return the mean scores of every stock over its folds.
+
+        return:
+            : (DataFrame) indexed by stock, columns method, folds, mae, mape, coverage
+              and seconds (total).
+        """
+        if self.scores is None:
+            raise ValueError("Call run first.")
+        summary = self.scores.groupby("stock", sort = False).agg(
+            folds = ("mae", "size"), mae = ("mae", "mean"), mape = ("mape", "mean"),
+            coverage = ("coverage", "mean"), seconds = ("seconds", "sum"))
+        summary.insert(0, "method", [self.methods[stock] for stock in summary.index])
+        return summary
@@ -0,0 +1,301 @@
+"""
+This is the code for the forecast server, which keeps a fitted model warm between requests
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+import pandas as pd
+
+from stocktool import StockData, StockPrediction
+from stocktool.instrumentation import count, timer
+
+class ForecastServer:
+    """
+    Class for the local forecast service. It keeps one fitted StockPrediction in memory
+    and answers predict, update and fluctuation requests over HTTP, on a TCP port or a
+    Unix socket. The model is only used from one thread, so no request sees it half
+    updated and the event loop never waits for it. The fits of update run in the worker
+    processes of the model, see StockPrediction(workers = ...).
+
+    GET /predict?symbol=AAPL&days=5&level=0.95
+    GET /fluctuation?symbol=AAPL&start=2022-01-03&end=2022-05-20&method=close-open
+    POST /update?date=2022-05-27 (default is today)
+    GET /health
+
+    parameters:
+        model (StockPrediction): the warm model.
+        host (str), port (int): TCP address, port 0 picks a free port.
+        path (str): Unix socket path, used instead of host and port if given.
+        update_at (str): local time "HH:MM" of the daily update, None turns it off.
+        pending (dict): key of a running request -> its future. A request with the same
+                        key, e.g. the same symbol and horizon, waits for it instead of
+                        running again.
+        stats (dict): number of "requests", "coalesced" requests and "errors".
+        executor (ThreadPoolExecutor): the one thread which uses the model.
+    """
+    def __init__(self, model, host = "127.0.0.1", port = 8765, path = None,
+                 update_at = "18:00"):
+        """
+        Initialize the class.
+
+        parameters:
+            model (StockPrediction): the fitted model, e.g. StockPrediction.load(path)
+            host (str): Default is 127.0.0.1, only local clients.
+            port (int): Default is 8765.
+            path (str): Unix socket path. Default is to use host and port.
+            update_at (str): time of the daily update. Default is "18:00", after the
+                             market closes.
+        """
+        if update_at is not None:
+            ForecastServer.seconds_until(update_at, dt.datetime.now())
+        self.model = model
+        self.host, self.port, self.path = host, port, path
+        self.update_at = update_at
+        self.pending = {}
+        self.stats = {"requests": 0, "coalesced": 0, "errors": 0}
+        self.executor = ThreadPoolExecutor(max_workers = 1)
+        self.server = None
+        self.scheduler = None
+
+    def seconds_until(update_at, now):
+        """
+        helper function, return the seconds from now to the next update_at time.
+
+        parameters:
+            update_at (str): "HH:MM"
+            now (datetime): the current local time
+        """
+        try:
+            hour, minute = (int(part) for part in update_at.split(":"))
+            target = now.replace(hour = hour, minute = minute, second = 0, microsecond = 0)
+        except ValueError as err:
+            raise ValueError(f"update_at should be 'HH:MM', not {update_at!r}.") from err
+        if target <= now:
+            target += dt.timedelta(days = 1)
+        return (target - now).total_seconds()
+
+    async def call(self, key, func, *args):
+        """
+        run func(*args) in the model thread and return its result. While it runs, the
+        calls with the same key share its result.
+
+        parameters:
+            key (tuple): e.g. ("predict", symbol, days, level)
+            func (callable): the function which uses the model
+        """
+        if key in self.pending:
+            self.stats["coalesced"] += 1
+            count("coalesced_requests", key[1] if len(key) > 1 else "")
+            return await asyncio.shield(self.pending[key])
+        future = asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        self.pending[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self.pending.pop(key, None)
+
+    def check_symbol(self, symbol):
+        """
+        helper function, check that the symbol is in the model.
+        """
+        if symbol not in self.model.stocks:
+            raise ValueError(f"{symbol} is not in the model.")
+
+    def predict(self, symbol, days, level):
+        """
+        return the forecast of one stock, runs in the model thread.
+        """
+        self.check_symbol(symbol)
+        frame = self.model.predict_frame(days, level, [symbol])
+        return {"symbol": symbol, "date_train": self.model.date_train.strftime("%Y-%m-%d"),
+                "level": level,
+                "forecast": [{"date": date.strftime("%Y-%m-%d"), "value": row[0],
+                              "low": row[1], "high": row[2]}
+                             for date, row in zip(frame.index, frame.values.tolist())]}
+
+    def update(self, date):
+        """
+        update the model until the given date, runs in the model thread.
+        """
+        with timer("server_update"):
+            self.model.update(date, message = False)
+        return {"date_train": self.model.date_train.strftime("%Y-%m-%d"),
+                "stocks": list(self.model.stocks), "failed": sorted(self.model.failed)}
+
+    def fluctuation(self, symbol, start, end, method):
+        """
+        return the daily fluctuation of one stock over the data of the model, runs in the
+        model thread.
+        """
+        self.check_symbol(symbol)
+        values = self.model.data.fluctuation([symbol], start, end, method = method,
+                                             in_function = True)[symbol]
+        return {"symbol": symbol, "method": method,
+                "values": [{"date": date.strftime("%Y-%m-%d"), "value": value}
+                           for date, value in zip(values.index, values.tolist())]}
+
+    async def route(self, verb, target):
+        """
+        helper function, answer one request.
+
+        parameters:
+            verb (str): "GET" or "POST"
+            target (str): path and query, e.g. "/predict?symbol=AAPL"
+
+        return:
+            status (HTTPStatus), body (dict)
+        """
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == "/health":
+            return HTTPStatus.OK, {"stocks": list(self.model.stocks), **self.stats,
+                                   "date_train": self.model.date_train.strftime("%Y-%m-%d")}
+        if url.path == "/predict":
+            symbol, days = query["symbol"], int(query.get("days", 1))
+            level = float(query.get("level", 0.95))
+            if days < 1:
+                raise ValueError("days should be at least 1.")
+            return HTTPStatus.OK, await self.call(("predict", symbol, days, level),
+                                                  self.predict, symbol, days, level)
+        if url.path == "/fluctuation":
+            symbol = query["symbol"]
+            start, end = query.get("start", ""), query.get("end", "")
+            method = query.get("method", "close-open")
+            return HTTPStatus.OK, await self.call(("fluctuation", symbol, start, end, method),
+                                                  self.fluctuation, symbol, start, end, method)
+        if url.path == "/update":
+            if verb != "POST":
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "use POST for /update"}
+            date = query.get("date")
+            return HTTPStatus.OK, await self.call(("update", date), self.update, date)
+        return HTTPStatus.NOT_FOUND, {"error": f"{url.path} is not found"}
+
+    async def handle(self, reader, writer):
+        """
+        helper function, read one HTTP request from the connection and answer it.
+        """
+        self.stats["requests"] += 1
+        try:
+            verb, target, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            if length:
+                await reader.readexactly(length)
+            status, body = await self.route(verb, target)
+        except KeyError as err:
+            status, body = HTTPStatus.BAD_REQUEST, {"error": f"missing parameter {err}"}
+        except ValueError as err:
+            status, body = HTTPStatus.BAD_REQUEST, {"error": str(err)}
+        except Exception as err:  # pylint: disable=broad-except
+            status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(err)}
+        if status != HTTPStatus.OK:
+            self.stats["errors"] += 1
+
+        payload = json.dumps(body).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                     "Connection: close\r\n\r\n".encode("latin-1") + payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def schedule(self):
+        """
+        helper function, update the model every day at update_at.
+        """
+        while True:
+            await asyncio.sleep(ForecastServer.seconds_until(self.update_at, dt.datetime.now()))
+            try:
+                await self.call(("update", None), self.update, None)
+            except Exception as err:  # pylint: disable=broad-except
+                print(f"The daily update failed: {err!r}")
+
+    async def start(self):
+        """
+        start listening and the daily update, return once the server is ready.
+        """
+        if self.path:
+            self.server = await asyncio.start_unix_server(self.handle, path = self.path)
+        else:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+            self.port = self.server.sockets[0].getsockname()[1]
+        if self.update_at is not None:
+            self.scheduler = asyncio.create_task(self.schedule())
+        return self
+
+    async def stop(self):
+        """
+        stop listening and the daily update.
+        """
+        if self.scheduler is not None:
+            self.scheduler.cancel()
+            self.scheduler = None
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        self.executor.shutdown(wait = False)
+
+    async def serve(self):
+        """
+        start the server and answer requests until it is cancelled.
+        """
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    def run(self):
+        """
+        run the server in the current thread until Ctrl-C.
+        """
+        where = self.path or f"http://{self.host}:{self.port}"
+        print(f"Serving the forecasts of {len(self.model.stocks)} stocks on {where}")
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+
+def main(argv = None):
+    """
+    command line entry, e.g.
+    python -m stocktool.server AAPL IBM --start 2020-01-02 --method ETS --workers 4
+    """
+    parser = argparse.ArgumentParser(description = "Serve the forecasts of warm models.")
+    parser.add_argument("stocks", nargs = "*", help = "stock symbols to fit")
+    parser.add_argument("--load", help = "serve a model saved by StockPrediction.save")
+    parser.add_argument("--start", help = "first date of the train data")
+    parser.add_argument("--end", default = pd.Timestamp.now().strftime("%Y-%m-%d"))
+    parser.add_argument("--val", default = "Close")
+    parser.add_argument("--method", default = "TBATS")
+    parser.add_argument("--workers", type = int, default = 1)
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8765)
+    parser.add_argument("--socket", help = "Unix socket path, instead of host and port")
+    parser.add_argument("--update-at", default = "18:00", help = "daily update, 'off' for none")
+    args = parser.parse_args(argv)
+
+    if args.load:
+        model = StockPrediction.load(args.load, workers = args.workers)
+    else:
+        if not args.stocks or not args.start:
+            parser.error("give the stocks and --start, or --load")
+        data = StockData(args.stocks, args.start, args.end, workers = args.workers)
+        model = StockPrediction(data, args.val, args.method, workers = args.workers)
+    update_at = None if args.update_at == "off" else args.update_at
+    ForecastServer(model, args.host, args.port, args.socket, update_at).run()
+
+if __name__ == "__main__":
+    main()
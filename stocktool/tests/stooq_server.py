@@ -0,0 +1,161 @@
+"""
+Local stand-in for the stooq csv endpoint, and the base class of the tests which use it
+"""
+import importlib
+import sys
+import tempfile
+import threading
+import unittest
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+
+from visualization import BarStore, StockData, trading_calendar
+from model import ModelRegistry, StockPrediction
+
+class StooqServer:
+    """
+    Serve deterministic daily prices for a few symbols.
+
+    parameters:
+        prices (dict): stooq symbol -> DataFrame with Open, High, Low, Close, Volume
+        failures (Counter): stooq symbol -> number of requests that still answer 500
+        requests (Counter): stooq symbol -> number of requests received
+        queries (list): (stooq symbol, d1, d2) of every request received
+        url (str): url of the csv endpoint
+    """
+    def __init__(self, symbols = ("META.US", "AMZN.US", "^DJI"), failures = None):
+        days = trading_calendar().session_range("2015-01-01", "2023-12-31")
+        self.prices = {}
+        for i, symbol in enumerate(symbols):
+            rng = np.random.default_rng(i)
+            close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+            open_ = close * np.exp(rng.normal(0, 0.005, len(days)))
+            self.prices[symbol] = pd.DataFrame({"Open": open_.round(4),
+                "High": (np.maximum(open_, close) * 1.01).round(4),
+                "Low": (np.minimum(open_, close) * 0.99).round(4),
+                "Close": close.round(4), "Volume": rng.integers(1000, 5000, len(days))},
+                index = pd.Index(days, name = "Date"))
+        self.failures = Counter(failures or {})
+        self.requests = Counter()
+        self.queries = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/q/d/l/"
+        self.thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+
+    def handler(self):
+        """
+        build the request handler class.
+        """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            answer GET /q/d/l/?s=...&d1=...&d2=...
+            """
+            def do_GET(self):  # pylint: disable=invalid-name
+                """
+                answer one csv request
+                """
+                query = parse_qs(urlparse(self.path).query)
+                symbol = query["s"][0].upper()
+                with server.lock:
+                    server.requests[symbol] += 1
+                    server.queries.append((symbol, query["d1"][0], query["d2"][0]))
+                    fail = server.failures[symbol] > 0
+                    if fail:
+                        server.failures[symbol] -= 1
+                if fail:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                if symbol not in server.prices:
+                    body = b"No data"
+                else:
+                    start = pd.Timestamp(query["d1"][0])
+                    end = pd.Timestamp(query["d2"][0])
+                    body = server.prices[symbol].loc[start:end].to_csv().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                """
+                keep the test output quiet
+                """
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+def package_modules(name):
+    """
+    return every imported copy of a module of the visualization package:
+    stocktool.visualization.<name>, which the library uses, and visualization.<name>,
+    which the tests import when they run from the stocktool folder.
+
+    parameter:
+        name (str): e.g. "fetch"
+    """
+    modules = [importlib.import_module("stocktool.visualization." + name)]
+    other = sys.modules.get("visualization." + name)
+    if other is not None and other is not modules[0]:
+        modules.append(other)
+    return modules
+
+class StooqTestCase(unittest.TestCase):
+    """
+    Base test class. Every test gets a local StooqServer in place of stooq.com, a
+    memory http cache, a temporary folder with a BarStore, and self.data with the
+    prices of `stocks` from `start` to `end`.
+
+    parameters:
+        stocks (list of str): the stocks of self.data, None for no data.
+        start, end (str): the dates of self.data
+        failures (dict): see StooqServer
+    """
+    stocks = ["Meta", "AMZN"]
+    start, end = "2022-01-03", "2022-05-20"
+    failures = None
+
+    def setUp(self):
+        self.server = StooqServer(failures = self.failures).__enter__()
+        self.addCleanup(self.server.__exit__)
+        for module in package_modules("fetch"):
+            patch = mock.patch.object(module, "STOOQ_URL", self.server.url)
+            patch.start()
+            self.addCleanup(patch.stop)
+        for module in package_modules("session"):
+            module.configure_session(backend = "memory")
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.store = BarStore(self.folder.name)
+        self.data = None
+        if self.stocks is not None:
+            self.data = StockData(self.stocks, self.start, self.end, store = self.store)
+
+    def prediction(self, data = None, method = "Drift", **options):
+        """
+        helper function, a new StockPrediction of self.data, with a registry in the
+        temporary folder.
+
+        parameters:
+            data (StockData): Default is self.data.
+            method (str or dict): Default is Drift, which is fast.
+            options: see StockPrediction, e.g. lookback = 30
+        """
+        options.setdefault("registry", ModelRegistry(self.folder.name + "/models"))
+        return StockPrediction(self.data if data is None else data, method = method,
+                               **options)
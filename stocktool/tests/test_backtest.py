@@ -0,0 +1,76 @@
+"""
+Test for the offline backtest
+"""
+import contextlib
+import io
+import unittest
+import numpy as np
+import pandas as pd
+
+from evaluation import StockEvaluation
+from evaluation.backtest import strategy
+from .stooq_server import StooqTestCase
+
+class TestStrategy(unittest.TestCase):
+    """
+    Test class
+    """
+    def test_strategy(self):
+        """
+        greedy buys the first stock with the largest profit, weighted splits by profit
+        """
+        forecast = np.array([[11.0, 22.0, 9.0], [9.0, 19.0, 8.0], [12.0, 24.0, 11.0]])
+        open_ = np.array([[10.0, 20.0, 10.0]] * 3)
+        close = np.array([[12.0, 21.0, 11.0]] * 3)
+        growth, bought = strategy(forecast, open_, close)
+        np.testing.assert_allclose(growth, [1.2, 1.0, 1.2])
+        self.assertEqual(bought.tolist(), [[True, False, False], [False] * 3,
+                                           [True, False, False]])
+        growth, bought = strategy(forecast, open_, close, weighted = True)
+        np.testing.assert_allclose(growth, [1.2 * 0.5 + 1.05 * 0.5, 1.0,
+                                            1.2 * 0.4 + 1.05 * 0.4 + 1.1 * 0.2])
+        self.assertEqual(bought[2].tolist(), [True, True, True])
+
+class TestBacktest(StooqTestCase):
+    """
+    Test class
+    """
+    def evaluation(self):
+        """
+        helper function, a new evaluation of the same model
+        """
+        model = self.prediction()
+        return StockEvaluation(model)
+
+    def test_same_as_evaluate(self):
+        """
+        the backtest gives the same asset every day as evaluate
+        """
+        for weighted in (False, True):
+            ### the steps of evaluate, keeping the asset of every day
+            slow = self.evaluation()
+            assets, date = [slow.asset], slow.date
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(16):
+                    date += pd.Timedelta(days = 1)
+                    slow.invest(date, weighted)
+                    slow.update(date)
+                    assets.append(slow.asset)
+                whole = self.evaluation()
+                whole.evaluate(days = 16, weighted = weighted)
+            self.assertEqual(whole.asset, assets[-1])
+
+            fast = self.evaluation()
+            result = fast.backtest(days = 16, weighted = weighted)
+            self.assertEqual(result.index[0], pd.Timestamp("2022-05-20"))
+            self.assertEqual(len(result), 17)
+            if weighted:
+                np.testing.assert_allclose(result["asset"], assets, rtol = 1e-12)
+            else:
+                self.assertEqual(list(result["asset"]), assets)
+            self.assertEqual(result.loc["2022-05-21", "stocks"], "")
+            ### the weighted sum is rounded in another order, as for the assets above
+            self.assertAlmostEqual(fast.asset / slow.asset, 1, places = 12)
+            self.assertEqual(fast.date, slow.date)
+            pd.testing.assert_frame_equal(fast.model.pred["Meta"], slow.model.pred["Meta"])
+            self.assertEqual(fast.model.date_train, pd.Timestamp("2022-06-03"))
@@ -0,0 +1,48 @@
+"""
+Test for the price cache of the evaluation
+"""
+import contextlib
+import io
+import pandas as pd
+
+from evaluation import StockEvaluation
+from .stooq_server import StooqTestCase
+
+class TestBarCache(StooqTestCase):
+    """
+    Test class
+    """
+    def setUp(self):
+        super().setUp()
+        self.evaluation = StockEvaluation(self.prediction(), window = 30)
+
+    def test_evaluate(self):
+        """
+        one request per stock for the whole window, the days after are read from memory
+        """
+        queries = len(self.server.queries)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.evaluation.evaluate(days = 10)
+        new = self.server.queries[queries:]
+        self.assertEqual(sorted(query[0] for query in new), ["AMZN.US", "META.US"])
+        stats = self.evaluation.bar_stats()
+        self.assertEqual((stats["misses"], stats["prefetches"]), (1, 1))
+        self.assertGreater(stats["hits"], 10)
+        self.assertEqual(stats["start"], pd.Timestamp("2022-05-23"))
+        self.assertEqual(stats["end"], pd.Timestamp("2022-06-21"))
+
+        open_ = self.evaluation.get_open(pd.Timestamp("2022-05-24"), "AMZN")
+        self.assertEqual(open_, self.server.prices["AMZN.US"].loc["2022-05-24", "Open"])
+        with self.assertRaises(ValueError):
+            self.evaluation.get_open(pd.Timestamp("2022-05-30"), "AMZN")
+
+    def test_data(self):
+        """
+        the dates of the loaded data are not read again
+        """
+        queries = len(self.server.queries)
+        ratio = self.evaluation.get_return(pd.Timestamp("2022-05-02"), "Meta")
+        frame = self.data.df["Meta"]
+        self.assertEqual(ratio, frame.loc["2022-05-02", "Close"] / frame.loc["2022-05-02", "Open"])
+        self.assertEqual(len(self.server.queries), queries)
+        self.assertEqual(self.evaluation.bar_stats()["prefetches"], 0)
@@ -0,0 +1,61 @@
+"""
+Test for the time series buffer
+"""
+import pickle
+import unittest
+import numpy as np
+import pandas as pd
+
+from model.buffer import BufferViews, SeriesBuffer, frame_view, train_view, y_view
+
+class TestSeriesBuffer(unittest.TestCase):
+    """
+    Test class
+    """
+    def setUp(self):
+        dates = pd.DatetimeIndex(pd.bdate_range("2022-01-03", periods = 5), name = "Date")
+        self.frame = pd.DataFrame({"Close": np.arange(5.0), "Open": np.arange(5.0) + 10},
+                                  index = dates)
+        self.buffer = SeriesBuffer.from_frame(self.frame, ["Close"])
+
+    def test_from_frame(self):
+        """
+        the buffer holds the given columns and the index name
+        """
+        self.assertEqual(len(self.buffer), 5)
+        self.assertTrue(self.buffer.frame().equals(self.frame[["Close"]]))
+        self.assertEqual(self.buffer.last_date(), pd.Timestamp("2022-01-07"))
+
+    def test_append_grows_geometrically(self):
+        """
+        appending one row at a time only reallocates a logarithmic number of times
+        """
+        buffer = SeriesBuffer(["a", "b"], capacity = 1)
+        dates = pd.bdate_range("2000-01-03", periods = 1000)
+        grown = 0
+        for i, date in enumerate(dates):
+            before = buffer.values
+            buffer.append([date], [i, -i])
+            grown += buffer.values is not before
+        self.assertLessEqual(grown, 11)
+        self.assertEqual(len(buffer), 1000)
+        self.assertTrue((buffer.frame()["b"].values == -np.arange(1000)).all())
+        self.assertEqual(list(buffer.frame().index), list(dates))
+
+    def test_views(self):
+        """
+        train and y are views of the same buffer, y has the row number as index
+        """
+        train = train_view(self.buffer)
+        self.assertEqual(list(train.columns), ["Date", "Close"])
+        y_values = y_view(self.buffer)
+        self.assertTrue(np.shares_memory(y_values.values, self.buffer.values))
+        tail = self.buffer.series("Close", 3)
+        self.assertEqual(list(tail.index), [3, 4])
+
+        views = BufferViews({"Meta": self.buffer}, frame_view)
+        self.assertEqual(list(views), ["Meta"])
+        self.buffer.append(["2022-01-10"], [5.0])
+        self.assertEqual(len(views["Meta"]), 6)
+        copy = pickle.loads(pickle.dumps(views))
+        self.assertTrue(copy["Meta"].equals(views["Meta"]))
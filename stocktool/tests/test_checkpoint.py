@@ -0,0 +1,94 @@
+"""
+Test for the checkpoints of the evaluation
+"""
+import contextlib
+import io
+import json
+import os
+import pickle
+import pandas as pd
+
+from evaluation import StockEvaluation
+from evaluation.checkpoint import Checkpoint
+from .stooq_server import StooqTestCase
+
+class TestCheckpoint(StooqTestCase):
+    """
+    Test class
+    """
+    def evaluation(self):
+        """
+        helper function, a new evaluation of the same model
+        """
+        model = self.prediction()
+        return StockEvaluation(model)
+
+    def test_resume(self):
+        """
+        an evaluation stopped by an error resumes from the last checkpoint and ends the
+        same as one which ran at once
+        """
+        whole = self.evaluation()
+        with contextlib.redirect_stdout(io.StringIO()):
+            whole.evaluate(days = 16)
+
+        folder = os.path.join(self.folder.name, "checkpoint")
+        broken = self.evaluation()
+        update = broken.update
+        def fail(date):
+            if date >= pd.Timestamp("2022-06-01"):
+                raise ConnectionError("network is down")
+            update(date)
+        broken.update = fail
+        with contextlib.redirect_stdout(io.StringIO()), self.assertRaises(ConnectionError):
+            broken.evaluate(days = 16, checkpoint = Checkpoint(folder, every = 3))
+
+        with open(os.path.join(folder, "manifest.json")) as file:
+            manifest = json.load(file)
+        ### checkpoints after day 3, 6 and 9: 05-23, 05-26 and 05-29
+        self.assertEqual(manifest["segments"], ["segment-000001.pkl", "segment-000002.pkl",
+                                                "segment-000003.pkl"])
+        self.assertEqual(manifest["date"], "2022-05-27")
+        with open(os.path.join(folder, "segment-000002.pkl"), "rb") as file:
+            segment = pickle.load(file)
+        ### only the new days are saved: 05-24, 05-25 and 05-26
+        self.assertEqual(len(segment["rows"]["history"]["Meta"][0]), 3)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            resumed = StockEvaluation.resume(folder, data = self.data)
+        self.assertEqual((resumed.asset, resumed.date), (whole.asset, whole.date))
+        self.assertEqual(resumed.model.date_train, whole.model.date_train)
+        pd.testing.assert_frame_equal(resumed.metrics.frame(), whole.metrics.frame())
+        pd.testing.assert_frame_equal(resumed.model.pred["AMZN"], whole.model.pred["AMZN"])
+        pd.testing.assert_frame_equal(resumed.model.train["Meta"], whole.model.train["Meta"])
+
+        ### nothing is left to evaluate
+        with contextlib.redirect_stdout(io.StringIO()):
+            again = StockEvaluation.resume(folder, data = self.data)
+        self.assertEqual((again.asset, again.date), (whole.asset, whole.date))
+
+    def test_compact(self):
+        """
+        after `compact` segments a new base is saved and the old files are removed
+        """
+        folder = os.path.join(self.folder.name, "checkpoint")
+        evaluation = self.evaluation()
+        with contextlib.redirect_stdout(io.StringIO()):
+            evaluation.evaluate(days = 10, checkpoint = Checkpoint(folder, every = 2,
+                                                                   compact = 2))
+        with open(os.path.join(folder, "manifest.json")) as file:
+            manifest = json.load(file)
+        self.assertEqual(manifest["base"], "base-000001.pkl")
+        self.assertEqual(len(manifest["segments"]), 2)
+        self.assertEqual(sorted(os.listdir(folder)),
+                         sorted([manifest["base"], manifest["metrics"], "manifest.json"]
+                                + manifest["segments"]))
+        self.assertEqual(manifest["asset"], evaluation.asset)
+
+        model, metrics = Checkpoint(folder).restore(self.data)
+        self.assertEqual(metrics.summary(), evaluation.metrics.summary())
+        pd.testing.assert_frame_equal(metrics.frame(), evaluation.metrics.frame())
+        self.assertEqual(model.date_train, evaluation.model.date_train)
+        self.assertEqual(len(model.policy.records), len(evaluation.model.policy.records))
+        with self.assertRaises(ValueError):
+            Checkpoint(self.folder.name).restore(self.data)
@@ -0,0 +1,75 @@
+"""
+Test for the concurrent download, against a local stand-in of stooq
+"""
+import unittest
+import pandas as pd
+
+from visualization import StockData, fetch, store
+from .stooq_server import StooqTestCase
+
+class TestFetch(StooqTestCase):
+    """
+    Test class
+    """
+    stocks = None
+    failures = {"AMZN.US": 1}
+
+    def setUp(self):
+        super().setUp()
+        store.set_default_store(self.folder.name)
+
+    def tearDown(self):
+        store.STORE.clear()
+
+    def test_fetch_symbols(self):
+        """
+        download in parallel, the failed request is retried and the bad symbol is collected
+        """
+        frames, errors = fetch.fetch_symbols(["Meta", "AMZN", "Metee"],
+                                             pd.Timestamp("2022-01-03"),
+                                             pd.Timestamp("2022-01-31"),
+                                             workers = 3, retries = 2, backoff = 0)
+        self.assertEqual(sorted(frames), ["AMZN", "Meta", "Metee"])
+        self.assertEqual(errors, {})
+        self.assertEqual(len(frames["Meta"]), 20)
+        self.assertTrue(frames["Meta"].index.is_monotonic_increasing)
+        self.assertEqual(self.server.requests["AMZN.US"], 2)
+
+    def test_fetch_error(self):
+        """
+        a request that keeps failing is reported, not raised
+        """
+        self.server.failures["META.US"] = 5
+        frames, errors = fetch.fetch_symbols(["Meta", "AMZN"], pd.Timestamp("2022-01-03"),
+                                             pd.Timestamp("2022-01-31"),
+                                             workers = 2, retries = 1, backoff = 0)
+        self.assertEqual(list(frames), ["AMZN"])
+        self.assertEqual(list(errors), ["Meta"])
+
+    def test_stock_data_parallel(self):
+        """
+        StockData with several workers, validation runs after the downloads
+        """
+        data = StockData(["Meta", "AMZN"], "2022-01-03", "2022-01-24", workers = 2)
+        self.assertEqual(data.open_days, 15)
+        self.assertEqual(len(data.df["AMZN"]), 15)
+        self.assertIn("close-open", data.df["Meta"].columns)
+
+    def test_stock_data_not_strict(self):
+        """
+        the invalid stock is dropped and the others are kept
+        """
+        data = StockData(["Meta", "Metee"], "2022-01-03", "2022-01-24", workers = 2,
+                         strict = False)
+        self.assertEqual(data.stocks, ["Meta"])
+        self.assertIn("Metee", data.errors)
+
+    def test_stock_data_strict(self):
+        """
+        the invalid stock raises ValueError
+        """
+        with self.assertRaises(ValueError):
+            StockData(["Meta", "Metee"], "2022-01-03", "2022-01-24", workers = 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Test for the forecaster registry
+"""
+import importlib.util
+import numpy as np
+import pandas as pd
+
+from visualization import StockData
+from model import ModelRegistry, StockPrediction
+from model.forecasters import FORECASTERS, build_forecaster, forecast
+from .stooq_server import StooqTestCase
+
+FAST = ["Naive", "Drift", "ETS", "Theta"]
+if importlib.util.find_spec("pmdarima") is not None:
+    FAST.append("ARIMA")
+
+class TestForecasters(StooqTestCase):
+    """
+    Test class
+    """
+    def setUp(self):
+        super().setUp()
+        self.registry = ModelRegistry(self.folder.name + "/models")
+
+    def test_registry(self):
+        """
+        the engines are registered and an unknown method is an error
+        """
+        for name in ["TBATS", "Naive", "Drift", "ETS", "Theta", "ARIMA"]:
+            self.assertIn(name, FORECASTERS)
+        with self.assertRaises(ValueError):
+            build_forecaster("Prophet")
+        with self.assertRaises(ValueError):
+            StockPrediction(self.data, method = "Prophet", registry = self.registry)
+
+    def test_fast_engines(self):
+        """
+        every fast engine gives the prediction with its interval, and reports its costs
+        """
+        for method in FAST:
+            model = StockPrediction(self.data, method = method, registry = self.registry)
+            pred = model.predict(3)
+            self.assertEqual(list(pred["Meta"].columns), ["Meta", "Meta-low", "Meta-high"])
+            self.assertEqual(len(pred["AMZN"]), 3)
+            self.assertTrue((pred["Meta"]["Meta-low"] <= pred["Meta"]["Meta"]).all())
+            self.assertTrue((pred["Meta"]["Meta"] <= pred["Meta"]["Meta-high"]).all())
+            costs = model.costs()
+            self.assertEqual(list(costs.index), ["Meta", "AMZN"])
+            self.assertEqual(list(costs["method"]), [method, method])
+            self.assertTrue((costs["fit"] >= 0).all() and (costs["predict"] >= 0).all())
+
+    def test_method_per_stock(self):
+        """
+        a dict gives every stock its own engine
+        """
+        model = StockPrediction(self.data, method = {"Meta": "Naive", "AMZN": "Theta"},
+                                registry = self.registry)
+        self.assertEqual(type(model.model["Meta"]).__name__, "NaiveForecaster")
+        self.assertEqual(type(model.model["AMZN"]).__name__, "ThetaForecaster")
+
+    def test_update_uses_new_rows(self):
+        """
+        after update, the prediction is the same as a model fitted on all the rows
+        """
+        model = StockPrediction(self.data, method = "Theta", registry = self.registry)
+        model.update("2022-06-10", message = False)
+        data = StockData(["Meta", "AMZN"], "2022-01-03", "2022-06-10", store = self.store)
+        full = StockPrediction(data, method = "Theta", registry = ModelRegistry(
+                               self.folder.name + "/other"))
+        self.assertEqual(len(model.y["Meta"]), len(full.y["Meta"]))
+        self.assertTrue(model.predict(2)["Meta"].equals(full.predict(2)["Meta"]))
+        self.assertEqual(list(model.policy.stats().loc["Meta"].index), ["fit", "update"])
+
+    def test_predict_frame_cache(self):
+        """
+        the wide frame matches predict, and the forecast is only computed again after
+        update
+        """
+        model = StockPrediction(self.data, method = "Drift", registry = self.registry)
+        frame = model.predict_frame(3, 0.9)
+        self.assertEqual(list(frame.columns), ["Meta", "Meta-low", "Meta-high",
+                                               "AMZN", "AMZN-low", "AMZN-high"])
+        pred = model.predict(3, 0.9)
+        self.assertTrue(np.array_equal(pred["AMZN"].values, frame.iloc[:, 3:].values))
+        self.assertEqual(len(model.forecasts), 2)
+
+        cached = model.forecasts[("Meta", model.date_train, 3, 0.9)]
+        cached[0, 0] = -1.0
+        self.assertEqual(model.predict_frame(3, 0.9).iloc[0, 0], -1.0)
+
+        model.update("2022-05-27", message = False)
+        self.assertEqual(model.forecasts, {})
+        self.assertGreater(model.predict_frame(3, 0.9).iloc[0, 0], 0)
+
+    def test_tbats_single_pass(self):
+        """
+        the one pass TBATS forecast is the same as predict and predict_interval
+        """
+        y = pd.Series(100 + np.cumsum(np.random.RandomState(0).randn(40)))
+        forecaster = build_forecaster("TBATS").fit(y)
+        values = forecast(forecaster, 3, 0.9)
+        self.assertTrue(np.allclose(values[:, 0], forecaster.predict(fh = [1, 2, 3]).values))
+        interval = forecaster.predict_interval(fh = [1, 2, 3], coverage = 0.9).values
+        self.assertTrue(np.allclose(values[:, 1:], interval))
@@ -0,0 +1,114 @@
+"""
+Test for the global model
+"""
+import unittest
+import numpy as np
+import pandas as pd
+
+from visualization.fetch import fetch_symbols
+from model import GlobalForecaster, GlobalPrediction, RefitPolicy
+from .stooq_server import StooqTestCase
+
+def random_prices(days, stocks, coef = 0.0, seed = 0):
+    """
+    helper function, prices whose returns follow an AR(1) with the given coefficient.
+    """
+    rng = np.random.default_rng(seed)
+    returns = np.zeros((days, stocks))
+    noise = rng.normal(0, 0.01, (days, stocks))
+    for day in range(1, days):
+        returns[day] = coef * returns[day - 1] + noise[day]
+    dates = pd.bdate_range("2015-01-01", periods = days).values
+    return dates, 100 * np.exp(np.cumsum(returns, axis = 0))
+
+class TestGlobalForecaster(unittest.TestCase):
+    """
+    Test class
+    """
+    def test_fit(self):
+        """
+        the pooled fit finds the coefficient shared by all the stocks
+        """
+        dates, prices = random_prices(400, 50, coef = 0.5)
+        forecaster = GlobalForecaster(lags = 3, alpha = 1.0).fit(dates, prices, range(50))
+        self.assertAlmostEqual(forecaster.beta[0], 0.5, delta = 0.05)
+        self.assertLess(np.abs(forecaster.beta[1:3]).max(), 0.05)
+
+    def test_update(self):
+        """
+        adding the new days gives the same model as fitting on all of them
+        """
+        dates, prices = random_prices(200, 10, coef = 0.3)
+        full = GlobalForecaster().fit(dates, prices, range(10))
+        part = GlobalForecaster().fit(dates[:150], prices[:150], range(10))
+        part.update(dates[150:180], prices[150:180]).update(dates[180:], prices[180:])
+        np.testing.assert_allclose(part.beta, full.beta)
+        np.testing.assert_allclose(part.log_prices, full.log_prices)
+        with self.assertRaises(ValueError):
+            GlobalForecaster().fit(dates[:20], prices[:20], range(10))
+
+    def test_predict(self):
+        """
+        the prediction lies inside its interval, which widens with the horizon
+        """
+        dates, prices = random_prices(200, 10)
+        forecaster = GlobalForecaster().fit(dates, prices, range(10))
+        result = forecaster.predict(pd.bdate_range(dates[-1], periods = 6)[1:].values, 0.9)
+        self.assertEqual(result.shape, (5, 10, 3))
+        self.assertTrue((result[:, :, 1] < result[:, :, 0]).all())
+        self.assertTrue((result[:, :, 0] < result[:, :, 2]).all())
+        width = result[:, :, 2] - result[:, :, 1]
+        self.assertTrue((np.diff(width, axis = 0) > 0).all())
+
+class TestGlobalPrediction(StooqTestCase):
+    """
+    Test class
+    """
+    def test_predict(self):
+        """
+        same layout as StockPrediction, with one model for all the stocks
+        """
+        model = GlobalPrediction(self.data)
+        self.assertIs(model.model["Meta"], model.model["AMZN"])
+        frame = model.predict_frame(3)
+        self.assertEqual(list(frame.columns), ["Meta", "Meta-low", "Meta-high",
+                                               "AMZN", "AMZN-low", "AMZN-high"])
+        self.assertEqual(frame.index[0], pd.Timestamp("2022-05-23"))
+        self.assertTrue((frame["Meta-low"] < frame["Meta"]).all())
+        pred = model.predict(3)
+        self.assertEqual(list(pred["AMZN"].columns), ["AMZN", "AMZN-low", "AMZN-high"])
+        self.assertEqual(len(model.pred["AMZN"]), 1)
+
+    def test_update(self):
+        """
+        update adds the new days to the model, save and load keep the class
+        """
+        model = GlobalPrediction(self.data, policy = RefitPolicy(every = None))
+        forecaster = model.model["Meta"]
+        model.update("2022-05-27", message = False)
+        self.assertIs(model.model["Meta"], forecaster)
+        self.assertEqual(pd.Timestamp(forecaster.dates[-1]), pd.Timestamp("2022-05-27"))
+        self.assertEqual(list(model.policy.stats().loc["global"].index), ["fit", "update"])
+
+        path = self.folder.name + "/global.pkl"
+        model.save(path)
+        loaded = GlobalPrediction.load(path, data = self.data)
+        self.assertIsInstance(loaded, GlobalPrediction)
+        np.testing.assert_allclose(loaded.predict_frame(2).values, model.predict_frame(2).values)
+
+    def test_missing_bar(self):
+        """
+        a stock without a new bar, e.g. halted, does not stop the update of the others
+        """
+        model = GlobalPrediction(self.data, policy = RefitPolicy(every = None))
+        frames, _ = fetch_symbols(["Meta", "AMZN"], "2022-05-23", "2022-05-27",
+                                  store = self.data.store)
+        rows = len(model.history["AMZN"])
+        model.update("2022-05-27", message = False,
+                     bars = {"Meta": frames["Meta"], "AMZN": frames["AMZN"].iloc[:0]})
+        forecaster = model.model["Meta"]
+        self.assertEqual(pd.Timestamp(forecaster.dates[-1]), pd.Timestamp("2022-05-27"))
+        self.assertEqual(len(model.history["AMZN"]), rows)
+        self.assertEqual(len(model.history["Meta"]), rows + 5)
+        self.assertTrue(np.isnan(forecaster.log_prices[-1, forecaster.stocks.index("AMZN")]))
+        self.assertTrue(np.isfinite(model.predict_frame(1)["Meta"]).all())
@@ -0,0 +1,134 @@
+"""
+Test for the timers, counters and profiles
+"""
+import json
+import tempfile
+import tracemalloc
+import unittest
+
+from stocktool import instrumentation
+from visualization import StockData
+from .stooq_server import StooqTestCase
+
+class Work:
+    """
+    helper class with public methods to profile
+    """
+    def total(self, size):
+        return sum(range(size))
+
+    def nested(self, size):
+        return self.total(size) + 1
+
+class TestInstruments(unittest.TestCase):
+    """
+    Test class
+    """
+    def tearDown(self):
+        instrumentation.disable()
+
+    def test_off(self):
+        """
+        nothing is recorded while the instruments are off
+        """
+        instrumentation.disable()
+        self.assertIs(instrumentation.timer("fit", "Meta"), instrumentation.OFF)
+        instrumentation.count("datareader_calls", "Meta")
+        instrumentation.record("fit", "Meta", 1.0)
+        self.assertIsNone(instrumentation.current())
+
+    def test_sinks(self):
+        """
+        the summary, the JSON lines file and the Prometheus file agree
+        """
+        folder = tempfile.TemporaryDirectory()
+        memory = instrumentation.MemorySink()
+        lines = instrumentation.JsonLinesSink(folder.name + "/events.jsonl")
+        prom = instrumentation.PrometheusSink(folder.name + "/stocktool.prom")
+        with instrumentation.enable([memory, lines, prom]) as instruments:
+            for seconds in (1.0, 3.0):
+                instrumentation.record("fit", "Meta", seconds)
+            with instrumentation.timer("calendar"):
+                pass
+            instrumentation.count("bytes_fetched", "Meta", 100)
+            instrumentation.count("bytes_fetched", "Meta", 50)
+        self.assertIsNone(instrumentation.current())
+
+        summary = instruments.summary()
+        self.assertEqual(list(summary.loc[("Meta", "fit")]), [2, 4.0, 2.0, 3.0])
+        self.assertIn(("", "calendar"), summary.index)
+        self.assertEqual(instruments.counts().loc[("Meta", "bytes_fetched"), "value"], 150)
+        self.assertEqual(len(memory.events), 5)
+        with open(folder.name + "/events.jsonl", encoding = "utf-8") as file:
+            events = [json.loads(line) for line in file]
+        self.assertEqual([event["kind"] for event in events], [e["kind"] for e in memory.events])
+        with open(folder.name + "/stocktool.prom", encoding = "utf-8") as file:
+            text = file.read()
+        self.assertIn('stocktool_phase_calls_total{symbol="Meta",phase="fit"} 2', text)
+        self.assertIn('stocktool_bytes_fetched_total{symbol="Meta"} 150', text)
+        folder.cleanup()
+
+    def test_profile(self):
+        """
+        every call of a profiled method is captured, nested calls only once
+        """
+        work = instrumentation.profile(Work(), memory = True)
+        with instrumentation.enable() as instruments:
+            self.assertEqual(work.nested(1000), sum(range(1000)) + 1)
+        labels = [capture.label for capture in instruments.profiles]
+        self.assertEqual(labels, ["Work.total", "Work.nested"])
+        inner, outer = instruments.profiles
+        self.assertIsNone(inner.stats)
+        self.assertIn("total", outer.top(5))
+        self.assertGreaterEqual(outer.peak, 0)
+        instrumentation.unprofile(work)
+        self.assertNotIn("nested", vars(work))
+
+    def test_memory(self):
+        """
+        the peak is measured from the start of the block, also when tracing is on already
+        """
+        tracemalloc.start()
+        try:
+            with instrumentation.capture("alloc", memory = True) as capture:
+                block = bytearray(1000000)
+            del block
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+        self.assertGreaterEqual(capture.peak, 1000000)
+        with instrumentation.capture("alloc", memory = True) as capture:
+            block = bytearray(1000000)
+        del block
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertGreaterEqual(capture.peak, 1000000)
+
+class TestPrediction(StooqTestCase):
+    """
+    Test class
+    """
+    stocks = None
+
+    def tearDown(self):
+        instrumentation.disable()
+
+    def test_phases(self):
+        """
+        downloads, fit, update and predict are recorded per stock
+        """
+        with instrumentation.enable() as instruments:
+            data = StockData(["Meta", "AMZN"], self.start, self.end, store = self.store)
+            model = self.prediction(data)
+            model.predict(2)
+            model.predict(2)
+            model.update("2022-05-27", message = False)
+
+        phases = instruments.summary()
+        for stock in ("Meta", "AMZN"):
+            for phase in ("fetch", "fit", "update", "predict", "bars"):
+                self.assertIn((stock, phase), phases.index)
+        self.assertIn(("", "calendar"), phases.index)
+        counts = instruments.counts()["value"]
+        self.assertEqual(counts[("Meta", "datareader_calls")], 2)
+        self.assertGreater(counts[("Meta", "bytes_fetched")], 0)
+        self.assertEqual(counts[("Meta", "forecast_cache_hits")], 1)
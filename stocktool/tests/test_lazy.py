@@ -0,0 +1,81 @@
+"""
+Test for the lazy mode of StockData
+"""
+import unittest
+
+from visualization import StockData
+from .stooq_server import StooqTestCase
+
+class TestLazy(StooqTestCase):
+    """
+    Test class
+    """
+    stocks = None
+
+    def setUp(self):
+        super().setUp()
+        self.data = StockData(["Meta", "AMZN", "^DJI", "Metee"], self.start, self.end,
+                              store = self.store, lazy = True)
+
+    def test_nothing_loaded(self):
+        """
+        building the class does not download anything, the range is known
+        """
+        self.assertEqual(sum(self.server.requests.values()), 0)
+        self.assertEqual(self.data.open_days, 97)
+        self.assertEqual(list(self.data.df), ["Meta", "AMZN", "^DJI", "Metee"])
+
+    def test_load_on_access(self):
+        """
+        a stock is loaded once, on first access
+        """
+        df = self.data.df["AMZN"]
+        self.assertIs(self.data.df["AMZN"], df)
+        self.assertEqual(len(df), self.data.open_days)
+        self.assertIn("close-open", df.columns)
+        self.assertEqual(dict(self.server.requests), {"AMZN.US": 1})
+
+    def test_only_touched_stocks(self):
+        """
+        analysis over some stocks only loads those stocks, and the panel and its index
+        are kept while they have the stocks asked for
+        """
+        self.data.fluctuation(["Meta", "^DJI"], "2022-02-01", "2022-03-01", in_function = True)
+        panel = self.data.get_panel(["^DJI"])
+        self.assertEqual(panel.stocks, ["Meta", "^DJI"])
+        self.data.fluctuation_stats(["AMZN"], "2022-02-01", "2022-03-01")
+        self.assertEqual(sorted(self.server.requests), ["AMZN.US", "META.US", "^DJI"])
+        self.assertEqual(self.data.get_panel(["AMZN"]).stocks, ["AMZN"])
+        index = self.data.query_index
+        self.data.fluctuation_stats(["AMZN"], "2022-03-01", "2022-04-01")
+        self.assertIs(self.data.get_query_index(["AMZN"]), index)
+
+    def test_invalid_on_access(self):
+        """
+        an invalid stock raises ValueError when it is used
+        """
+        with self.assertRaises(ValueError):
+            self.data.df["Metee"]
+        with self.assertRaises(KeyError):
+            self.data.df["TSLA"]
+        self.assertIn("Metee", self.data.errors)
+
+    def test_download_retried(self):
+        """
+        a failed download is tried again on the next access, an invalid stock is not
+        """
+        self.server.failures["META.US"] = 2
+        data = StockData(["Meta", "Metee"], self.start, self.end, retries = 0,
+                         store = self.store, lazy = True)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                data.df["Meta"]
+            with self.assertRaises(ValueError):
+                data.df["Metee"]
+        self.assertEqual(len(data.df["Meta"]), data.open_days)
+        self.assertNotIn("Meta", data.errors)
+        self.assertEqual(self.server.requests["META.US"], 3)
+        self.assertEqual(self.server.requests["METEE.US"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
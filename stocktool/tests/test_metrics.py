@@ -0,0 +1,114 @@
+"""
+Test for the metrics of the evaluation
+"""
+import contextlib
+import importlib.util
+import io
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+from evaluation import StockEvaluation
+from evaluation.metrics import PortfolioMetrics
+from .stooq_server import StooqTestCase
+
+class TestPortfolioMetrics(unittest.TestCase):
+    """
+    Test class
+    """
+    def setUp(self):
+        self.dates = pd.date_range("2022-01-03", periods = 6, freq = "B")
+        self.assets = np.array([110.0, 99.0, 99.0, 108.9, 98.01, 117.612])
+        self.weights = np.array([[1, 0], [0.5, 0.5], [0, 0], [0, 1], [0, 1], [1, 0]])
+
+    def test_summary(self):
+        """
+        the metrics added day by day are the metrics of the whole arrays
+        """
+        metrics = PortfolioMetrics(["A", "B"], 100)
+        for date, asset, weights in zip(self.dates, self.assets, self.weights):
+            metrics.record(date, asset, weights)
+        returns = self.assets / np.concatenate([[100], self.assets[:-1]]) - 1
+        np.testing.assert_allclose(returns, [0.1, -0.1, 0, 0.1, -0.1, 0.2])
+
+        summary = metrics.summary()
+        self.assertEqual(summary["days"], 6)
+        self.assertAlmostEqual(summary["cumulative_return"], 0.17612)
+        self.assertAlmostEqual(summary["volatility"], returns.std(ddof = 1) * np.sqrt(252))
+        self.assertAlmostEqual(summary["sharpe"],
+                               returns.mean() / returns.std(ddof = 1) * np.sqrt(252))
+        self.assertAlmostEqual(summary["sortino"], returns.mean() * np.sqrt(252)
+                               / np.sqrt((np.minimum(returns, 0) ** 2).mean()))
+        self.assertAlmostEqual(summary["max_drawdown"], 1 - 98.01 / 110)
+        self.assertAlmostEqual(summary["hit_rate"], 3 / 5)
+        ### changes of the weights: 1 + (0.5 + 0.5) + 1 + 1 + 0 + 2
+        self.assertAlmostEqual(summary["turnover"], 6 / 6)
+
+        frame = metrics.frame()
+        self.assertEqual(list(frame.columns), ["equity", "return", "A", "B"])
+        self.assertEqual(frame.index.name, "date")
+        np.testing.assert_allclose(frame["return"], returns)
+
+        ### several days at once give the same metrics
+        whole = PortfolioMetrics(["A", "B"], 100)
+        whole.extend(self.dates[:2], self.assets[:2], self.weights[:2])
+        whole.extend(self.dates[2:], self.assets[2:], self.weights[2:])
+        for key, value in whole.summary().items():
+            self.assertAlmostEqual(value, summary[key])
+        pd.testing.assert_frame_equal(whole.frame(), frame)
+
+    def test_empty(self):
+        """
+        no day gives no ratio
+        """
+        summary = PortfolioMetrics(["A"]).summary()
+        self.assertEqual((summary["days"], summary["final"]), (0, 100))
+        self.assertTrue(np.isnan(summary["sharpe"]))
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_parquet(self):
+        """
+        the equity and the weights are saved to Parquet
+        """
+        metrics = PortfolioMetrics(["A", "B"], 100)
+        metrics.extend(self.dates, self.assets, self.weights)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "metrics.parquet")
+            metrics.to_parquet(path)
+            pd.testing.assert_frame_equal(pd.read_parquet(path), metrics.frame(),
+                                          check_freq = False)
+
+class TestEvaluationMetrics(StooqTestCase):
+    """
+    Test class
+    """
+    def evaluation(self):
+        """
+        helper function, a new evaluation of the same model
+        """
+        model = self.prediction()
+        return StockEvaluation(model)
+
+    def test_same_as_backtest(self):
+        """
+        evaluate and backtest record the same days
+        """
+        for weighted in (False, True):
+            slow = self.evaluation()
+            with contextlib.redirect_stdout(io.StringIO()):
+                slow.evaluate(days = 16, weighted = weighted)
+            fast = self.evaluation()
+            result = fast.backtest(days = 16, weighted = weighted)
+
+            frame = slow.metrics.frame()
+            self.assertEqual(len(frame), 9)
+            self.assertEqual(frame["equity"].iloc[-1], slow.asset)
+            np.testing.assert_allclose(frame.drop(columns = "return"),
+                                       fast.metrics.frame().drop(columns = "return"),
+                                       rtol = 1e-12)
+            np.testing.assert_allclose(frame[["Meta", "AMZN"]].sum(axis = 1),
+                                       (result.loc[frame.index, "stocks"] != "").astype(float))
+            self.assertAlmostEqual(slow.metrics.summary()["sharpe"],
+                                   fast.metrics.summary()["sharpe"])
@@ -0,0 +1,106 @@
+"""
+Test for the panel and the vectorized derived columns
+"""
+import unittest
+import numpy as np
+import pandas as pd
+
+from visualization import StockData
+from visualization.panel import StockPanel
+from .stooq_server import StooqTestCase
+
+class TestPanel(StooqTestCase):
+    """
+    Test class
+    """
+    def test_derived_columns(self):
+        """
+        the vectorized columns have the same values as StockData.diff
+        """
+        df = self.data.df["Meta"]
+        close_open = [StockData.diff(x, y)[0] for x, y in zip(df["Open"], df["Close"])]
+        high_low = [abs(StockData.diff(x, y)[0]) for x, y in zip(df["High"], df["Low"])]
+        np.testing.assert_allclose(df["close-open"], close_open, atol = 1e-12)
+        np.testing.assert_allclose(df["high-low"], high_low, atol = 1e-12)
+
+    def test_panel_aligned(self):
+        """
+        the panel has one date index and the values of every stock
+        """
+        panel = self.data.get_panel()
+        self.assertEqual(panel.values.shape, (7, self.data.open_days, 2))
+        self.assertTrue(panel.field("Close", ["AMZN"])["AMZN"].equals(
+                        self.data.df["AMZN"]["Close"]))
+        self.assertIs(self.data.get_panel(), panel)
+
+    def test_panel_missing_dates(self):
+        """
+        a stock without data on a date is NaN on that date
+        """
+        frames = {"a": self.data.df["Meta"], "b": self.data.df["AMZN"].iloc[5:]}
+        panel = StockPanel.from_frames(frames)
+        self.assertEqual(len(panel.dates), len(frames["a"]))
+        self.assertTrue(np.isnan(panel.field("Open")["b"].iloc[:5]).all())
+
+    def test_wide(self):
+        """
+        several fields in one frame, ordered by stock and then field
+        """
+        wide = self.data.get_panel().wide(["Open", "Close"])
+        self.assertEqual(list(wide.columns), ["Open-Meta", "Close-Meta", "Open-AMZN",
+                                              "Close-AMZN"])
+        self.assertTrue(wide["Close-AMZN"].equals(self.data.df["AMZN"]["Close"].rename(
+                        "Close-AMZN")))
+
+    def test_fluctuation(self):
+        """
+        same values as the per stock computation
+        """
+        result = self.data.fluctuation(start = "2022-02-01", end = "2022-03-01",
+                                       in_function = True)
+        expected = self.data.df["Meta"].loc["2022-02-01":"2022-03-01", "close-open"]
+        self.assertTrue(result["Meta"].equals(expected.rename("Meta")))
+
+    def test_total_fluctuation(self):
+        """
+        same string as StockData.diff
+        """
+        result = self.data.total_fluctuation(start = "2022-02-01", end = "2022-03-01")
+        df = self.data.df["AMZN"]
+        expected = StockData.diff(df.loc["2022-02-01"]["Close"], df.loc["2022-03-01"]["Open"])
+        self.assertEqual(result["AMZN"].iloc[0], expected[1])
+
+    def test_window_view(self):
+        """
+        the window is a view of the panel and the bounds are both included
+        """
+        window = self.data.window(pd.Timestamp("2022-02-01"), pd.Timestamp("2022-03-01"))
+        self.assertTrue(np.shares_memory(window.values, self.data.get_panel().values))
+        self.assertEqual(window.dates[0], pd.Timestamp("2022-02-01"))
+        self.assertEqual(window.dates[-1], pd.Timestamp("2022-03-01"))
+        single = self.data.window("2022-02-01", "2022-03-01", ["AMZN"], ["Close"])
+        self.assertTrue(np.shares_memory(single.values, self.data.get_panel().values))
+        self.assertTrue(single.field("Close")["AMZN"].equals(
+                        self.data.df["AMZN"].loc["2022-02-01":"2022-03-01", "Close"]))
+
+    def test_window_between_dates(self):
+        """
+        bounds on closed days, and a window without any date
+        """
+        window = self.data.window("2022-01-01", "2022-01-09", fields = ["Open", "Close"])
+        self.assertEqual(list(window.dates), list(pd.to_datetime(["2022-01-03", "2022-01-04",
+                                        "2022-01-05", "2022-01-06", "2022-01-07"])))
+        self.assertEqual(window.values.shape, (2, 5, 2))
+        self.assertEqual(len(self.data.window("2022-01-08", "2022-01-09").dates), 0)
+
+    def test_window_not_consecutive(self):
+        """
+        stocks in another order still give the right values
+        """
+        window = self.data.window("2022-02-01", "2022-03-01", ["AMZN", "Meta"],
+                                  ["Close", "Open"])
+        self.assertTrue(window.field("Open")["Meta"].equals(
+                        self.data.df["Meta"].loc["2022-02-01":"2022-03-01", "Open"]))
+
+if __name__ == "__main__":
+    unittest.main()
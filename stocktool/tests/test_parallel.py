@@ -0,0 +1,100 @@
+"""
+Test for fitting the models in a process pool
+"""
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from model.parallel import run_jobs
+from model import ModelRegistry, StockPrediction
+from .stooq_server import StooqTestCase
+
+def square(x):
+    """
+    job that finishes
+    """
+    return x * x
+
+def fail(x):
+    """
+    job that raises
+    """
+    raise ValueError(f"bad value {x}")
+
+def sleep(x):
+    """
+    job that takes x seconds
+    """
+    time.sleep(x)
+    return x
+
+class TestRunJobs(unittest.TestCase):
+    """
+    Test class
+    """
+    def test_inline(self):
+        """
+        one worker runs the jobs in this process
+        """
+        results, errors = run_jobs(square, {"a": (2,), "b": (3,)})
+        self.assertEqual(results, {"a": 4, "b": 9})
+        self.assertEqual(errors, {})
+
+    def test_pool(self):
+        """
+        several workers give the same results
+        """
+        jobs = {str(i): (i,) for i in range(6)}
+        results, errors = run_jobs(square, jobs, workers = 3)
+        self.assertEqual(results, {str(i): i * i for i in range(6)})
+        self.assertEqual(errors, {})
+
+    def test_given_pool(self):
+        """
+        the jobs run in the given pool, which is still open afterwards
+        """
+        with ProcessPoolExecutor(max_workers = 2) as pool:
+            for _ in range(2):
+                results, errors = run_jobs(square, {"a": (2,), "b": (3,)}, workers = 2,
+                                           pool = pool)
+                self.assertEqual(results, {"a": 4, "b": 9})
+                self.assertEqual(errors, {})
+
+    def test_failure_isolated(self):
+        """
+        a failing job does not stop the other jobs
+        """
+        for workers in (1, 2):
+            results, errors = run_jobs(fail, {"a": (1,)}, workers = workers)
+            self.assertEqual(results, {})
+            self.assertIsInstance(errors["a"], ValueError)
+            results, errors = run_jobs(sleep, {"a": (0,), "b": (5,)}, workers = workers,
+                                       timeout = 0.5)
+            self.assertEqual(results, {"a": 0})
+            self.assertIsInstance(errors["b"], TimeoutError)
+
+class TestParallelPrediction(StooqTestCase):
+    """
+    Test class
+    """
+    def test_pool_reused(self):
+        """
+        the updates run in the pool of the fit, close shuts it down
+        """
+        with StockPrediction(self.data, method = "Drift", workers = 2,
+                             registry = ModelRegistry(self.folder.name)) as model:
+            pool = model.pool
+            self.assertIsNotNone(pool)
+            model.update("2022-05-27", message = False)
+            model.update("2022-06-03", message = False)
+            self.assertIs(model.pool, pool)
+            self.assertEqual(model.failed, {})
+        self.assertIsNone(model.pool)
+
+    def test_all_timeout(self):
+        """
+        every model times out, so no model can be used
+        """
+        with self.assertRaises(ValueError):
+            StockPrediction(self.data, workers = 2, timeout = 0.01,
+                            registry = ModelRegistry(self.folder.name))
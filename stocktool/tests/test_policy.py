@@ -0,0 +1,80 @@
+"""
+Test for the train window and the refit policy
+"""
+import unittest
+import pandas as pd
+
+from model import ModelRegistry, RefitPolicy, StockPrediction
+from .stooq_server import StooqTestCase
+
+class TestRefitPolicy(unittest.TestCase):
+    """
+    Test class
+    """
+    def test_choose(self):
+        """
+        refit every few updates, or on drift
+        """
+        policy = RefitPolicy(every = 3, drift = 0.05)
+        policy.record("Meta", pd.Timestamp("2022-01-03"), "fit", 1.0)
+        paths = []
+        for day in range(4, 10):
+            path = policy.choose("Meta", error = 0.01)
+            policy.record("Meta", pd.Timestamp(f"2022-01-{day:02d}"), path, 0.1)
+            paths.append(path)
+        self.assertEqual(paths, ["update", "update", "refit", "update", "update", "refit"])
+        self.assertEqual(policy.choose("Meta", error = 0.2), "refit")
+        self.assertEqual(RefitPolicy().choose("Meta"), "update")
+        stats = policy.stats()
+        self.assertEqual(stats.loc[("Meta", "update"), "count"], 4)
+        self.assertEqual(stats.loc[("Meta", "refit"), "last"], pd.Timestamp("2022-01-09"))
+        with self.assertRaises(ValueError):
+            RefitPolicy(every = 0)
+
+class TestWindow(StooqTestCase):
+    """
+    Test class
+    """
+    def setUp(self):
+        super().setUp()
+        self.registry = ModelRegistry(self.folder.name + "/models")
+
+    def test_lookback(self):
+        """
+        the models are fitted on the last rows only, the train data keeps all of them
+        """
+        model = StockPrediction(self.data, method = "Drift", lookback = 30,
+                                registry = self.registry)
+        self.assertEqual(len(model.model["Meta"]._y), 30)
+        self.assertEqual(len(model.train["Meta"]), self.data.open_days)
+
+        model = StockPrediction(self.data, method = "Drift", lookback = "31D",
+                                registry = self.registry)
+        first = model.train_window("Meta")["Date"].iloc[0]
+        self.assertEqual(first, pd.Timestamp("2022-04-20"))
+
+    def test_default_update(self):
+        """
+        the default policy only adds the new rows to the models which can
+        """
+        for method in ("Drift", "ETS"):
+            model = StockPrediction(self.data, method = method, registry = self.registry)
+            model.update("2022-05-27", message = False)
+            paths = [record["path"] for record in model.policy.records]
+            self.assertEqual(paths, ["fit", "fit", "update", "update"])
+
+    def test_update_paths(self):
+        """
+        cheap updates between the scheduled refits, which use the window
+        """
+        model = StockPrediction(self.data, method = "Drift", lookback = 30,
+                                policy = RefitPolicy(every = 2), registry = self.registry)
+        model.update("2022-05-27", message = False)
+        self.assertEqual(len(model.model["Meta"]._y), 35)
+        model.update("2022-06-03", message = False)
+        self.assertEqual(len(model.model["Meta"]._y), 30)
+        self.assertEqual(model.y_window("Meta").index[-1], len(model.y["Meta"]) - 1)
+
+        stats = model.policy.stats()
+        self.assertEqual(list(stats.loc["AMZN"].index), ["fit", "refit", "update"])
+        self.assertTrue((stats["count"] == 1).all())
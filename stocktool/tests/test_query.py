@@ -0,0 +1,67 @@
+"""
+Test for the range query index
+"""
+import unittest
+import numpy as np
+import pandas as pd
+
+from visualization.panel import StockPanel
+from visualization.query import RangeQueryIndex
+from .stooq_server import StooqTestCase
+
+class TestQuery(StooqTestCase):
+    """
+    Test class
+    """
+    start = "2021-01-04"
+
+    def check(self, stats, series):
+        """
+        helper function, compare one row of stats with the scan of the series
+        """
+        self.assertAlmostEqual(stats["mean"], series.mean(), places = 10)
+        self.assertAlmostEqual(stats["std"], series.std(), places = 8)
+        self.assertEqual(stats["max"], series.max())
+        self.assertEqual(stats["min"], series.min())
+        self.assertEqual(stats["max_date"], series.idxmax())
+        self.assertEqual(stats["min_date"], series.idxmin())
+        self.assertEqual(stats["days"], series.count())
+
+    def test_random_windows(self):
+        """
+        the index gives the same values as scanning the window
+        """
+        rng = np.random.default_rng(0)
+        dates = self.data.get_panel().dates
+        queries = []
+        for _ in range(50):
+            i, j = sorted(rng.integers(0, len(dates), 2))
+            queries.append((["Meta", "AMZN"][rng.integers(0, 2)], dates[i], dates[j]))
+        for method in ["close-open", "high-low"]:
+            result = self.data.batch_fluctuation_stats(queries, method)
+            for (name, start, end), (_, row) in zip(queries, result.iterrows()):
+                self.check(row, self.data.df[name].loc[start:end, method])
+
+    def test_fluctuation_stats(self):
+        """
+        one window for every stock
+        """
+        stats = self.data.fluctuation_stats(start = "2022-02-01", end = "2022-03-01",
+                                            method = "high-low")
+        self.assertEqual(list(stats.index), ["Meta", "AMZN"])
+        self.check(stats.loc["AMZN"], self.data.df["AMZN"].loc["2022-02-01":"2022-03-01",
+                                                              "high-low"])
+
+    def test_missing_and_empty(self):
+        """
+        NaN dates are skipped and an empty window gives NaN
+        """
+        frames = {"a": self.data.df["Meta"], "b": self.data.df["AMZN"].iloc[::2]}
+        index = RangeQueryIndex(StockPanel.from_frames(frames))
+        stats = index.query("close-open", [1, 1], [0, 5], [40, 5])
+        self.check(stats.iloc[0], frames["b"]["close-open"].iloc[:20])
+        self.assertTrue(np.isnan(stats.iloc[1]["mean"]))
+        self.assertTrue(pd.isna(stats.iloc[1]["max_date"]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Test for the model registry and for saving StockPrediction
+"""
+import os
+import tempfile
+import unittest
+import pandas as pd
+
+from visualization import BarStore, StockData
+from model import ModelRegistry, StockPrediction
+from .stooq_server import StooqTestCase
+
+def make_train(rows):
+    """
+    train data with the given number of rows
+    """
+    dates = pd.bdate_range("2022-01-03", periods = rows)
+    return pd.DataFrame({"Date": dates, "Close": [100.0 + i for i in range(rows)]})
+
+class TestModelRegistry(unittest.TestCase):
+    """
+    Test class
+    """
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.registry = ModelRegistry(self.folder.name)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_same_data(self):
+        """
+        a model is found for the same train data only
+        """
+        train = make_train(10)
+        self.registry.save("Meta", "Close", "TBATS", train, {"fitted": 10}, pd.DataFrame())
+        found = self.registry.find("Meta", "Close", "TBATS", train)
+        self.assertEqual(found["model"], {"fitted": 10})
+        self.assertEqual(found["rows"], 10)
+
+        changed = train.copy()
+        changed.loc[3, "Close"] = 1.0
+        self.assertIsNone(self.registry.find("Meta", "Close", "TBATS", changed))
+        self.assertIsNone(self.registry.find("Meta", "Open", "TBATS", train.rename(
+                                             columns = {"Close": "Open"})))
+        self.assertIsNone(self.registry.find("AMZN", "Close", "TBATS", train))
+
+    def test_prefix(self):
+        """
+        a model fitted on the start of the train data is found, and replaced when the
+        longer model is saved
+        """
+        self.registry.save("Meta", "Close", "TBATS", make_train(10), "short", pd.DataFrame())
+        found = self.registry.find("Meta", "Close", "TBATS", make_train(15))
+        self.assertEqual((found["model"], found["rows"]), ("short", 10))
+        self.assertIsNone(self.registry.find("Meta", "Close", "TBATS", make_train(5)))
+
+        self.registry.save("Meta", "Close", "TBATS", make_train(15), "long", pd.DataFrame())
+        self.assertEqual(len(self.registry.entries("Meta", "Close", "TBATS")), 1)
+        self.assertEqual(self.registry.find("Meta", "Close", "TBATS", make_train(20))["model"],
+                         "long")
+
+class TestReuse(StooqTestCase):
+    """
+    Test class
+    """
+    def setUp(self):
+        super().setUp()
+        self.store = BarStore(os.path.join(self.folder.name, "bars"))
+        self.registry = ModelRegistry(os.path.join(self.folder.name, "models"))
+
+    def test_reuse_and_save(self):
+        """
+        the second class with the same data reuses the model, and a saved class predicts
+        the same values
+        """
+        data = StockData(["Meta"], "2022-01-03", "2022-02-28", store = self.store)
+        model = StockPrediction(data, registry = self.registry)
+        pred = model.predict(3)["Meta"]
+
+        again = StockPrediction(data, registry = self.registry)
+        self.assertIsNot(again.model["Meta"], model.model["Meta"])
+        self.assertTrue(again.predict(3)["Meta"].equals(pred))
+
+        path = os.path.join(self.folder.name, "model.pkl")
+        model.save(path)
+        loaded = StockPrediction.load(path, data = data, registry = self.registry)
+        self.assertEqual(loaded.date_train, model.date_train)
+        self.assertTrue(loaded.y["Meta"].equals(model.y["Meta"]))
+        self.assertTrue(loaded.predict(3)["Meta"].equals(pred))
@@ -0,0 +1,107 @@
+"""
+Test for the replay engine
+"""
+import contextlib
+import io
+import time
+import pandas as pd
+
+from visualization.fetch import fetch_symbols
+from evaluation import StockEvaluation
+from visualization.panel import StockPanel
+from evaluation.replay import LiveClock, PanelSource, ReplayEngine, SimulatedClock
+from .stooq_server import StooqTestCase
+
+class TestReplay(StooqTestCase):
+    """
+    Test class
+    """
+    def evaluation(self):
+        """
+        helper function, a new evaluation of the same model
+        """
+        model = self.prediction()
+        return StockEvaluation(model)
+
+    def test_same_as_evaluate(self):
+        """
+        the replay of a panel gives the same asset as evaluate, without any download
+        """
+        slow = self.evaluation()
+        with contextlib.redirect_stdout(io.StringIO()):
+            slow.evaluate(days = 16)
+
+        frames, _ = fetch_symbols(["Meta", "AMZN"], "2022-05-23", "2022-06-10",
+                                  store = self.data.store)
+        fast = self.evaluation()
+        clock = SimulatedClock(fast.date)
+        engine = ReplayEngine(fast, PanelSource(frames), clock)
+        queries = len(self.server.queries)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = engine.run(end = "2022-06-05")
+        self.assertEqual(len(self.server.queries), queries)
+        self.assertEqual(len(result), 9)
+        self.assertNotIn(pd.Timestamp("2022-05-30"), result.index)
+        self.assertEqual(result["asset"].iloc[-1], slow.asset)
+        self.assertEqual((fast.date, fast.model.date_train), (slow.date, slow.model.date_train))
+        pd.testing.assert_frame_equal(fast.model.pred["Meta"], slow.model.pred["Meta"])
+        self.assertEqual(clock.now(), pd.Timestamp("2022-06-03 16:30"))
+
+        ### the default source reads through the store
+        store = self.evaluation()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = ReplayEngine(store).run(end = "2022-06-05")
+        self.assertEqual(result["asset"].iloc[-1], slow.asset)
+
+    def test_open_close(self):
+        """
+        a panel with only Open and Close is enough for the default handlers
+        """
+        slow = self.evaluation()
+        with contextlib.redirect_stdout(io.StringIO()):
+            slow.evaluate(days = 7)
+        frames, _ = fetch_symbols(["Meta", "AMZN"], "2022-05-23", "2022-05-27",
+                                  store = self.data.store)
+        panel = StockPanel.from_frames(frames, fields = ["Open", "Close"])
+        fast = self.evaluation()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = ReplayEngine(fast, PanelSource(panel),
+                                  SimulatedClock(fast.date)).run(end = "2022-05-27")
+        self.assertEqual(len(result), 5)
+        self.assertEqual(result["asset"].iloc[-1], slow.asset)
+
+    def test_handlers(self):
+        """
+        the handlers are called in order, and missing bars stop the replay
+        """
+        frames, _ = fetch_symbols(["Meta", "AMZN"], "2022-05-23", "2022-05-27",
+                                  store = self.data.store)
+        engine = ReplayEngine(self.evaluation(), PanelSource(frames), poll = 60, retries = 2)
+        events = []
+        engine.on("invest", lambda event: events.append((event.kind, event.session)),
+                  replace = True)
+        engine.on("update", lambda event: events.append((event.kind, event.session)))
+        result = engine.run(limit = 2)
+        self.assertEqual(events[:3], [("invest", pd.Timestamp("2022-05-23")),
+                                      ("update", pd.Timestamp("2022-05-23")),
+                                      ("invest", pd.Timestamp("2022-05-24"))])
+        self.assertEqual(len(result), 2)
+        self.assertEqual(engine.evaluation.model.date_train, pd.Timestamp("2022-05-24"))
+
+        with self.assertRaises(ValueError):
+            engine.run(end = "2022-06-03")
+        ### the clock waited for the bars of 05-31 twice
+        self.assertEqual(engine.clock.now(), pd.Timestamp("2022-05-31 16:32"))
+        with self.assertRaises(ValueError):
+            engine.on("close", print)
+
+    def test_live_clock(self):
+        """
+        the live clock does not wait for a time already past
+        """
+        clock = LiveClock()
+        begin = time.perf_counter()
+        clock.wait_until(pd.Timestamp.now() - pd.Timedelta(hours = 1))
+        clock.wait_until(pd.Timestamp.now() + pd.Timedelta(seconds = 0.05))
+        self.assertLess(time.perf_counter() - begin, 1)
+        self.assertGreater(time.perf_counter() - begin, 0.04)
@@ -0,0 +1,101 @@
+"""
+Test for the forecast server
+"""
+import asyncio
+import datetime as dt
+import json
+import threading
+
+from stocktool.server import ForecastServer
+from .stooq_server import StooqTestCase
+
+async def send(server, verb, target):
+    """
+    helper function, send one request to the server and return the status and the body.
+    """
+    reader, writer = await asyncio.open_connection(server.host, server.port)
+    writer.write(f"{verb} {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+class TestForecastServer(StooqTestCase):
+    """
+    Test class
+    """
+    def setUp(self):
+        super().setUp()
+        self.model = self.prediction()
+
+    def test_requests(self):
+        """
+        predict, fluctuation and update over HTTP
+        """
+        async def run():
+            server = await ForecastServer(self.model, port = 0, update_at = None).start()
+            try:
+                status, pred = await send(server, "GET", "/predict?symbol=Meta&days=3")
+                self.assertEqual(status, 200)
+                self.assertEqual(len(pred["forecast"]), 3)
+                self.assertEqual(pred["forecast"][0]["date"], "2022-05-23")
+                self.assertEqual(pred["date_train"], "2022-05-20")
+
+                status, fluct = await send(server, "GET", "/fluctuation?symbol=AMZN"
+                                           "&start=2022-05-02&end=2022-05-06")
+                self.assertEqual(status, 200)
+                self.assertEqual(len(fluct["values"]), 5)
+
+                self.assertEqual((await send(server, "GET", "/update"))[0], 405)
+                status, update = await send(server, "POST", "/update?date=2022-05-27")
+                self.assertEqual(update["date_train"], "2022-05-27")
+                status, pred = await send(server, "GET", "/predict?symbol=Meta&days=3")
+                self.assertEqual(pred["forecast"][0]["date"], "2022-05-31")
+
+                self.assertEqual((await send(server, "GET", "/predict?symbol=IBM"))[0], 400)
+                self.assertEqual((await send(server, "GET", "/predict"))[0], 400)
+                self.assertEqual((await send(server, "GET", "/nothing"))[0], 404)
+                status, health = await send(server, "GET", "/health")
+                self.assertEqual(health["errors"], 4)
+            finally:
+                await server.stop()
+
+        asyncio.run(run())
+
+    def test_coalesce(self):
+        """
+        requests for the same key while one runs share its result
+        """
+        release = threading.Event()
+        calls = []
+
+        def slow(value):
+            release.wait(5)
+            calls.append(value)
+            return value
+
+        async def run():
+            server = ForecastServer(self.model, update_at = None)
+            tasks = [asyncio.create_task(server.call(("predict", "Meta", 1, 0.95), slow, i))
+                     for i in range(5)]
+            await asyncio.sleep(0.05)
+            release.set()
+            results = await asyncio.gather(*tasks)
+            await server.stop()
+            return server, results
+
+        server, results = asyncio.run(run())
+        self.assertEqual(results, [0] * 5)
+        self.assertEqual(calls, [0])
+        self.assertEqual(server.stats["coalesced"], 4)
+
+    def test_schedule(self):
+        """
+        seconds until the next daily update
+        """
+        now = dt.datetime(2022, 5, 20, 17, 30)
+        self.assertEqual(ForecastServer.seconds_until("18:00", now), 1800)
+        self.assertEqual(ForecastServer.seconds_until("17:00", now), 23.5 * 3600)
+        with self.assertRaises(ValueError):
+            ForecastServer(self.model, update_at = "6pm")
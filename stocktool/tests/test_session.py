@@ -0,0 +1,53 @@
+"""
+Test for the shared http session, against a local stand-in of stooq
+"""
+import unittest
+import pandas as pd
+
+from visualization import configure_session, fetch, get_session, session_stats
+from .stooq_server import StooqServer
+
+class TestSession(unittest.TestCase):
+    """
+    Test class
+    """
+    def setUp(self):
+        self.server = StooqServer().__enter__()
+        configure_session(backend = "memory", pool_size = 4)
+
+    def tearDown(self):
+        configure_session(backend = "sqlite", pool_size = 10)
+        self.server.__exit__()
+
+    def test_shared(self):
+        """
+        the same session is returned until the settings change
+        """
+        session = get_session()
+        self.assertIs(get_session(), session)
+        self.assertEqual(session.get_adapter(self.server.url)._pool_maxsize, 4)
+        configure_session(pool_size = 2)
+        self.assertIsNot(get_session(), session)
+
+    def test_hits_and_misses(self):
+        """
+        the second identical download is answered by the cache
+        """
+        start, end = pd.Timestamp("2022-01-03"), pd.Timestamp("2022-01-31")
+        first = fetch.read_stooq("Meta", start, end, url = self.server.url)
+        second = fetch.read_stooq("Meta", start, end, url = self.server.url)
+        stats = session_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertGreater(stats["bytes"], 0)
+        self.assertEqual(self.server.requests["META.US"], 1)
+        self.assertTrue(first.equals(second))
+
+    def test_invalid_setting(self):
+        """
+        unknown setting
+        """
+        with self.assertRaises(ValueError):
+            configure_session(pool = 3)
+
+if __name__ == "__main__":
+    unittest.main()
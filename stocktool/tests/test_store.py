@@ -0,0 +1,67 @@
+"""
+Test for the local price store, against a local stand-in of stooq
+"""
+import unittest
+import pandas as pd
+
+from visualization import BarStore, StockData
+from .stooq_server import StooqTestCase
+
+class TestStore(StooqTestCase):
+    """
+    Test class
+    """
+    stocks = None
+
+    def test_second_read_is_local(self):
+        """
+        the same range is only downloaded once
+        """
+        first = self.store.get("Meta", "2022-01-03", "2022-01-31")
+        second = self.store.get("Meta", "2022-01-10", "2022-01-20")
+        self.assertEqual(self.server.requests["META.US"], 1)
+        self.assertEqual(len(first), 20)
+        self.assertTrue(second.equals(first.loc["2022-01-10":"2022-01-20"]))
+        self.assertEqual(self.store.covered("Meta"),
+                         (pd.Timestamp("2022-01-03"), pd.Timestamp("2022-01-31")))
+
+    def test_top_up(self):
+        """
+        only the missing head and tail are downloaded
+        """
+        self.store.get("Meta", "2022-01-03", "2022-01-31")
+        data = self.store.get("Meta", "2021-12-01", "2022-02-15")
+        self.assertEqual(self.server.queries[1:], [("META.US", "20211201", "20220102"),
+                                                   ("META.US", "20220201", "20220215")])
+        expected = self.server.prices["META.US"].loc["2021-12-01":"2022-02-15"]
+        self.assertEqual(list(data.index), list(expected.index))
+        self.assertTrue((data["Close"].values == expected["Close"].values).all())
+
+    def test_persistent(self):
+        """
+        a new store over the same directory reads the files
+        """
+        self.store.get("Meta", "2022-01-03", "2022-01-31")
+        data = BarStore(self.folder.name).get("Meta", "2022-01-03", "2022-01-31")
+        self.assertEqual(self.server.requests["META.US"], 1)
+        self.assertEqual(len(data), 20)
+
+    def test_invalid_stock(self):
+        """
+        an invalid stock is not stored
+        """
+        data = self.store.get("Metee", "2022-01-03", "2022-01-31")
+        self.assertEqual(len(data), 0)
+        self.assertIsNone(self.store.covered("Metee"))
+
+    def test_stock_data_uses_store(self):
+        """
+        building StockData twice only downloads once
+        """
+        StockData(["Meta"], "2022-01-03", "2022-05-20", store = self.store)
+        data = StockData(["Meta"], "2022-01-03", "2022-05-20", store = self.store)
+        self.assertEqual(self.server.requests["META.US"], 1)
+        self.assertEqual(data.open_days, len(data.df["Meta"]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Test for the strategy sweep
+"""
+from unittest import mock
+import warnings
+import numpy as np
+import pandas as pd
+
+from evaluation import StockEvaluation, StrategySweep
+from .stooq_server import StooqTestCase
+
+class TestSweep(StooqTestCase):
+    """
+    Test class
+    """
+    def model(self):
+        """
+        helper function, a new model on the same data
+        """
+        return self.prediction()
+
+    def test_same_as_backtest(self):
+        """
+        the default settings give the final asset of backtest
+        """
+        sweep = StrategySweep(self.model(), days = 16)
+        table = sweep.run(asset = (100, 50))
+        self.assertEqual(len(table), 4)
+        self.assertTrue((np.diff(table["final"]) <= 0).all())
+        for weighted in (False, True):
+            result = StockEvaluation(self.model()).backtest(days = 16, weighted = weighted)
+            row = table[(table["weighted"] == weighted) & (table["asset"] == 100)].iloc[0]
+            self.assertAlmostEqual(row["final"], result["asset"].iloc[-1], places = 10)
+            self.assertEqual(row["invested"], (result["stocks"] != "").sum())
+            self.assertEqual(row["stocks"], "Meta,AMZN")
+        half = table[table["asset"] == 50]["return"].sort_values().to_numpy()
+        full = table[table["asset"] == 100]["return"].sort_values().to_numpy()
+        np.testing.assert_allclose(half, full)
+
+    def test_workers(self):
+        """
+        the worker processes give the same table, the settings are checked
+        """
+        sweep = StrategySweep(self.model(), days = 16)
+        grid = {"stocks": [["Meta"], ["AMZN"], ["Meta", "AMZN"]],
+                "threshold": (0.0, 0.01, 1.0),
+                "periods": [("2022-05-23", "2022-05-31"), ("2022-06-01", "2022-06-06")]}
+        table = sweep.run(**grid)
+        self.assertEqual(len(table), 36)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            parallel = sweep.run(workers = 2, **grid)
+        self.assertEqual(sweep.errors, {})
+        pd.testing.assert_frame_equal(table, parallel)
+        ### before Python 3.8 the workers get a copy of the arrays
+        with mock.patch("evaluation.sweep.shared_module", return_value = None):
+            copied = sweep.run(workers = 2, **grid)
+        pd.testing.assert_frame_equal(table, copied)
+
+        ### nothing is bought above a 100% predicted profit
+        never = table[table["threshold"] == 1.0]
+        self.assertTrue((never["final"] == 100).all())
+        self.assertTrue((never["invested"] == 0).all())
+        self.assertTrue((table["max_drawdown"] >= 0).all())
+        with self.assertRaises(ValueError):
+            sweep.grid(stocks = [["TSLA"]])
@@ -0,0 +1,86 @@
+"""
+Test for the trading calendar
+"""
+import unittest
+import numpy as np
+import pandas as pd
+
+from visualization import StockData, TradingCalendar
+
+class TestCalendar(unittest.TestCase):
+    """
+    Test class
+    """
+    def setUp(self):
+        self.calendar = TradingCalendar(start = "2021-06-01", end = "2022-06-01")
+
+    def test_is_open(self):
+        """
+        open on a weekday, closed on weekend and holiday
+        """
+        self.assertTrue(self.calendar.is_open(pd.Timestamp("2022-01-03")))
+        self.assertFalse(self.calendar.is_open(pd.Timestamp("2022-01-01")))
+        self.assertFalse(self.calendar.is_open(pd.Timestamp("2022-01-17")))
+
+    def test_previous_next(self):
+        """
+        previous and next session of a closed day, and of an open day
+        """
+        self.assertEqual(self.calendar.previous_session("2022-01-01"),
+                         pd.Timestamp("2021-12-31"))
+        self.assertEqual(self.calendar.next_session("2022-01-01"),
+                         pd.Timestamp("2022-01-03"))
+        self.assertEqual(self.calendar.next_session("2022-01-03"),
+                         pd.Timestamp("2022-01-03"))
+
+    def test_session_count(self):
+        """
+        test for the count of open days, both ends included
+        """
+        self.assertEqual(self.calendar.session_count("2022-01-03", "2022-01-24"), 15)
+        self.assertEqual(self.calendar.session_count("2022-01-03", "2022-01-22"), 14)
+        self.assertEqual(len(self.calendar.session_range("2022-01-03", "2022-01-22")), 14)
+        self.assertEqual(self.calendar.session_count("2022-01-22", "2022-01-03"), 0)
+
+    def test_sessions_after(self):
+        """
+        the open days strictly after the given date
+        """
+        days = self.calendar.sessions_after(pd.Timestamp("2022-10-10"), 5)
+        self.assertEqual(list(days), list(pd.to_datetime(["2022-10-11", "2022-10-12",
+                                        "2022-10-13", "2022-10-14", "2022-10-17"])))
+
+    def test_extend_span(self):
+        """
+        dates outside the span extend it
+        """
+        self.assertEqual(self.calendar.previous_session("2000-01-01"),
+                         pd.Timestamp("1999-12-31"))
+        self.assertEqual(self.calendar.next_session("2023-12-25"),
+                         pd.Timestamp("2023-12-26"))
+
+    def test_vectorized(self):
+        """
+        vectorized form matches the single date form
+        """
+        dates = pd.date_range("2021-12-20", "2022-01-20")
+        is_open = self.calendar.is_open_array(dates)
+        previous = self.calendar.previous_sessions(dates)
+        nexts = self.calendar.next_sessions(dates)
+        for i, date in enumerate(dates):
+            self.assertEqual(is_open[i], self.calendar.is_open(date))
+            self.assertEqual(previous[i], self.calendar.previous_session(date))
+            self.assertEqual(nexts[i], self.calendar.next_session(date))
+        self.assertEqual(is_open.dtype, np.bool_)
+
+    def test_stock_data_helpers(self):
+        """
+        StockData helpers use the calendar
+        """
+        self.assertEqual(StockData.last_open_day(pd.Timestamp("2022-01-01")),
+                         pd.Timestamp("2021-12-31"))
+        self.assertEqual(StockData.next_open_day(pd.Timestamp("2022-01-01")),
+                         pd.Timestamp("2022-01-03"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Test for the search of the model settings
+"""
+import time
+
+from model import ModelRegistry, StockPrediction, tune
+from model.tuning import GRIDS
+from .stooq_server import StooqTestCase
+
+class TestTune(StooqTestCase):
+    """
+    Test class
+    """
+    def setUp(self):
+        super().setUp()
+        self.registry = ModelRegistry(self.folder.name + "/models")
+
+    def test_grid(self):
+        """
+        the TBATS grid covers every combination, simplest first
+        """
+        grid = GRIDS["TBATS"]
+        self.assertEqual(len(grid), 36)
+        self.assertEqual(grid[0], {"sp": None, "use_box_cox": False, "use_trend": False,
+                                   "use_damped_trend": False, "use_arma_errors": False})
+        with self.assertRaises(ValueError):
+            tune(self.data, method = "Naive", registry = self.registry)
+
+    def test_best_saved(self):
+        """
+        the best setting of every stock is saved and used by StockPrediction
+        """
+        grid = [{"strategy": "mean"}, {"strategy": "last"}, {"strategy": "drift"}]
+        scores = tune(self.data, method = "Naive", grid = grid, workers = 2,
+                      registry = self.registry)
+        self.assertEqual(len(scores), 6)
+        self.assertTrue((scores["status"] == "ok").all())
+        best = scores[scores["best"]].set_index("stock")["params"]
+        self.assertEqual(list(best.index), ["Meta", "AMZN"])
+        for stock in ["Meta", "AMZN"]:
+            rows = scores[scores["stock"] == stock]
+            self.assertLessEqual(rows[rows["best"]]["mae"].iloc[0], rows["mae"].min() * 1.01)
+            self.assertEqual(self.registry.load_config(stock, "Close", "Naive"), best[stock])
+
+        model = StockPrediction(self.data, method = "Naive", registry = self.registry)
+        self.assertEqual(model.model["Meta"].strategy, best["Meta"]["strategy"])
+
+    def test_budget(self):
+        """
+        the search stops when the budget is spent and nothing is saved
+        """
+        begin = time.time()
+        scores = tune(self.data, stocks = ["Meta"], budget = 0.05, registry = self.registry)
+        self.assertLess(time.time() - begin, 5)
+        self.assertTrue((scores["status"] == "timeout").all())
+        self.assertIsNone(self.registry.load_config("Meta", "Close", "TBATS"))
@@ -0,0 +1,54 @@
+"""
+Test for the walk-forward cross validation
+"""
+import numpy as np
+import pandas as pd
+
+from model import WalkForward
+from .stooq_server import StooqTestCase
+
+class TestWalkForward(StooqTestCase):
+    """
+    Test class
+    """
+    def test_folds(self):
+        """
+        expanding windows start at the first row, sliding windows keep their length
+        """
+        expanding = WalkForward(self.data, initial = 10, step = 4, horizon = 3)
+        self.assertEqual(expanding.folds(20), [(0, 10), (0, 14)])
+        sliding = WalkForward(self.data, initial = 10, step = 4, horizon = 3, window = "sliding")
+        self.assertEqual(sliding.folds(20), [(0, 10), (4, 14)])
+        with self.assertRaises(ValueError):
+            WalkForward(self.data, window = "growing")
+        with self.assertRaises(ValueError):
+            WalkForward(self.data, method = "Prophet")
+
+    def test_naive_scores(self):
+        """
+        the error of the naive forecast is the change from the last train day
+        """
+        validation = WalkForward(self.data, method = "Naive", initial = 40, step = 10)
+        scores = validation.run()
+        close = self.data.df["Meta"]["Close"].values
+        meta = scores[scores["stock"] == "Meta"]
+        self.assertEqual(list(meta["rows"]), list(range(40, len(close), 10)))
+        expected = np.abs(close[40::10] - close[39::10][:len(meta)])
+        self.assertTrue(np.allclose(meta["mae"].values, expected))
+        self.assertTrue(meta["coverage"].isin([0.0, 1.0]).all())
+        self.assertEqual(meta["origin"].iloc[0], self.data.df["Meta"].index[39])
+
+        summary = validation.summary()
+        self.assertEqual(list(summary.index), ["Meta", "AMZN"])
+        self.assertEqual(summary.loc["Meta", "folds"], len(meta))
+
+    def test_pool(self):
+        """
+        the process pool gives the same scores
+        """
+        validation = WalkForward(self.data, method = "Drift", initial = 30, step = 7,
+                                 horizon = 5, window = "sliding")
+        serial = validation.run()
+        parallel = validation.run(workers = 2)
+        pd.testing.assert_frame_equal(serial.drop(columns = "seconds"),
+                                      parallel.drop(columns = "seconds"))
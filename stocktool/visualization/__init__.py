@@ -1 +1,4 @@
 from .visualization import StockData
+from .trading_calendar import TradingCalendar, trading_calendar
+from .store import BarStore, default_store, get_bars, set_default_store
+from .session import configure_session, get_session, session_stats
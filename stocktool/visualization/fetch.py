@@ -0,0 +1,115 @@
+"""
+This is the code for downloading the stock price data from stooq
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pandas_datareader.stooq import StooqDailyReader
+
+from stocktool.instrumentation import count, timer
+from .session import get_session
+
+STOOQ_URL = "https://stooq.com/q/d/l/"
+
+class StooqReader(StooqDailyReader):
+    """
+    Stooq daily reader whose url can be changed, e.g. to a local mirror.
+
+    parameters:
+        base_url (str): url of the stooq csv endpoint.
+    """
+    def __init__(self, symbols, start, end, session = None, url = None):
+        super().__init__(symbols = symbols, start = start, end = end, retry_count = 0,
+                         session = session)
+        self.base_url = url or STOOQ_URL
+
+    @property
+    def url(self):
+        """API URL"""
+        return self.base_url
+
+    def _get_response(self, url, params = None, headers = None):
+        """
+        send the request and count the cache hits and the downloaded bytes.
+        """
+        response = super()._get_response(url, params, headers)
+        if getattr(response, "from_cache", False):
+            count("cache_hits", self.symbols)
+        else:
+            count("bytes_fetched", self.symbols, len(response.content))
+        return response
+
+def read_stooq(name, start, end, session = None, url = None):
+    """
+    download the daily price data of one stock.
+
+    parameters:
+        name (str): stock symbol
+        start, end (pd.Timestamp): the start and end date
+        session (requests.Session): session used for the request, default is the
+                                    shared session from get_session.
+        url (str): stooq url, default is STOOQ_URL
+
+    return:
+        : (DataFrame) price data sorted by ascending date
+    """
+    count("datareader_calls", name)
+    with timer("fetch", name):
+        return StooqReader(name, start, end, session or get_session(), url).read()[::-1]
+
+def fetch_one(name, start, end, session = None, retries = 2, backoff = 0.5, url = None):
+    """
+    download one stock, retry with exponential backoff when the request fails.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return read_stooq(name, start, end, session, url)
+        except Exception:  # pylint: disable=broad-except
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+    return None
+
+def fetch_symbols(stocks, start, end, session = None, workers = 8, retries = 2,
+                    backoff = 0.5, url = None, store = None):
+    """
+    download several stocks, at most `workers` requests are running at the same time.
+    A failed stock does not stop the other downloads.
+
+    parameters:
+        stocks (list of str): stock symbols
+        start, end (pd.Timestamp): the start and end date
+        session (requests.Session): session used for the requests
+        workers (int): max number of concurrent downloads, 1 means one after another.
+        retries (int): number of retries for each stock.
+        backoff (float): seconds to wait before the first retry, doubled for each retry.
+        url (str): stooq url, default is STOOQ_URL
+        store (BarStore): if given, read from the store and only download what is missing.
+
+    return:
+        frames (dict): stock symbol -> DataFrame, for the downloaded stocks
+        errors (dict): stock symbol -> exception, for the failed stocks
+    """
+    frames, errors = {}, {}
+
+    def task(name):
+        if store is not None:
+            return store.get(name, start, end, session, retries, backoff, url)
+        return fetch_one(name, start, end, session, retries, backoff, url)
+
+    if workers <= 1:
+        for name in stocks:
+            try:
+                frames[name] = task(name)
+            except Exception as err:  # pylint: disable=broad-except
+                errors[name] = err
+        return frames, errors
+
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        futures = {name: pool.submit(task, name) for name in stocks}
+        for name, future in futures.items():
+            try:
+                frames[name] = future.result()
+            except Exception as err:  # pylint: disable=broad-except
+                errors[name] = err
+
+    return frames, errors
@@ -0,0 +1,59 @@
+"""
+This is the code for the lazy mode of StockData, a stock is only loaded when it is used
+"""
+import threading
+from collections.abc import Mapping
+
+class LazyFrames(Mapping):
+    """
+    Mapping from stock symbol to DataFrame which loads a stock on first access and
+    keeps it.
+
+    parameters:
+        data (StockData): the StockData the stocks belong to, its load method is used.
+        stocks (list of str): all the stock symbols of the mapping.
+        frames (dict): the stocks loaded so far.
+    """
+    def __init__(self, data, stocks):
+        self.data = data
+        self.stocks = list(stocks)
+        self.frames = {}
+        self.lock = threading.Lock()
+
+    def fetch(self, stocks):
+        """
+        load the given stocks which are not loaded yet, all in one call so they are
+        downloaded concurrently. A stock whose download failed is tried again, an
+        invalid stock is not.
+
+        parameter:
+            stocks (list of str): stock symbols
+
+        return:
+            frames (dict): all the stocks loaded so far
+        """
+        with self.lock:
+            missing = [name for name in stocks if name in self.stocks
+                        and name not in self.frames and name not in self.data.invalid]
+            for name in missing:
+                self.data.errors.pop(name, None)
+            if missing:
+                self.frames.update(self.data.load(missing))
+        return self.frames
+
+    def __getitem__(self, name):
+        if name not in self.stocks:
+            raise KeyError(name)
+        frames = self.fetch([name])
+        if name not in frames:
+            raise ValueError(f"{name}: {self.data.errors[name]}")
+        return frames[name]
+
+    def __iter__(self):
+        return iter(self.stocks)
+
+    def __len__(self):
+        return len(self.stocks)
+
+    def __contains__(self, name):
+        return name in self.stocks
@@ -0,0 +1,148 @@
+"""
+This is the code for the panel, one aligned array for all the stocks
+"""
+import numpy as np
+import pandas as pd
+
+FIELDS = ["Open", "High", "Low", "Close", "Volume", "close-open", "high-low"]
+
+class StockPanel:
+    """
+    Class for the aligned price data of many stocks.
+
+    parameters:
+        dates (pd.DatetimeIndex): sorted dates shared by all the stocks.
+        stocks (list of str): stock symbols.
+        fields (list of str): price fields, e.g. "Open" or "close-open".
+        values (np.ndarray): float64 array with shape (fields, dates, stocks), a date
+                             on which a stock has no data is NaN.
+    """
+    def __init__(self, dates, stocks, fields, values):
+        """
+        Initialize the class, see from_frames to build it from StockData.df.
+        """
+        self.dates = pd.DatetimeIndex(dates, name = "Date")
+        self.stocks = list(stocks)
+        self.fields = list(fields)
+        self.values = values
+        self.stock_pos = {name: i for i, name in enumerate(self.stocks)}
+        self.field_pos = {name: i for i, name in enumerate(self.fields)}
+
+    def from_frames(frames, stocks = None, fields = None):
+        """
+        build the panel from a dict of DataFrames, like StockData.df.
+
+        parameters:
+            frames (dict): stock symbol -> DataFrame indexed by date
+            stocks (list of str): stocks to put into the panel, default is all of them.
+            fields (list of str): columns to put into the panel, default is every column
+                                  of FIELDS the frames have.
+        """
+        if stocks is None:
+            stocks = list(frames)
+        if fields is None:
+            fields = [name for name in FIELDS if all(name in frames[s].columns for s in stocks)]
+        dates = np.unique(np.concatenate([frames[name].index.values for name in stocks]))
+        dates = pd.DatetimeIndex(dates, name = "Date")
+
+        values = np.full((len(fields), len(dates), len(stocks)), np.nan)
+        for j, name in enumerate(stocks):
+            rows = dates.get_indexer(frames[name].index)
+            values[:, rows, j] = frames[name][fields].to_numpy(dtype = "float64").T
+        return StockPanel(dates, stocks, fields, values)
+
+    def derive(open_, high, low, close):
+        """
+        compute the derived columns as whole-array expressions, same values as
+        StockData.diff row by row.
+
+        parameters:
+            open_, high, low, close (np.ndarray): price arrays of the same shape
+
+        return:
+            close_open, high_low (np.ndarray): (close-open)/open and |(low-high)/high|,
+                                               rounded to 4 digits
+        """
+        close_open = np.round((close - open_) / open_, 4)
+        high_low = np.abs(np.round((low - high) / high, 4))
+        return close_open, high_low
+
+    def stock_index(self, stocks):
+        """
+        helper function, return the positions of the given stocks.
+        """
+        return np.array([self.stock_pos[name] for name in stocks], dtype = np.intp)
+
+    def field_index(self, fields):
+        """
+        helper function, return the positions of the given fields.
+        """
+        return np.array([self.field_pos[name] for name in fields], dtype = np.intp)
+
+    def positions(names, pos):
+        """
+        helper function, return the positions of names as a slice when they are
+        consecutive in the panel (so indexing gives a view), otherwise as an array.
+        """
+        index = np.array([pos[name] for name in names], dtype = np.intp)
+        if len(index) and (np.diff(index) == 1).all():
+            return slice(int(index[0]), int(index[-1]) + 1)
+        return index
+
+    def window(self, start, end, stocks = None, fields = None):
+        """
+        return the part of the panel between start and end. The bounds are found by
+        binary search on the dates, and the values are a view of this panel when the
+        stocks and fields are consecutive in it (e.g. all of them, or only one).
+
+        parameters:
+            start, end (pd.Timestamp): start and end date, both included.
+            stocks (list of str): default is all the stocks in the panel.
+            fields (list of str): default is all the fields in the panel.
+
+        return:
+            : (StockPanel) the window
+        """
+        left = self.dates.searchsorted(pd.Timestamp(start), side = "left")
+        right = self.dates.searchsorted(pd.Timestamp(end), side = "right")
+        stocks = self.stocks if stocks is None else list(stocks)
+        fields = self.fields if fields is None else list(fields)
+        rows = slice(left, max(left, right))
+        field_pos = StockPanel.positions(fields, self.field_pos)
+        stock_pos = StockPanel.positions(stocks, self.stock_pos)
+        if isinstance(field_pos, slice) or isinstance(stock_pos, slice):
+            values = self.values[field_pos, rows][..., stock_pos]
+        else:
+            values = self.values[np.ix_(field_pos, np.arange(left, rows.stop), stock_pos)]
+        return StockPanel(self.dates[rows], stocks, fields, values)
+
+    def field(self, name, stocks = None):
+        """
+        return one field for the given stocks as a DataFrame, dates x stocks.
+
+        parameters:
+            name (str): the field, e.g. "Open" or "close-open"
+            stocks (list of str): default is all the stocks in the panel.
+        """
+        values = self.values[self.field_pos[name]]
+        if stocks is None or stocks == self.stocks:
+            return pd.DataFrame(values, index = self.dates, columns = self.stocks, copy = False)
+        return pd.DataFrame(values[:, self.stock_index(stocks)], index = self.dates,
+                            columns = list(stocks), copy = False)
+
+    def wide(self, fields, stocks = None):
+        """
+        return several fields as one DataFrame with columns "<field>-<stock>", ordered
+        by stock and then by field.
+
+        parameters:
+            fields (list of str): the fields
+            stocks (list of str): default is all the stocks in the panel.
+        """
+        if stocks is None:
+            stocks = self.stocks
+        values = self.values[np.ix_(self.field_index(fields), np.arange(len(self.dates)),
+                                    self.stock_index(stocks))]
+        values = values.transpose(1, 2, 0).reshape(len(self.dates), -1)
+        columns = [f"{field}-{name}" for name in stocks for field in fields]
+        return pd.DataFrame(values, index = self.dates, columns = columns, copy = False)
@@ -0,0 +1,133 @@
+"""
+This is the code for the range query index, statistics of any window in constant time
+"""
+import numpy as np
+import pandas as pd
+
+class RangeQueryIndex:
+    """
+    Class for fast window statistics over a StockPanel. Prefix sums answer the mean and
+    the standard deviation, and sparse tables answer the max and min with their dates.
+
+    parameters:
+        panel (StockPanel): the panel the index is built on.
+        fields (list of str): the fields in the index.
+        sums, squares, counts (np.ndarray): prefix sums with shape (fields, dates+1, stocks).
+        max_table, min_table (list of np.ndarray): level k holds the position of the
+                                                   max/min of the 2**k dates starting at
+                                                   every date.
+    """
+    def __init__(self, panel, fields = ("close-open", "high-low")):
+        """
+        Initialize the class, the index is built for all the stocks at once.
+
+        parameters:
+            panel (StockPanel): the panel
+            fields (list of str): the fields to index. Default is the two fluctuations.
+        """
+        self.panel = panel
+        self.fields = [name for name in fields if name in panel.field_pos]
+        self.field_pos = {name: i for i, name in enumerate(self.fields)}
+        values = panel.values[panel.field_index(self.fields)]
+        valid = ~np.isnan(values)
+        clean = np.where(valid, values, 0.0)
+
+        shape = (len(self.fields), 1, len(panel.stocks))
+        self.sums = np.concatenate([np.zeros(shape), np.cumsum(clean, axis = 1)], axis = 1)
+        self.squares = np.concatenate([np.zeros(shape), np.cumsum(clean**2, axis = 1)], axis = 1)
+        self.counts = np.concatenate([np.zeros(shape, dtype = np.int64),
+                                      np.cumsum(valid, axis = 1)], axis = 1)
+
+        self.high = np.where(valid, values, -np.inf)
+        self.low = np.where(valid, values, np.inf)
+        self.max_table = RangeQueryIndex.sparse_table(self.high, np.greater)
+        self.min_table = RangeQueryIndex.sparse_table(self.low, np.less)
+
+    def sparse_table(values, better):
+        """
+        helper function, build the sparse table of positions along the date axis.
+
+        parameters:
+            values (np.ndarray): array with shape (fields, dates, stocks)
+            better (np.ufunc): np.greater for max, np.less for min. On a tie the
+                               earlier date is kept, same as idxmax/idxmin.
+        """
+        length = values.shape[1]
+        first = np.broadcast_to(np.arange(length, dtype = np.int32)[None, :, None],
+                                values.shape).copy()
+        table = [first]
+        size = 2
+        while size <= length:
+            prev, half = table[-1], size // 2
+            left = prev[:, :length - size + 1]
+            right = prev[:, half:half + length - size + 1]
+            pick = better(np.take_along_axis(values, right, axis = 1),
+                          np.take_along_axis(values, left, axis = 1))
+            table.append(np.where(pick, right, left))
+            size *= 2
+        return table
+
+    def arg_query(self, table, values, better, field, stock, left, right):
+        """
+        helper function, return the position of the max/min of each window.
+        left is included and right is excluded, all the windows are non-empty.
+        """
+        level = np.floor(np.log2(right - left)).astype(np.intp)
+        result = np.empty(len(left), dtype = np.intp)
+        for k in np.unique(level):
+            rows = level == k
+            first = table[k][field[rows], left[rows], stock[rows]]
+            second = table[k][field[rows], right[rows] - 2**k, stock[rows]]
+            pick = better(values[field[rows], second, stock[rows]],
+                          values[field[rows], first, stock[rows]])
+            result[rows] = np.where(pick, second, first)
+        return result
+
+    def query(self, field, stock, left, right):
+        """
+        return the statistics of many windows at once.
+
+        parameters:
+            field (str): the field, e.g. "close-open"
+            stock (np.ndarray): position of the stock in the panel for each window
+            left, right (np.ndarray): position of the first date and one past the last
+                                      date for each window
+
+        return:
+            : (DataFrame) one row per window with columns mean, std, max, max_date,
+              min, min_date and days
+        """
+        stock = np.asarray(stock, dtype = np.intp)
+        left = np.asarray(left, dtype = np.intp)
+        right = np.maximum(np.asarray(right, dtype = np.intp), left)
+        fields = np.full(len(stock), self.field_pos[field], dtype = np.intp)
+
+        total = self.sums[fields, right, stock] - self.sums[fields, left, stock]
+        square = self.squares[fields, right, stock] - self.squares[fields, left, stock]
+        count = (self.counts[fields, right, stock] - self.counts[fields, left, stock])
+        with np.errstate(invalid = "ignore", divide = "ignore"):
+            mean = np.where(count > 0, total / count, np.nan)
+            var = np.where(count > 1, (square - total * mean) / (count - 1), np.nan)
+        std = np.sqrt(np.maximum(var, 0.0))
+
+        found = count > 0
+        max_pos = np.zeros(len(stock), dtype = np.intp)
+        min_pos = np.zeros(len(stock), dtype = np.intp)
+        if found.any():
+            args = (fields[found], stock[found], left[found], right[found])
+            max_pos[found] = self.arg_query(self.max_table, self.high, np.greater, *args)
+            min_pos[found] = self.arg_query(self.min_table, self.low, np.less, *args)
+
+        max_date = np.full(len(stock), np.datetime64("NaT"), dtype = "datetime64[ns]")
+        min_date = max_date.copy()
+        max_date[found] = self.panel.dates.values[max_pos[found]]
+        min_date[found] = self.panel.dates.values[min_pos[found]]
+        return pd.DataFrame({
+            "mean": mean,
+            "std": std,
+            "max": np.where(found, self.high[fields, max_pos, stock], np.nan),
+            "max_date": max_date,
+            "min": np.where(found, self.low[fields, min_pos, stock], np.nan),
+            "min_date": min_date,
+            "days": count,
+        })
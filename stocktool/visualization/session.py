@@ -0,0 +1,100 @@
+"""
+This is the code for the shared http session, every download goes through it
+"""
+import datetime as dt
+import os
+import threading
+from pandas_datareader.yahoo.headers import DEFAULT_HEADERS
+from requests.adapters import HTTPAdapter
+import requests_cache
+
+SETTINGS = {
+    "pool_size": 10,
+    "keep_alive": True,
+    "backend": "sqlite",
+    "cache_name": os.path.join("~", ".stocktool", "http_cache"),
+    "expire_after": dt.timedelta(days = 3),
+}
+SESSION = {}
+LOCK = threading.Lock()
+
+class PooledSession(requests_cache.CachedSession):
+    """
+    Cached session which counts the cache hits and misses.
+
+    parameters:
+        stats (dict): number of "hits", "misses" and the "bytes" of the downloaded
+                      responses.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = {"hits": 0, "misses": 0, "bytes": 0}
+        self.stats_lock = threading.Lock()
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        """
+        send the request through the cache and count it.
+        """
+        response = super().send(request, **kwargs)
+        with self.stats_lock:
+            if getattr(response, "from_cache", False):
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+                self.stats["bytes"] += len(response.content)
+        return response
+
+def build_session(pool_size, keep_alive, backend, cache_name, expire_after):
+    """
+    build a PooledSession with the given settings, see configure_session.
+    """
+    if backend == "sqlite":
+        cache_name = os.path.expanduser(cache_name)
+        os.makedirs(os.path.dirname(cache_name) or ".", exist_ok = True)
+    session = PooledSession(cache_name = cache_name, backend = backend,
+                            expire_after = expire_after)
+    session.headers.update(DEFAULT_HEADERS)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    adapter = HTTPAdapter(pool_connections = pool_size, pool_maxsize = pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def get_session():
+    """
+    return the process-wide session, it is built on first use.
+    """
+    with LOCK:
+        if "session" not in SESSION:
+            SESSION["session"] = build_session(**SETTINGS)
+        return SESSION["session"]
+
+def configure_session(**kwargs):
+    """
+    change the settings of the process-wide session, the next get_session builds a new one.
+
+    parameters:
+        pool_size (int): number of pooled connections per host. Default is 10.
+        keep_alive (bool): False means close the connection after every request.
+        backend (str): requests_cache backend, e.g. "sqlite", "memory" or "filesystem".
+        cache_name (str): name of the cache, for "sqlite" it is the database path.
+                          Default is ~/.stocktool/http_cache.
+        expire_after (timedelta): how long a cached response is used. Default is 3 days.
+    """
+    for key in kwargs:
+        if key not in SETTINGS:
+            raise ValueError(f"{key} is not a session setting.")
+    with LOCK:
+        SETTINGS.update(kwargs)
+        session = SESSION.pop("session", None)
+    if session is not None:
+        session.close()
+
+def session_stats():
+    """
+    return the cache hits, misses and downloaded bytes of the process-wide session.
+    """
+    session = get_session()
+    with session.stats_lock:
+        return dict(session.stats)
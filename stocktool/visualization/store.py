@@ -0,0 +1,218 @@
+"""
+This is the code for the local price store, so the same history is only downloaded once
+"""
+import json
+import os
+import threading
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+
+from stocktool.instrumentation import count, timer
+from .fetch import fetch_one
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+VERSION = 1
+
+class BarStore:
+    """
+    Class for the on-disk daily price store. Every stock has its own directory with
+    dates.npy (datetime64[D]), bars.npy (float64, one column per COLUMNS) and meta.json
+    which records the date range the files cover.
+
+    parameters:
+        root (str): directory of the store.
+        cache (dict): uses stock symbol as key and values are (start, end, dates, bars)
+                      for the stocks already read in this process.
+    """
+    def __init__(self, root):
+        """
+        Initialize the class.
+
+        parameters:
+            root (str): directory of the store, created if it does not exist.
+        """
+        self.root = os.path.expanduser(root)
+        os.makedirs(self.root, exist_ok = True)
+        self.cache = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def path(self, name):
+        """
+        helper function, return the directory of the given stock.
+        """
+        return os.path.join(self.root, quote(name, safe = ""))
+
+    def symbol_lock(self, name):
+        """
+        helper function, return the lock of the given stock.
+        """
+        with self.lock:
+            return self.locks.setdefault(name, threading.Lock())
+
+    def load(self, name):
+        """
+        return (start, end, dates, bars) stored for the given stock, None if nothing is
+        stored.
+        """
+        if name in self.cache:
+            return self.cache[name]
+        path = self.path(name)
+        try:
+            with open(os.path.join(path, "meta.json"), encoding = "utf-8") as file:
+                meta = json.load(file)
+            dates = np.load(os.path.join(path, "dates.npy"))
+            bars = np.load(os.path.join(path, "bars.npy"))
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != VERSION or not len(dates) == len(bars) == meta["rows"]:
+            return None
+        self.cache[name] = (pd.Timestamp(meta["start"]), pd.Timestamp(meta["end"]), dates, bars)
+        return self.cache[name]
+
+    def write(self, name, start, end, dates, bars):
+        """
+        write the arrays of the given stock, every file is replaced atomically.
+        """
+        path = self.path(name)
+        os.makedirs(path, exist_ok = True)
+        for file_name, array in (("dates.npy", dates), ("bars.npy", bars)):
+            temp = os.path.join(path, file_name + ".tmp")
+            with open(temp, "wb") as file:
+                np.save(file, array)
+            os.replace(temp, os.path.join(path, file_name))
+        meta = {"version": VERSION, "start": start.strftime("%Y-%m-%d"),
+                "end": end.strftime("%Y-%m-%d"), "rows": len(dates), "columns": COLUMNS}
+        temp = os.path.join(path, "meta.json.tmp")
+        with open(temp, "w", encoding = "utf-8") as file:
+            json.dump(meta, file)
+        os.replace(temp, os.path.join(path, "meta.json"))
+        self.cache.pop(name, None)
+
+    def covered(self, name):
+        """
+        return the (start, end) date range stored for the given stock, None if nothing
+        is stored.
+        """
+        stored = self.load(name)
+        if stored is None:
+            return None
+        return stored[0], stored[1]
+
+    def read(self, name, start, end):
+        """
+        read the stored rows of the given stock between start and end.
+
+        return:
+            : (DataFrame) price data sorted by ascending date, empty if nothing is stored.
+        """
+        stored = self.load(name)
+        if stored is None:
+            return pd.DataFrame(columns = COLUMNS, index = pd.DatetimeIndex([], name = "Date"))
+        dates = stored[2]
+        left = np.searchsorted(dates, np.datetime64(pd.Timestamp(start).date()), side = "left")
+        right = np.searchsorted(dates, np.datetime64(pd.Timestamp(end).date()), side = "right")
+        index = pd.DatetimeIndex(dates[left:right].astype("datetime64[ns]"), name = "Date")
+        return pd.DataFrame(np.array(stored[3][left:right]), index = index, columns = COLUMNS)
+
+    def get(self, name, start, end, session = None, retries = 2, backoff = 0.5, url = None):
+        """
+        return the rows of the given stock between start and end. Only the part of the
+        range which is not stored yet is downloaded, and then it is added to the store.
+
+        parameters:
+            name (str): stock symbol
+            start, end (pd.Timestamp): the start and end date
+            session (requests.Session): session used for the downloads
+            retries, backoff: see fetch.fetch_one
+            url (str): stooq url, default is fetch.STOOQ_URL
+
+        return:
+            : (DataFrame) price data sorted by ascending date
+        """
+        start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+        ### today's bar might not be complete yet, so it is never marked as stored
+        last_complete = pd.Timestamp.now().normalize() - pd.Timedelta(days = 1)
+
+        with self.symbol_lock(name):
+            stored = self.load(name)
+            if stored is not None and stored[0] <= start and end <= stored[1]:
+                count("store_hits", name)
+                return self.read(name, start, end)
+            count("store_misses", name)
+
+            if stored is None:
+                missing = [(start, end)]
+                first, last = start, end
+            else:
+                missing = []
+                if start < stored[0]:
+                    missing.append((start, stored[0] - pd.Timedelta(days = 1)))
+                if end > stored[1]:
+                    missing.append((stored[1] + pd.Timedelta(days = 1), end))
+                first, last = min(start, stored[0]), max(end, stored[1])
+
+            frames = [fetch_one(name, a, b, session, retries, backoff, url) for a, b in missing]
+            if any(not set(COLUMNS) <= set(frame.columns) for frame in frames):
+                ### not a valid stock code, nothing is stored
+                if stored is None:
+                    return frames[0]
+                return self.read(name, start, end)
+
+            new = pd.concat([frame[COLUMNS] for frame in frames]).astype("float64")
+            dates = new.index.values.astype("datetime64[D]")
+            bars = new.values
+            if stored is not None:
+                dates = np.concatenate([dates, stored[2]])
+                bars = np.concatenate([bars, stored[3]])
+            order = np.argsort(dates, kind = "stable")
+            dates, keep = np.unique(dates[order], return_index = True)
+            bars = bars[order][keep]
+            self.write(name, first, min(last, last_complete), dates, bars)
+
+        return self.read(name, start, end)
+
+STORE = {}
+
+def default_store():
+    """
+    return the shared BarStore. The directory is the STOCKTOOL_STORE environment
+    variable, default is ~/.stocktool/bars. None means the store is turned off.
+    """
+    if "default" not in STORE:
+        STORE["default"] = BarStore(os.environ.get("STOCKTOOL_STORE",
+                                    os.path.join("~", ".stocktool", "bars")))
+    return STORE["default"]
+
+def set_default_store(store):
+    """
+    change the shared BarStore.
+
+    parameter:
+        store (BarStore or str or None): the new store, a directory, or None to turn
+                                         the store off and always download.
+    """
+    if isinstance(store, str):
+        store = BarStore(store)
+    STORE["default"] = store
+
+def get_bars(name, start, end, store = None, session = None, retries = 2, url = None):
+    """
+    return the rows of the given stock between start and end, from the store if
+    possible, otherwise downloaded.
+
+    parameters:
+        name (str): stock symbol
+        start, end (pd.Timestamp): the start and end date
+        store (BarStore): store to read from, default is default_store()
+        session (requests.Session): session used for the downloads
+        retries (int): number of retries for a failed download.
+        url (str): stooq url, default is fetch.STOOQ_URL
+    """
+    if store is None:
+        store = default_store()
+    with timer("bars", name):
+        if store is None:
+            return fetch_one(name, start, end, session, retries, url = url)
+        return store.get(name, start, end, session, retries, url = url)
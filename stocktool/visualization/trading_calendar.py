@@ -0,0 +1,223 @@
+"""
+This is the code for the market calendar, all the date helpers use it
+"""
+import threading
+import numpy as np
+import pandas as pd
+import pandas_market_calendars as mcal
+
+from stocktool.instrumentation import timer
+
+class TradingCalendar:
+    """
+    Class for market open day lookups. The open days (sessions) are built once
+    for a span of dates and every lookup is a binary search on the sorted array.
+
+    parameters:
+        name (str): name of the market calendar, default is "NYSE".
+        sessions (np.ndarray): sorted datetime64[ns] array of market open days.
+        span_start, span_end (pd.Timestamp): the date span covered by sessions.
+    """
+    def __init__(self, name = "NYSE", start = "1990-01-01", end = None):
+        """
+        Initialize the class.
+
+        parameters:
+            name (str): name of the market calendar. Default is "NYSE".
+            start, end (str or pd.Timestamp): span of the session array. Default end is
+                                             two years after today. Dates outside the
+                                             span extend it automatically.
+        """
+        self.name = name
+        self.calendar = mcal.get_calendar(name)
+        self.lock = threading.Lock()
+        if end is None:
+            end = pd.Timestamp.now().normalize() + pd.Timedelta(days = 730)
+        self.build(pd.Timestamp(start), pd.Timestamp(end))
+
+    def build(self, start, end):
+        """
+        build the session array between start and end.
+
+        parameters:
+            start, end (pd.Timestamp): span of the session array.
+        """
+        days = self.calendar.valid_days(start, end)
+        self.sessions = days.tz_localize(None).values.astype("datetime64[ns]")
+        self.span_start, self.span_end = start, end
+
+    def extend(self, first, last):
+        """
+        helper function, make sure that [first, last] is inside the span, padded by
+        one year so the rebuild does not happen on every call.
+        """
+        if first >= self.span_start and last <= self.span_end:
+            return
+        with self.lock:
+            start, end = self.span_start, self.span_end
+            if first < start:
+                start = first - pd.Timedelta(days = 365)
+            if last > end:
+                end = last + pd.Timedelta(days = 365)
+            if (start, end) != (self.span_start, self.span_end):
+                self.build(start, end)
+
+    def to_array(self, dates):
+        """
+        helper function, turn dates into a normalized datetime64[ns] array and make
+        sure the span covers them.
+        """
+        with timer("calendar"):
+            dates = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(dates)))
+            if dates.tz is not None:
+                dates = dates.tz_localize(None)
+            dates = dates.normalize()
+            if len(dates):
+                self.extend(dates.min() - pd.Timedelta(days = 10),
+                            dates.max() + pd.Timedelta(days = 10))
+            return dates.values.astype("datetime64[ns]")
+
+    def to_date(date):
+        """
+        helper function, turn a single date into a normalized tz-naive pd.Timestamp.
+        """
+        date = pd.Timestamp(date)
+        if date.tz is not None:
+            date = date.tz_localize(None)
+        return date.normalize()
+
+    def is_open(self, date):
+        """
+        check whether the market is open on the given date.
+
+        parameter:
+            date (pd.Timestamp): the given date
+
+        return:
+            : (bool) True means the market is open on the given date.
+        """
+        return bool(self.is_open_array([date])[0])
+
+    def previous_session(self, date):
+        """
+        return the last market open date on or before the given date.
+
+        parameter:
+            date (pd.Timestamp): the given date
+
+        return:
+            : (pd.Timestamp) the last market open date on or before the given date
+        """
+        return pd.Timestamp(self.previous_sessions([date])[0])
+
+    def next_session(self, date):
+        """
+        return the next market open date on or after the given date.
+
+        parameter:
+            date (pd.Timestamp): the given date
+
+        return:
+            : (pd.Timestamp) the next market open date on or after the given date
+        """
+        return pd.Timestamp(self.next_sessions([date])[0])
+
+    def session_count(self, start, end):
+        """
+        return the number of market open days between start and end, both included.
+
+        parameters:
+            start, end (pd.Timestamp): start and end date
+        """
+        first, last = self.to_array([start, end])
+        left = np.searchsorted(self.sessions, first, side = "left")
+        right = np.searchsorted(self.sessions, last, side = "right")
+        return int(max(right - left, 0))
+
+    def session_range(self, start, end):
+        """
+        return the market open days between start and end, both included.
+
+        parameters:
+            start, end (pd.Timestamp): start and end date
+
+        return:
+            : (pd.DatetimeIndex) the market open days
+        """
+        first, last = self.to_array([start, end])
+        left = np.searchsorted(self.sessions, first, side = "left")
+        right = np.searchsorted(self.sessions, last, side = "right")
+        return pd.DatetimeIndex(self.sessions[left:max(left, right)])
+
+    def sessions_after(self, date, count):
+        """
+        return the first `count` market open days strictly after the given date.
+
+        parameters:
+            date (pd.Timestamp): the given date
+            count (int): number of open days
+        """
+        first = self.to_array([date])[0]
+        self.extend(TradingCalendar.to_date(date),
+                    TradingCalendar.to_date(date) + pd.Timedelta(days = 2 * count + 10))
+        left = np.searchsorted(self.sessions, first, side = "right")
+        return pd.DatetimeIndex(self.sessions[left:left + count])
+
+    def is_open_array(self, dates):
+        """
+        vectorized form of is_open.
+
+        parameter:
+            dates (array like): the given dates
+
+        return:
+            : (np.ndarray) boolean array
+        """
+        dates = self.to_array(dates)
+        pos = np.searchsorted(self.sessions, dates, side = "left")
+        found = pos < len(self.sessions)
+        found[found] = self.sessions[pos[found]] == dates[found]
+        return found
+
+    def previous_sessions(self, dates):
+        """
+        vectorized form of previous_session.
+
+        parameter:
+            dates (array like): the given dates
+
+        return:
+            : (pd.DatetimeIndex) the last market open date on or before each date
+        """
+        dates = self.to_array(dates)
+        pos = np.searchsorted(self.sessions, dates, side = "right") - 1
+        return pd.DatetimeIndex(self.sessions[pos])
+
+    def next_sessions(self, dates):
+        """
+        vectorized form of next_session.
+
+        parameter:
+            dates (array like): the given dates
+
+        return:
+            : (pd.DatetimeIndex) the next market open date on or after each date
+        """
+        dates = self.to_array(dates)
+        pos = np.searchsorted(self.sessions, dates, side = "left")
+        return pd.DatetimeIndex(self.sessions[pos])
+
+CALENDARS = {}
+CALENDARS_LOCK = threading.Lock()
+
+def trading_calendar(name = "NYSE"):
+    """
+    return the shared TradingCalendar for the given market, it is built on first use.
+
+    parameter:
+        name (str): name of the market calendar. Default is "NYSE".
+    """
+    with CALENDARS_LOCK:
+        if name not in CALENDARS:
+            CALENDARS[name] = TradingCalendar(name)
+        return CALENDARS[name]
@@ -1,16 +1,18 @@
 """
 This is the code for visulization part
 """
-import datetime as dt
 import numpy as np
 import pandas as pd
-from pandas_datareader.data import DataReader
-from pandas_datareader.yahoo.headers import DEFAULT_HEADERS
-import pandas_market_calendars as mcal
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import requests_cache
+
+from .fetch import fetch_symbols
+from .lazy import LazyFrames
+from .panel import StockPanel
+from .query import RangeQueryIndex
+from .store import default_store
+from .trading_calendar import trading_calendar
 
 class StockData:
     """
@@ -18,11 +20,19 @@ class StockData:
 
     parameters:
         df (dict): uses stock symbol as key and values are pd.DataFrame that stores
-                   the stock price data
+                   the stock price data. In lazy mode it is a LazyFrames mapping.
+        errors (dict): uses stock symbol as key and values are the reason why the stock
+                       could not be loaded
+        invalid (set): the stocks of errors which have no data in the time range, in lazy
+                       mode the other ones are downloaded again on the next use
+        store (BarStore): local price store the data is read from
+        panel (StockPanel): aligned array of the loaded stocks, see get_panel
+        query_index (RangeQueryIndex): window statistics of the panel, see get_query_index
         start, end (str): the start and end date for the data
         open_days (int): number of market open days between start and end date
     """
-    def __init__(self, stocks = ["^DJI"], start = "", end = "", period = None):
+    def __init__(self, stocks = ["^DJI"], start = "", end = "", period = None,
+                    workers = 1, retries = 2, strict = True, store = None, lazy = False):
         """
         Initialize the class.
 
@@ -32,9 +42,25 @@ class StockData:
                 start, end (string): the start and end time for stock price data
                 period (int): The number of days between start and end. At least
                               two of start, end, period should be given.
+                workers (int): max number of concurrent downloads. Default is 1, which
+                               downloads the stocks one after another.
+                retries (int): number of retries with backoff for a failed download.
+                strict (bool): True means raise ValueError if any stock failed. False means
+                               drop the failed stocks and keep the reasons in self.errors.
+                store (BarStore): local price store, only the dates it does not hold yet
+                                  are downloaded. Default is the shared store.
+                lazy (bool): True means a stock is only downloaded and checked the first
+                             time self.df[stock] is used. An invalid stock raises
+                             ValueError at that time.
         """
         self.df = {}
+        self.errors = {}
+        self.invalid = set()
         self.stocks = stocks
+        self.store = store if store is not None else default_store()
+        self.workers, self.retries = workers, retries
+        self.panel = None
+        self.query_index = None
         count = 0
         if start:
             count += 1
@@ -50,9 +76,6 @@ class StockData:
         self.open_days = self.count_open_days(self.start_ts, self.end_ts)
         self.start = self.start_ts.strftime("%Y-%m-%d")
         self.end = self.end_ts.strftime("%Y-%m-%d")
-        expire_after = dt.timedelta(days=3)
-        session = requests_cache.CachedSession(cache_name='cache', expire_after=expire_after)
-        session.headers = DEFAULT_HEADERS
         ### check end time is not after today
         if end > pd.Timestamp.now():
             raise ValueError("The end time is after today")
@@ -61,18 +84,108 @@ class StockData:
         if self.start_ts > self.end_ts:
             raise ValueError("The start date is after the end date")
 
+        if lazy:
+            self.df = LazyFrames(self, stocks)
+            return
+
+        self.df = self.load(stocks)
+        if self.errors:
+            if strict:
+                raise ValueError("; ".join(f"{name}: {err}" for name, err in self.errors.items()))
+            self.stocks = [name for name in stocks if name in self.df]
+
+    def load(self, stocks):
+        """
+        download the given stocks, check them and add the derived columns.
+        The stocks that failed are added to self.errors, and the invalid ones also to
+        self.invalid.
+
+        parameter:
+            stocks (list of string): list of stock symbols
+
+        return:
+            frames (dict): uses stock symbol as key and values are the loaded DataFrames
+        """
+        frames, errors = fetch_symbols(stocks, self.start_ts, self.end_ts,
+                                       workers = self.workers, retries = self.retries,
+                                       store = self.store)
+        self.errors.update(errors)
+
+        result = {}
         for name in stocks:
+            if name not in frames:
+                continue
             ### check name is a valid stock symbol
-            self.df[name] = DataReader(name, 'stooq', self.start_ts, self.end_ts,
-                                            session = session)[::-1]
-            if len(self.df[name]) < self.open_days:
-                raise ValueError(f"{name} is not a valid stock code in the time range "
-                    +f"({self.start_ts.strftime('%Y-%m-%d')},{self.end_ts.strftime('%Y-%m-%d')})")
+            if len(frames[name]) < self.open_days:
+                self.errors[name] = ValueError(f"{name} is not a valid stock code in the "
+                    +f"time range ({self.start},{self.end})")
+                self.invalid.add(name)
+                continue
+
+            result[name] = frames[name].copy()
+            result[name]["close-open"], result[name]["high-low"] = StockPanel.derive(
+                *(result[name][col].to_numpy(dtype = "float64")
+                    for col in ["Open", "High", "Low", "Close"]))
+
+        return result
+
+    def get_panel(self, stocks = None):
+        """
+        return the StockPanel of the loaded stocks, it is built on first use and kept,
+        with its query index, while it has the stocks asked for. In lazy mode a new panel
+        only has the stocks asked for, so touching one more stock does not copy all the
+        loaded ones again.
+
+        parameter:
+            stocks (list of string): stocks which should be in the panel, in lazy mode
+                                     they are loaded first. Default is all the stocks.
+
+        return:
+            panel (StockPanel): one date index and a (fields, dates, stocks) array
+        """
+        if stocks is None:
+            stocks = self.stocks
+        if isinstance(self.df, LazyFrames):
+            frames = self.df.fetch(stocks)
+        else:
+            frames = self.df
+        for name in stocks:
+            if name not in frames:
+                raise ValueError(f"{name}: {self.errors.get(name, 'not loaded')}")
+
+        if self.panel is not None and all(name in self.panel.stocks for name in stocks):
+            return self.panel
+        lazy = isinstance(self.df, LazyFrames)
+        self.panel = StockPanel.from_frames(frames, list(stocks) if lazy else None)
+        self.query_index = None
+        return self.panel
+
+    def get_query_index(self, stocks = None):
+        """
+        return the RangeQueryIndex of the panel, it is built on first use.
+
+        parameter:
+            stocks (list of string): stocks which should be in the index, see get_panel.
+        """
+        panel = self.get_panel(stocks)
+        if self.query_index is None:
+            self.query_index = RangeQueryIndex(panel)
+        return self.query_index
 
-            self.df[name]["close-open"] = [StockData.diff(x,y)[0] for x,y in
-                                            zip(self.df[name]["Open"], self.df[name]["Close"])]
-            self.df[name]["high-low"] = [abs(StockData.diff(x,y)[0]) for x,y in
-                                            zip(self.df[name]["High"], self.df[name]["Low"])]
+    def window(self, start, end, stocks = None, fields = None):
+        """
+        return the data between start and end without copying it. The bounds are found
+        by binary search on the sorted dates.
+
+        parameters:
+            start, end (pd.Timestamp): start and end date, both included.
+            stocks (list of string): default would be all of the stocks in the class.
+            fields (list of string): e.g. ["Open", "close-open"], default is all the fields.
+
+        return:
+            : (StockPanel) window.field(name) gives a dates x stocks DataFrame
+        """
+        return self.get_panel(stocks).window(start, end, stocks, fields)
 
     def check_stocks(self, stocks):
         """
@@ -165,14 +278,7 @@ class StockData:
         return:
             open_day (pd.Timestamp): the last market open date before the given date
         """
-        nyse = mcal.get_calendar("NYSE")
-        start =date_ts - dt.timedelta(days = 20)
-        market_days = nyse.valid_days(start, date_ts)
-
-        for i in range(20):
-            open_day = date_ts - dt.timedelta(days = i)
-            if open_day.tz_localize("UTC") in market_days:
-                return open_day
+        return trading_calendar().previous_session(date_ts)
 
     def next_open_day(date_ts):
         """
@@ -184,14 +290,7 @@ class StockData:
         return:
             open_day (pd.Timestamp): the next market open date before the given date
         """
-        nyse = mcal.get_calendar("NYSE")
-        end =date_ts + dt.timedelta(days = 20)
-        market_days = nyse.valid_days(date_ts, end)
-
-        for i in range(20):
-            open_day = date_ts + dt.timedelta(days = i)
-            if open_day.tz_localize("UTC") in market_days:
-                return open_day
+        return trading_calendar().next_session(date_ts)
 
     def count_open_days(self, start = "", end = "", period = None):
         """
@@ -207,8 +306,7 @@ class StockData:
             days (int): number of open days between start and end
         """
         start_ts, end_ts = self.check_period(start, end, period)
-        nyse = mcal.get_calendar("NYSE")
-        days = len(nyse.valid_days(start_ts, end_ts))
+        days = trading_calendar().session_count(start_ts, end_ts)
         return days
 
     def diff(a,b):
@@ -252,21 +350,17 @@ class StockData:
 
         start_ts, end_ts = StockData.check_open(start_ts, end_ts)
 
-        fluctuation = {}
+        panel = self.get_panel(stocks)
         if method == "close-open":
-            for name in stocks:
-                if start_ts < self.df[name].index[0]:
-                    start_ts = self.df[name].index[0]
-                fluctuation[name] = StockData.diff(self.df[name].loc[start_ts]["Close"],
-                                                        self.df[name].loc[end_ts]["Open"])[1]
+            first, last = panel.field("Close", stocks), panel.field("Open", stocks)
         else:
-            for name in stocks:
-                if start_ts < self.df[name].index[0]:
-                    start_ts = self.df[name].index[0]
-                fluctuation[name] = StockData.diff(self.df[name].loc[start_ts]["High"],
-                                                        self.df[name].loc[end_ts]["Low"])[1]
+            first, last = panel.field("High", stocks), panel.field("Low", stocks)
+        start_ts = max(start_ts, panel.dates[0])
+        first = first.values[panel.dates.searchsorted(start_ts)]
+        last = last.values[panel.dates.get_loc(end_ts)]
+        percent = pd.Series(np.round(np.round((last-first)/first, 4)*100, 2), index = stocks)
 
-        return pd.DataFrame(data = fluctuation, index = ["fluctuaion"])
+        return pd.DataFrame([percent.astype(str) + "%"], index = ["fluctuaion"])
 
     def fluctuation(self, stocks = None, start = "", end = "", period = None,
                             method = "close-open", in_function = False):
@@ -296,28 +390,87 @@ class StockData:
             raise ValueError("Time period should between in data's time range")
 
 
-        date_range = pd.date_range(start_ts, end_ts)
-
-        result = pd.DataFrame()
-        for name in stocks:
-            result[name] = self.df[name].loc[self.df[name].index.isin(date_range), :][method]
-
-        max_inc_date = result.idxmax()
-        max_dec_date = result.idxmin()
+        result = self.window(start_ts, end_ts, stocks, [method]).field(method)
 
         if not in_function:
+            stats = self.window_stats(stocks, start_ts, end_ts, method)
             for name in stocks:
-                temp = str(round(np.mean(result[name])*100, 2))+"%"
+                temp = str(round(stats.loc[name, "mean"]*100, 2))+"%"
                 print(f"The average for {name} is: {temp} \n")
                 print(f"The max increase/min decrease of {name} occured on "
-                    +f"{max_inc_date[name].strftime('%Y-%m-%d')}, which is "
-                    +str(round(result[name].max()*100, 2))+"% \n")
+                    +f"{stats.loc[name, 'max_date'].strftime('%Y-%m-%d')}, which is "
+                    +str(round(stats.loc[name, "max"]*100, 2))+"% \n")
                 print(f"The max decrease/min increase of {name} occured on "
-                    +f"{max_dec_date[name].strftime('%Y-%m-%d')}, which is "
-                    +str(round(result[name].min()*100, 2))+"% \n")
+                    +f"{stats.loc[name, 'min_date'].strftime('%Y-%m-%d')}, which is "
+                    +str(round(stats.loc[name, "min"]*100, 2))+"% \n")
 
         return result
 
+    def window_stats(self, stocks, start_ts, end_ts, method):
+        """
+        helper function, return the statistics of one window for several stocks.
+        """
+        index = self.get_query_index(stocks)
+        panel = index.panel
+        left = panel.dates.searchsorted(start_ts, side = "left")
+        right = panel.dates.searchsorted(end_ts, side = "right")
+        stats = index.query(method, panel.stock_index(stocks),
+                                             np.full(len(stocks), left),
+                                             np.full(len(stocks), right))
+        stats.index = list(stocks)
+        return stats
+
+    def fluctuation_stats(self, stocks = None, start = "", end = "", period = None,
+                            method = "close-open"):
+        """
+        return the statistics of the daily fluctuation, without scanning the dates.
+
+        parameters:
+            stocks (list of string): a list of stock symbols, default would be all of the
+                                    stocks in the class.
+            start, end (string): start and end date.
+            period (int): number of days between start and end.
+            method (string): "close-open" or "high-low", see fluctuation.
+
+        return:
+            : (DataFrame) one row per stock with columns mean, std, max, max_date, min,
+              min_date and days
+        """
+        if not stocks:
+            stocks = self.stocks
+        else:
+            self.check_stocks(stocks)
+
+        start_ts, end_ts = self.check_period(start, end, period)
+        if start_ts < self.start_ts or end_ts > self.end_ts:
+            raise ValueError("Time period should between in data's time range")
+
+        return self.window_stats(stocks, start_ts, end_ts, method)
+
+    def batch_fluctuation_stats(self, queries, method = "close-open"):
+        """
+        return the statistics of the daily fluctuation for many windows at once.
+
+        parameters:
+            queries (list of tuple): (stock, start, end) for each window, the dates are
+                                     included.
+            method (string): "close-open" or "high-low", see fluctuation.
+
+        return:
+            : (DataFrame) one row per query with columns stock, start, end, mean, std, max,
+              max_date, min, min_date and days
+        """
+        queries = pd.DataFrame(list(queries), columns = ["stock", "start", "end"])
+        self.check_stocks(list(queries["stock"].unique()))
+        index = self.get_query_index(list(queries["stock"].unique()))
+        panel = index.panel
+        starts = pd.to_datetime(queries["start"]).values
+        ends = pd.to_datetime(queries["end"]).values
+        stats = index.query(method, panel.stock_index(queries["stock"]),
+                                             panel.dates.searchsorted(starts, side = "left"),
+                                             panel.dates.searchsorted(ends, side = "right"))
+        return pd.concat([queries, stats], axis = 1)
+
     def get_button(self, start_ts, end_ts):
         """
         helper function for getting the button variable for plotly.
@@ -396,13 +549,7 @@ class StockData:
         if start_ts < self.start_ts or end_ts > self.end_ts:
             raise ValueError("Time period should between in data's time range")
 
-        date_range = pd.date_range(start_ts, end_ts)
-        c = self.df[stocks[0]][method].loc[self.df[stocks[0]].index.isin(date_range)]
-        c.columns = [s+"-"+stocks[0] for s in c.columns]
-        for name in stocks[1:]:
-            a = self.df[name][method].loc[self.df[name].index.isin(date_range)]
-            a.columns = [s+"-"+name for s in a.columns]
-            c = pd.concat([c,a], axis = 1)
+        c = self.window(start_ts, end_ts, stocks, method).wide(method)
 
         c_1 = c.reset_index()
         temp = ", ".join(stocks)
@@ -445,8 +592,9 @@ class StockData:
 
 
         for s in stocks:
-            temp = self.df[s].loc[start_ts:][:end_ts]
-            c = temp.reset_index()
+            c = self.window(start_ts, end_ts, [s])
+            c = pd.DataFrame({name: c.field(name)[s] for name in
+                                ["Open", "High", "Low", "Close", "Volume"]}).reset_index()
 
             fig = go.Figure()
 